@@ -0,0 +1,10 @@
+"""Benchmarks for the build steps of jml.
+
+Run the benchmarks on a synthetic project and write the results as JSON:
+
+    python -m benchmarks run --files 500 --out results.json
+
+Results of two commits can be compared with:
+
+    python -m benchmarks compare old.json new.json
+"""
@@ -0,0 +1,95 @@
+import json
+import tempfile
+from pathlib import Path
+
+import click
+
+from .generator import ProjectSpec, generate_project
+from .harness import compare as compare_results
+from .harness import run_benchmarks
+
+DEFAULTS = ProjectSpec()
+
+
+@click.group(help="Benchmarks für jml.")
+def cli() -> None:
+    pass
+
+
+def project_options(func):
+    for name, help in reversed(
+        (
+            ("files", "Anzahl der Quelltextdateien."),
+            ("lines", "Anzahl der Zeilen pro Datei."),
+            ("tag-density", "Anteil der Zeilen, die eine Markierung öffnen."),
+            ("nesting", "Tiefe der Ordnerstruktur."),
+            ("versions", "Höchste Versionsnummer in den Markierungen."),
+            ("assets", "Anzahl zusätzlicher Dateien, die nur kopiert werden."),
+            ("seed", "Startwert für den Zufallsgenerator."),
+        )
+    ):
+        default = getattr(DEFAULTS, name.replace("-", "_"))
+        func = click.option(
+            f"--{name}",
+            type=type(default),
+            default=default,
+            show_default=True,
+            help=help,
+        )(func)
+    return func
+
+
+def create_spec(options: dict) -> ProjectSpec:
+    return ProjectSpec(**{k: v for k, v in options.items() if k in DEFAULTS.to_dict()})
+
+
+@cli.command(help="Führt die Benchmarks aus und gibt die Ergebnisse als JSON aus.")
+@project_options
+@click.option("-r", "--repeat", type=int, default=5, show_default=True)
+@click.option(
+    "-b",
+    "--benchmark",
+    "only",
+    multiple=True,
+    type=click.Choice(
+        ["create_version", "compile_file", "match_patterns", "create_zip"]
+    ),
+    help="Nur die angegebenen Benchmarks ausführen.",
+)
+@click.option(
+    "-o",
+    "--out",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Datei für die Ergebnisse. Standard ist die Ausgabe auf der Konsole.",
+)
+def run(repeat: int, only: tuple[str], out: Path | None, **options) -> None:
+    with tempfile.TemporaryDirectory() as workdir:
+        results = run_benchmarks(
+            Path(workdir), create_spec(options), repeat=repeat, only=only
+        )
+    data = json.dumps(results, indent=2)
+    if out:
+        out.write_text(data + "\n", encoding="utf-8")
+    else:
+        click.echo(data)
+
+
+@cli.command(help="Erstellt ein synthetisches Basisprojekt in PATH.")
+@project_options
+@click.argument("path", type=click.Path(file_okay=False, path_type=Path))
+def generate(path: Path, **options) -> None:
+    click.echo(generate_project(path, create_spec(options)))
+
+
+@cli.command(help="Vergleicht die Ergebnisse OLD und NEW zweier Durchläufe.")
+@click.argument("old", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.argument("new", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+def compare(old: Path, new: Path) -> None:
+    old_results = json.loads(old.read_text(encoding="utf-8"))
+    new_results = json.loads(new.read_text(encoding="utf-8"))
+    for name, ratio in compare_results(old_results, new_results).items():
+        click.echo(f"{name:>16}: {ratio:6.2f}x ({(ratio - 1) * 100:+.1f}%)")
+
+
+if __name__ == "__main__":
+    cli()
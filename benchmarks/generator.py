@@ -0,0 +1,119 @@
+"""Generator for synthetic base projects.
+
+`generate_project()` writes a project with a configurable number and size
+of source files, density of marker blocks, folder nesting and number of
+versions. The same parameters and seed always create the same project, so
+results can be compared between commits.
+"""
+
+import random
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from jml.config import CONFIG_FILE
+
+
+@dataclass(frozen=True)
+class ProjectSpec:
+    """Parameters of a synthetic project."""
+
+    # number of source files (.java)
+    files: int = 200
+    # number of lines per source file
+    lines: int = 200
+    # fraction of lines that open a marker block
+    tag_density: float = 0.05
+    # depth of the folder structure
+    nesting: int = 3
+    # highest version number used in the markers
+    versions: int = 3
+    # number of additional files copied verbatim
+    assets: int = 20
+    seed: int = 0
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+STATEMENTS = (
+    "int zahl{n} = {n} * faktor;",
+    'String text{n} = "Zeile {n}";',
+    "summe = summe + zahl{n};",
+    "liste.add(new Element({n}));",
+    "if (zahl{n} > grenze) {{ grenze = zahl{n}; }}",
+    "// Kommentar zur Anweisung {n}",
+)
+
+
+def generate_project(root: Path, spec: ProjectSpec = ProjectSpec()) -> Path:
+    """Creates the synthetic project described by `spec` in `root` and returns
+    the path of the project folder."""
+    rng = random.Random(spec.seed)
+    source = root / "Projekt"
+    source.mkdir(parents=True, exist_ok=True)
+    (source / CONFIG_FILE).write_text('name = "Projekt"\n', encoding="utf-8")
+
+    # two subfolders in each folder up to the nesting depth
+    folders = [Path(".")]
+    for depth in range(1, spec.nesting + 1):
+        folders.extend(
+            [
+                folder / f"paket{depth}{c}"
+                for folder in folders
+                if len(folder.parts) == depth - 1
+                for c in "ab"
+            ]
+        )
+
+    for i in range(spec.files):
+        folder = source / folders[i % len(folders)]
+        folder.mkdir(parents=True, exist_ok=True)
+        (folder / f"Klasse{i}.java").write_text(
+            generate_source(f"Klasse{i}", spec, rng), encoding="utf-8"
+        )
+
+    for i in range(spec.assets):
+        folder = source / folders[i % len(folders)]
+        folder.mkdir(parents=True, exist_ok=True)
+        if i % 2:
+            (folder / f"daten{i}.txt").write_text(
+                "".join(f"Datensatz {i}.{n}\n" for n in range(spec.lines)),
+                encoding="utf-8",
+            )
+        else:
+            (folder / f"bild{i}.png").write_bytes(rng.randbytes(spec.lines * 32))
+    return source
+
+
+def generate_source(name: str, spec: ProjectSpec, rng: random.Random) -> str:
+    """Generates the text of one source file with `spec.lines` lines."""
+    lines = [f"public class {name} {{"]
+    if spec.tag_density > 0:
+        # the highest version is used in every file
+        lines.extend(
+            [f"    /*aufg* {spec.versions}", "    // TODO: Aufgabe", "    *aufg*/"]
+        )
+    while len(lines) < spec.lines - 1:
+        if rng.random() < spec.tag_density:
+            lines.extend(_marker_block(spec, rng, len(lines)))
+        else:
+            lines.append("    " + rng.choice(STATEMENTS).format(n=len(lines)))
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def _marker_block(spec: ProjectSpec, rng: random.Random, n: int) -> list[str]:
+    version = rng.randint(1, max(1, spec.versions))
+    arg = rng.choice(("", f"{version}", f">={version}", f"!={version}", f"1-{version}"))
+    body = [
+        "        " + rng.choice(STATEMENTS).format(n=n + i)
+        for i in range(rng.randint(1, 4))
+    ]
+    if rng.random() < 0.5:
+        return [
+            f"    /*aufg* {arg}".rstrip(),
+            "    // TODO: Aufgabe",
+            *body,
+            "    *aufg*/",
+        ]
+    return [f"    //ml* {arg}".rstrip(), *body, "    //*ml"]
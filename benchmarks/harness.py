@@ -0,0 +1,195 @@
+"""Timing harness for the build steps of jml.
+
+Each benchmark runs one step of a build on a synthetic project (see
+`generator.generate_project()`) several times. The wall times of all runs
+are recorded and the peak memory of the step is measured in a separate
+run with `tracemalloc`, which would slow down the timed runs.
+"""
+
+import io
+import logging
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+import typing as t
+from pathlib import Path
+
+from jml import __version__, versions
+from jml.config import ConfigDict, load_default_config
+from jml.console import PlainConsole
+from jml.markers import ML_INT
+from jml.utils import files, match_patterns
+
+from .generator import ProjectSpec, generate_project
+
+# result format, increased on incompatible changes
+RESULTS_FORMAT = 1
+
+
+def project_config(source: Path, output_dir: Path) -> ConfigDict:
+    """Builds the config for the synthetic project in `source`."""
+    config = load_default_config()
+    config["name"] = source.name
+    config["source_dir"] = source
+    config["project_root"] = source.parent
+    config["output_dir"] = output_dir
+    config.zip.create = False
+    return config
+
+
+def measure(func: t.Callable[[], t.Any], repeat: int = 5, setup=None) -> dict:
+    """Runs `func` `repeat` times and returns the wall times of the runs and
+    the peak memory of one additional run in bytes. `setup` is called
+    before every run and is not timed."""
+    runs = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - start)
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "runs": runs,
+        "min": min(runs),
+        "median": statistics.median(runs),
+        "mean": statistics.fmean(runs),
+        "peak_memory": peak,
+    }
+
+
+def run_benchmarks(
+    workdir: Path,
+    spec: ProjectSpec = ProjectSpec(),
+    repeat: int = 5,
+    only: t.Iterable[str] = (),
+) -> dict:
+    """Generates the project for `spec` in `workdir` and runs all benchmarks
+    (or the benchmarks named in `only`).
+
+    Returns:
+        dict: The results with some information about the environment.
+    """
+    source = generate_project(workdir / "source", spec)
+    output_dir = workdir / "out"
+    config = project_config(source, output_dir)
+    console = PlainConsole(file=io.StringIO())
+
+    relpaths = [f.relative_to(source) for f in sorted(source.rglob("*"))]
+    java_files = [p for p in relpaths if p.suffix == ".java"]
+    vconfig = versions.prepare_version(1, config)
+
+    def fresh():
+        # results of earlier runs are not reused
+        versions.clear_caches()
+        console.file.seek(0)
+        console.file.truncate()
+
+    def create_version():
+        for ver in (ML_INT, *range(1, spec.versions + 1)):
+            versions.create_version(ver, config, console=console)
+
+    def compile_file():
+        for relpath in java_files:
+            versions.compile_file(
+                1, source / relpath, vconfig.output_dir / relpath, vconfig
+            )
+
+    def match_patterns_():
+        patterns = sorted(config.sources.exclude)
+        for relpath in relpaths:
+            match_patterns(relpath, patterns)
+
+    zip_source = output_dir / "zip_source"
+
+    def setup_zip():
+        fresh()
+        if not zip_source.is_dir():
+            shutil.copytree(source, zip_source)
+        files.remove_path(workdir / "zip_source.zip")
+
+    def create_zip():
+        files.create_zip(zip_source, dest=workdir)
+
+    def setup_compile():
+        fresh()
+        for relpath in java_files:
+            files.make_dirs((vconfig.output_dir / relpath).parent)
+
+    benchmarks = {
+        "create_version": (create_version, fresh),
+        "compile_file": (compile_file, setup_compile),
+        "match_patterns": (match_patterns_, fresh),
+        "create_zip": (create_zip, setup_zip),
+    }
+    only = set(only)
+
+    logger = logging.getLogger("jml")
+    level = logger.level
+    logger.setLevel(logging.WARNING)
+    try:
+        results = {
+            name: measure(func, repeat=repeat, setup=setup)
+            for name, (func, setup) in benchmarks.items()
+            if not only or name in only
+        }
+    finally:
+        logger.setLevel(level)
+
+    return {
+        "format": RESULTS_FORMAT,
+        "environment": environment(),
+        "project": spec.to_dict(),
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def environment() -> dict:
+    """Returns information about the environment the benchmarks ran in."""
+    return {
+        "jml": __version__,
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "executable": sys.executable,
+    }
+
+
+def git_commit() -> str | None:
+    """Returns the current git commit of the repository, if any."""
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def compare(old: dict, new: dict) -> dict[str, float]:
+    """Returns the ratio of the median times of `new` to `old` for each
+    benchmark in both results. Values above 1 mean `new` is slower."""
+    return {
+        name: new["results"][name]["median"] / result["median"]
+        for name, result in old["results"].items()
+        if name in new["results"] and result["median"] > 0
+    }
@@ -0,0 +1,255 @@
+"""Compiles all projects below a project root in one run.
+
+Every folder below the root that contains a config file is a project. The
+default, home and root configs are loaded only once and shared by all
+projects. The versions of all projects are created by one pool of worker
+processes and each project keeps the output layout of a single run
+(`output_dir / source.parent.relative_to(project_root)`).
+"""
+
+import itertools
+import logging
+import os
+import time
+import typing as t
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .config import (
+    CONFIG_FILE,
+    ConfigDict,
+    load_project_config,
+    load_root_config,
+)
+from .console import PlainConsole, create_console
+from .parallel import (
+    WorkerResult,
+    _create_version,
+    _log_version,
+    merge_result,
+    worker_options,
+)
+from .plan import plan_versions, print_plan
+from .stats import phase
+from .trace import span
+from .utils import files, resolve_path
+from .versions import (
+    ML_INT,
+    create_version,
+    discard_solution,
+    discover_versions,
+    fetch_files,
+    prepare_version,
+    select_versions,
+    set_link_root,
+)
+
+if t.TYPE_CHECKING:
+    from rich.console import Console
+
+logger = logging.getLogger("jml")
+
+
+@dataclass
+class ProjectResult:
+    """The outcome of compiling one project of a batch run."""
+
+    source: Path
+    name: str
+    versions: list[int] = field(default_factory=list)
+    time: float = 0.0
+    error: str = ""
+
+
+def find_projects(root: Path, exclude: t.Iterable[Path] = ()) -> list[Path]:
+    """Returns all project folders below `root`, i.e. all folders with a
+    config file. Found projects, hidden folders and the folders in `exclude`
+    are not searched for further projects."""
+    exclude = set(exclude)
+    projects = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        path = Path(dirpath)
+        if path != root and CONFIG_FILE in filenames:
+            projects.append(path)
+            dirnames.clear()
+        else:
+            dirnames[:] = [
+                d for d in dirnames if not d.startswith(".") and path / d not in exclude
+            ]
+    return sorted(projects)
+
+
+def run_batch(
+    root: Path,
+    base: ConfigDict,
+    options: dict | None = None,
+    versions: t.Iterable[int] = None,
+    jobs: int | None = None,
+    console: "Console" = None,
+) -> list[ProjectResult]:
+    """
+    Compiles all projects below `root` with the shared `base` config and the
+    cli `options`. The versions of all projects are created with up to
+    `jobs` worker processes. If `jobs` is `0`, the number of CPUs is used and
+    if it is `None`, the setting from the root config.
+
+    Errors are reported per project and do not stop the other projects.
+
+    Returns:
+        list: The results of all projects found.
+    """
+    console = console or create_console()
+    root = resolve_path(root)
+    root_config = load_root_config(root, base)
+
+    exclude = []
+    if options and options.get("output_dir"):
+        exclude.append(resolve_path(options["output_dir"]))
+    elif root_config.get("output_dir"):
+        exclude.append(resolve_path(root_config["output_dir"]))
+
+    results = []
+    tasks = []
+    for source in find_projects(root, exclude):
+        result = ProjectResult(source, source.name)
+        results.append(result)
+        try:
+            with span(source.name, "project", source=source):
+                with phase("config"):
+                    config = load_project_config(
+                        source,
+                        base,
+                        options,
+                        project_root=root,
+                        root_config=root_config,
+                    )
+                config["dry_run"] = files.is_dry_run()
+                result.name = config["name"]
+                with phase("download"):
+                    fetch_files(config)
+
+                with phase("discover"):
+                    discovered = discover_versions(config)
+                _, generate = select_versions(discovered, versions)
+                if not config.solutions.delete:
+                    generate.add(ML_INT)
+                elif not config["dry_run"]:
+                    if mlconfig := prepare_version(ML_INT, config):
+                        discard_solution(mlconfig)
+        except (OSError, ValueError) as err:
+            result.error = str(err)
+            continue
+
+        result.versions = sorted(generate)
+        if config["dry_run"]:
+            # the plan is shown instead of building the versions
+            _log_project(result)
+            plan = plan_versions(
+                generate, config, delete_solution=config.solutions.delete
+            )
+            print_plan(plan, console=console)
+            continue
+        if result.versions:
+            set_link_root(config, result.versions[0])
+        tasks.extend((result, ver, config) for ver in result.versions)
+
+    logger.info(
+        f":thread: compiling {len(tasks)} versions of {len(results)} projects in [path]{root}[/]"
+    )
+    if jobs is None:
+        jobs = root_config.build.jobs
+    jobs = min(jobs or os.cpu_count() or 1, len(tasks))
+    if jobs <= 1:
+        # tasks are grouped by project
+        for result, project_tasks in itertools.groupby(tasks, key=lambda task: task[0]):
+            _log_project(result)
+            with span(result.name, "project", source=result.source):
+                for _, ver, config in project_tasks:
+                    if result.error:
+                        break
+                    _log_version(ver)
+                    start = time.perf_counter()
+                    try:
+                        create_version(ver, config, console=console)
+                    except (OSError, ValueError) as err:
+                        result.error = str(err)
+                    result.time += time.perf_counter() - start
+    else:
+        logger.debug(f"creating {len(tasks)} versions with {jobs} processes")
+        from concurrent.futures import ProcessPoolExecutor
+
+        log_level = logger.getEffectiveLevel()
+        plain = isinstance(console, PlainConsole)
+        options = worker_options()
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [
+                executor.submit(
+                    _build_version,
+                    ver,
+                    config,
+                    log_level,
+                    console.width,
+                    plain,
+                    options,
+                )
+                for _, ver, config in tasks
+            ]
+            for (result, ver, _), future in zip(tasks, futures):
+                if ver == result.versions[0]:
+                    _log_project(result)
+                try:
+                    worker_result, duration = future.result()
+                except (OSError, ValueError) as err:
+                    result.error = result.error or str(err)
+                    continue
+                merge_result(worker_result, console)
+                result.time += duration
+
+    print_summary(results, console=console)
+    return results
+
+
+def _log_project(result: ProjectResult) -> None:
+    logger.info(f":thread: compiling source project [name]{result.name}[/]")
+    logger.info(f"   from [path]{result.source}[/]")
+
+
+def _build_version(
+    version: int,
+    config: ConfigDict,
+    log_level: int,
+    width: int,
+    plain: bool,
+    options: dict,
+) -> tuple[WorkerResult, float]:
+    """Creates `version` in a worker process and returns the result of the
+    worker together with the time it took. `options` are passed to
+    `_create_version()` (see `parallel.worker_options()`)."""
+    start = time.perf_counter()
+    result = _create_version(version, config, log_level, width, plain, **options)
+    return result, time.perf_counter() - start
+
+
+def print_summary(results: list[ProjectResult], console: "Console" = None) -> None:
+    """Prints a table with the outcome of all projects of a batch run."""
+    from rich.table import Table
+
+    console = console or create_console()
+    table = Table(title="Summary", show_footer=True)
+    failed = sum(1 for r in results if r.error)
+    table.add_column("project", footer=f"{len(results)} projects")
+    table.add_column(
+        "versions",
+        footer=str(sum(len(r.versions) for r in results)),
+        justify="right",
+    )
+    table.add_column(
+        "time", footer=f"{sum(r.time for r in results):.2f}s", justify="right"
+    )
+    table.add_column("status", footer=f"{failed} failed" if failed else "ok")
+
+    for result in results:
+        versions = ", ".join("ML" if v == ML_INT else str(v) for v in result.versions)
+        status = f"[jml.err]{result.error}[/]" if result.error else "ok"
+        table.add_row(result.name, versions, f"{result.time:.2f}s", status)
+    console.print(table)
@@ -1,17 +1,25 @@
 # -*- coding: utf-8 -*-
 
-import importlib
+import copy
 import logging
 from collections.abc import MutableMapping, Mapping, MutableSequence, Sequence
 from pathlib import Path
 
-import toml
-
+from . import __cmdname__
 from .utils import is_url, resolve_path
 
 CONFIG_FILE = "jml.toml"
 
 
+class ConfigError(ValueError):
+    """Raised if a config contains invalid settings. `setting` describes the
+    current value of the offending setting."""
+
+    def __init__(self, message: str, setting: str = ""):
+        super().__init__(message)
+        self.setting = setting
+
+
 class ConfigDict(MutableMapping):
     def __init__(self, data=None, **kwargs):
         self._data = {}
@@ -127,10 +135,83 @@ logger = logging.getLogger("jml")
 
 
 def load_default_config() -> ConfigDict:
-    config_file = importlib.resources.files() / CONFIG_FILE
+    config_file = Path(__file__).with_name(CONFIG_FILE)
     return load_config(config_file, config_file=None)
 
 
+def load_base_config() -> ConfigDict:
+    """Loads the default config merged with the config from the users home."""
+    return load_config(Path.home() / ".config", base=load_default_config())
+
+
+def load_root_config(project_root: Path, base: ConfigDict) -> ConfigDict:
+    """Loads the config of the project root directory on top of `base`. The
+    `base` config is not changed."""
+    base = copy.deepcopy(base)
+    base["project_root"] = project_root
+    return load_config(project_root, base=base, resolve=True)
+
+
+def load_project_config(
+    source: Path,
+    base: ConfigDict,
+    options: dict | None = None,
+    project_root: Path | None = None,
+    root_config: ConfigDict | None = None,
+) -> ConfigDict:
+    """
+    Builds the complete config for the project in `source`.
+
+    The config of the project root and of the project are loaded on top of
+    `base` and the cli `options` are merged last. If `root_config` is given,
+    a copy of it is used instead of loading the project root config again.
+
+    Raises:
+        ConfigError: If the config contains invalid settings.
+    """
+    project_config = load_config(source, resolve=True) or ConfigDict()
+    if project_root:
+        project_root = resolve_path(project_root)
+    elif project_config.get("project_root"):
+        project_root = resolve_path(project_config["project_root"])
+    else:
+        project_root = source.parent
+
+    if root_config is None:
+        config = load_root_config(project_root, base)
+    else:
+        config = copy.deepcopy(root_config)
+    config.merge(project_config)
+    config.merge(load_options_config(options or {}))
+
+    if not config["name"]:
+        config["name"] = source.name
+    config["source_dir"] = source
+
+    if config.tasks.open == config.tasks.close:
+        raise ConfigError(
+            "opening and closing task tags need to be unique",
+            f"`{config.tasks.open}` / `{config.tasks.close}`",
+        )
+    if config.solutions.open == config.solutions.close:
+        raise ConfigError(
+            "opening and closing solution tags need to be unique",
+            f"`{config.solutions.open}` / `{config.solutions.close}`",
+        )
+
+    if not config["output_dir"]:
+        config["output_dir"] = source.parent / __cmdname__
+    output_dir = config["output_dir"] = resolve_path(config["output_dir"])
+    if output_dir.is_relative_to(source):
+        raise ConfigError(
+            "output directory may not be inside the project folder", str(output_dir)
+        )
+
+    if source.parent.is_relative_to(project_root):
+        config["output_dir"] = output_dir / source.parent.relative_to(project_root)
+    return config
+
+
 def load_config(
     path: Path,
     config_file: str = CONFIG_FILE,
@@ -142,6 +223,8 @@ def load_config(
 
     config = ConfigDict()
     if path.exists():
+        import toml
+
         config = ConfigDict(toml.load(path))
         logger.debug(f"loaded config from [path]{path}[/]")
         config = resolve_source_sets(config, base=base)
@@ -234,6 +317,12 @@ def load_options_config(options: dict) -> ConfigDict:
             elif k == "create_zip" and v:
                 options_config.ensure_dict("zip")
                 options_config.zip.create = True
+            elif k in ("single_pass", "incremental") and v:
+                options_config.ensure_dict("build")
+                options_config.build[k] = True
+            elif k in ("jobs", "threads", "link"):
+                options_config.ensure_dict("build")
+                options_config.build[k] = v
             elif k == "delete_solution" and v:
                 options_config.ensure_dict("solutions")
                 options_config.solutions.delete = True
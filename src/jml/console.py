@@ -1,20 +1,157 @@
-from rich.console import Console
-from rich.theme import Theme
-
-console_theme = Theme(
-    {
-        "jml.path": "cyan",
-        "jml.file": "purple bold",
-        "jml.name": "yellow bold",
-        "jml.ver": "orange1 bold",
-        "jml.err": "red bold",
-        #
-        "repr.number": "",
-        "repr.number_complex": "",
-        "repr.path": "cyan",
-        "repr.filename": "cyan",
-    },
+"""Consoles for the output of jml.
+
+`rich` is only imported when a rich console is created. If the output is
+not a terminal (e.g. in CI logs), a `PlainConsole` writes the messages as
+plain text without loading `rich` at all.
+"""
+
+import io
+import logging
+import re
+import sys
+import typing as t
+
+if t.TYPE_CHECKING:
+    from rich.console import Console
+
+# emoji codes used in the messages of jml
+EMOJI_CODES = ("cross_mark", "thread")
+
+# rich markup tags like [bold] or [/] (lowercase, like rich) and emoji codes
+RE_MARKUP = re.compile(
+    r"\[/?[a-z#@][^\[\]\n]*\]|\[/\]|" + "|".join(f":{code}:" for code in EMOJI_CODES)
 )
 
+console_styles = {
+    "jml.path": "cyan",
+    "jml.file": "purple bold",
+    "jml.name": "yellow bold",
+    "jml.ver": "orange1 bold",
+    "jml.err": "red bold",
+    #
+    "repr.number": "",
+    "repr.number_complex": "",
+    "repr.path": "cyan",
+    "repr.filename": "cyan",
+}
+
+
+class PlainConsole:
+    """
+    A minimal replacement for `rich.console.Console` that writes plain text.
+
+    Markup and emoji codes are removed from strings. Other objects (like
+    tables) are rendered with `rich` without styles.
+
+    Args:
+        file (TextIO): File to write to. Defaults to the current `sys.stdout`.
+        width (int): Width for rules and rendered objects.
+    """
+
+    def __init__(self, file: t.TextIO = None, width: int = None):
+        self._file = file
+        self.width = width or 80
+
+    @property
+    def file(self) -> t.TextIO:
+        return self._file or sys.stdout
+
+    def print(
+        self, *objects: t.Any, sep: str = " ", end: str = "\n", markup=True, **kwargs
+    ) -> None:
+        texts = []
+        for obj in objects:
+            if isinstance(obj, str):
+                texts.append(strip_markup(obj) if markup else obj)
+            else:
+                texts.append(self._render(obj))
+        self.file.write(sep.join(texts) + end)
+
+    def rule(self, title: str = "", **kwargs) -> None:
+        self.file.write(f" {strip_markup(title)} ".center(self.width, "-") + "\n")
+
+    def _render(self, obj: t.Any) -> str:
+        from rich.console import Console
+
+        console = Console(file=io.StringIO(), width=self.width, color_system=None)
+        console.print(obj)
+        return console.file.getvalue().rstrip("\n")
+
+
+class PlainHandler(logging.Handler):
+    """Log handler that prints messages to a `PlainConsole`."""
+
+    def __init__(self, console: PlainConsole):
+        super().__init__()
+        self.console = console
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self.console.print(f"{record.levelname:<8} {self.format(record)}")
+        except Exception:
+            self.handleError(record)
+
+
+def strip_markup(text: str) -> str:
+    """Removes rich markup and emoji codes from `text`."""
+    return RE_MARKUP.sub("", text)
+
+
+def use_plain_output(file: t.TextIO = None) -> bool:
+    """Plain output is used if `file` (by default stdout) is not a terminal."""
+    try:
+        return not (file or sys.stdout).isatty()
+    except (AttributeError, ValueError):
+        return True
+
+
+def create_console(
+    plain: bool | None = None, **options
+) -> t.Union["Console", PlainConsole]:
+    """Creates a console with the jml theme. `options` are passed to `Console`.
+
+    If `plain` is set (by default if the output is not a terminal), a
+    `PlainConsole` is returned instead."""
+    if plain is None:
+        plain = use_plain_output()
+    if plain:
+        return PlainConsole(file=options.get("file"), width=options.get("width"))
+
+    from rich.console import Console
+    from rich.theme import Theme
+
+    return Console(theme=Theme(console_styles), highlight=False, **options)
+
+
+def capture_console(
+    width: int = None, plain: bool = False
+) -> t.Union["Console", PlainConsole]:
+    """Creates a console that records its output into a string buffer,
+    e.g. to collect the output of worker processes. The output can be
+    retrieved from `console.file.getvalue()` and includes ANSI styles,
+    unless `plain` is set."""
+    return create_console(
+        plain=plain,
+        file=io.StringIO(),
+        width=width,
+        force_terminal=True,
+        color_system="truecolor",
+    )
+
+
+def print_output(console: t.Union["Console", PlainConsole], output: str) -> None:
+    """Prints the `output` recorded by a console from `capture_console()`."""
+    if isinstance(console, PlainConsole):
+        console.file.write(output)
+    else:
+        from rich.text import Text
+
+        console.print(Text.from_ansi(output), soft_wrap=True)
+
 
-console = Console(theme=console_theme, highlight=False)
+def __getattr__(name: str) -> t.Any:
+    # the shared console is created on first use
+    if name == "console":
+        globals()["console"] = create_console()
+        return globals()["console"]
+    raise AttributeError(name)
@@ -0,0 +1,245 @@
+"""Structured events of a build.
+
+Instead of formatting a log message for every file, the build steps emit
+events with `emit()`. An event is a dict with its kind, the name of the
+version and the raw values (like paths). The enabled reporters decide
+what to do with an event and format it only if it is shown:
+
+- `LogReporter` (default) logs a line for every file, if the logger is
+  enabled for the level of the line.
+- `SummaryReporter` (`--quiet`) counts the files of a version by status
+  and prints one line per version.
+- `JsonLinesReporter` (`--events`) writes every event as one line of JSON,
+  e.g. for CI pipelines.
+
+Worker processes enable the reporters given by `worker_options()` and
+return the events for the JSON stream to the main process (see
+`merge_events()`).
+"""
+
+import json
+import logging
+import threading
+import time
+import typing as t
+from collections import Counter
+from pathlib import Path
+
+if t.TYPE_CHECKING:
+    from rich.console import Console
+
+# Kinds of events
+VERSION_START = "version_start"
+VERSION_DONE = "version_done"
+FILE = "file"
+# an additional file from the `files` config
+EXTRA_FILE = "extra_file"
+ZIP = "zip"
+
+# Status of a file in an incremental build that was deleted from the source
+DELETED = "deleted"
+
+logger = logging.getLogger("jml")
+
+
+class Reporter:
+    """Base class for the receivers of build events."""
+
+    def handle(self, event: dict) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class LogReporter(Reporter):
+    """Logs a line for every file of a version."""
+
+    def handle(self, event: dict) -> None:
+        kind = event["event"]
+        if kind == FILE:
+            status = event["status"]
+            level = logging.DEBUG if status == "skip" else logging.INFO
+            if logger.isEnabledFor(level):
+                logger.log(level, self.format_file(event))
+        elif kind == EXTRA_FILE and logger.isEnabledFor(logging.INFO):
+            path = Path(event["version"]) / event["path"]
+            logger.info(f"{'':>32} [green bold]->[/] {path!s}")
+
+    def format_file(self, event: dict) -> str:
+        relpath, status = event["path"], event["status"]
+        if status == "skip":
+            return f"[jml.file]{relpath!s:>32}[/] [red bold]X[/]  (skipped)"
+        elif status in ("exclude", DELETED):
+            note = "" if status == "exclude" else "  (deleted)"
+            return f"[jml.file]{relpath!s:>32}[/] [red bold]X[/]{note}"
+        elif status == "empty":
+            return f"[jml.file]{relpath!s:>32}[/] [red bold]X[/]  (empty)"
+
+        outpath = Path(event["version"]) / relpath
+        arrow = "!>" if status in ("compile", "verbatim") else "->"
+        color = "yellow" if arrow == "!>" else "green"
+        return f"[jml.file]{relpath!s:>32}[/] [{color} bold]{arrow}[/] [jml.path]{outpath!s}[/]"
+
+
+class CountingReporter(Reporter):
+    """Counts the files of each version by status. The counts are added to
+    the `version_done` event as `files`."""
+
+    def __init__(self):
+        self.counts: dict[str, Counter] = {}
+        self._lock = threading.Lock()
+
+    def handle(self, event: dict) -> None:
+        kind = event["event"]
+        if kind in (FILE, EXTRA_FILE):
+            status = event.get("status", EXTRA_FILE)
+            with self._lock:
+                self.counts.setdefault(event["version"], Counter())[status] += 1
+        elif kind == VERSION_DONE:
+            with self._lock:
+                counts = self.counts.pop(event["version"], {})
+            # another reporter might have counted the files already
+            event.setdefault("files", dict(counts))
+
+
+class SummaryReporter(CountingReporter):
+    """
+    Prints the number of files by status for each version to `console`,
+    instead of logging a line for every file.
+
+    Args:
+        console (Console): The console to print to.
+    """
+
+    def __init__(self, console: "Console" = None):
+        super().__init__()
+        self.console = console
+
+    def handle(self, event: dict) -> None:
+        super().handle(event)
+        if event["event"] == VERSION_DONE:
+            counts = event["files"]
+            summary = ", ".join(
+                f"{count} {status.replace('_', ' ')}"
+                for status, count in sorted(counts.items())
+            )
+            self.console.print(
+                f"  [jml.ver]{event['version']}[/]: {sum(counts.values())} files"
+                + (f" ({summary})" if summary else "")
+            )
+
+
+class EventCollector(CountingReporter):
+    """Keeps all events, e.g. to return them from a worker process."""
+
+    def __init__(self):
+        super().__init__()
+        self.events: list[dict] = []
+
+    def handle(self, event: dict) -> None:
+        super().handle(event)
+        with self._lock:
+            self.events.append(event)
+
+
+class JsonLinesReporter(CountingReporter):
+    """
+    Writes every event as one line of JSON to `file`.
+
+    Args:
+        file (TextIO): The file to write to. It is closed with the reporter.
+    """
+
+    def __init__(self, file: t.TextIO):
+        super().__init__()
+        self.file = file
+
+    def handle(self, event: dict) -> None:
+        super().handle(event)
+        self.write(event)
+
+    def write(self, event: dict) -> None:
+        line = json.dumps(event, default=str)
+        with self._lock:
+            self.file.write(line + "\n")
+
+    def close(self) -> None:
+        self.file.close()
+
+
+# reporters of this process
+_reporters: list[Reporter] = [LogReporter()]
+
+
+def set_reporters(*reporters: Reporter) -> None:
+    """Replaces the reporters of this process."""
+    global _reporters
+    _reporters = list(reporters)
+
+
+def get_reporters() -> list[Reporter]:
+    return _reporters
+
+
+def emit(kind: str, version: str, **values: t.Any) -> None:
+    """Sends an event of `kind` for `version` with the given `values` to
+    all reporters."""
+    if not _reporters:
+        return
+    event = {"event": kind, "version": version, "time": time.time(), **values}
+    for reporter in _reporters:
+        reporter.handle(event)
+
+
+def enable_reporters(
+    quiet: bool = False, file: t.TextIO = None, console: "Console" = None
+) -> None:
+    """Reports the events of this process with a `SummaryReporter` on
+    `console`, if `quiet` is set, or a `LogReporter` and writes them to the
+    JSON-lines `file`, if given."""
+    if quiet:
+        from .console import create_console
+
+        reporters = [SummaryReporter(console or create_console())]
+    else:
+        reporters = [LogReporter()]
+    if file is not None:
+        reporters.append(JsonLinesReporter(file))
+    set_reporters(*reporters)
+
+
+def close_reporters() -> None:
+    for reporter in _reporters:
+        reporter.close()
+
+
+def worker_options() -> dict[str, bool]:
+    """Returns the options for `enable_worker_reporters()` to report the
+    events of a worker process like the reporters of this process."""
+    return {
+        "quiet": any(isinstance(r, SummaryReporter) for r in _reporters),
+        "collect": any(isinstance(r, JsonLinesReporter) for r in _reporters),
+    }
+
+
+def enable_worker_reporters(
+    quiet: bool = False, collect: bool = False, console: "Console" = None
+) -> EventCollector | None:
+    """Sets the reporters of a worker process, which prints to `console`.
+    If `collect` is set, the events are collected by the returned
+    `EventCollector`."""
+    enable_reporters(quiet=quiet, console=console)
+    if collect:
+        collector = EventCollector()
+        _reporters.append(collector)
+        return collector
+    return None
+
+
+def merge_events(events: list[dict]) -> None:
+    """Writes the `events` of a worker process to the JSON stream."""
+    for reporter in _reporters:
+        if isinstance(reporter, JsonLinesReporter):
+            for event in events:
+                reporter.write(event)
@@ -0,0 +1,210 @@
+"""Executes the build plan of a version (see `jml.plan`).
+
+The operations of a plan run after the operations they depend on. With
+`build.threads` greater than one, independent operations run concurrently
+in a pool of threads. Results are reported in the order of the plan, so
+the output does not depend on the number of threads.
+"""
+
+import contextlib
+import logging
+import tempfile
+import typing as t
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from .console import create_console
+from .events import EXTRA_FILE, VERSION_DONE, VERSION_START, ZIP, emit
+from .plan import DELETE, LINK, MKDIR, Operation, VersionPlan
+from .stats import get_stats, phase
+from .trace import get_tracer, span
+from .utils import files, resolve_path
+from .utils.zips import ZipSink
+from .versions import (
+    COPY,
+    build_file,
+    files_cache,
+    log_file,
+    measure_file,
+    process_file,
+    relp,
+)
+
+if t.TYPE_CHECKING:
+    from rich.console import Console
+
+logger = logging.getLogger("jml")
+
+
+def run_operations(
+    operations: list[Operation], func: t.Callable[[Operation], t.Any], threads: int = 1
+) -> t.Iterator:
+    """Calls `func` for all `operations` after the operations they depend
+    on, using up to `threads` threads. The results are yielded in the order
+    of `operations`.
+
+    The operations of a plan only depend on earlier operations, so they can
+    simply be run in order without threads.
+    """
+    if threads <= 1:
+        yield from map(func, operations)
+        return
+
+    futures = []
+
+    def run(op: Operation) -> t.Any:
+        # earlier operations were taken from the queue before this one
+        for index in op.after:
+            futures[index].result()
+        return func(op)
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for op in operations:
+            futures.append(executor.submit(run, op))
+        for future in futures:
+            yield future.result()
+
+
+def execute_version(vplan: VersionPlan, console: "Console" = None) -> set[int]:
+    """Runs the operations of `vplan` and returns the version numbers
+    discovered in the compiled files (see `versions.create_version()`)."""
+    console = console or create_console()
+    vconfig = vplan.settings
+
+    console.print(
+        f"creating version [jml.ver]{vconfig.name}[/] in [jml.path]{relp(vconfig.output_dir, vconfig)}[/]"
+    )
+    emit(
+        VERSION_START,
+        vconfig.name,
+        project=vconfig.project_name,
+        output_dir=vconfig.output_dir,
+    )
+
+    with contextlib.ExitStack() as stack:
+        sink = None
+        if vplan.zip_path is not None:
+            sink = ZipSink(vplan.zip_path)
+        build = _Build(vplan, sink, stack)
+
+        versions = set()
+        operations = vplan.operations
+        results = run_operations(operations, build, threads=vconfig.build.threads)
+        for op, result in zip(operations, results):
+            if discovered := build.report(op, result):
+                versions = versions.union(discovered)
+    emit(VERSION_DONE, vconfig.name)
+
+    if not versions:
+        versions.add(0)
+    return versions
+
+
+class _Build:
+    """Runs and reports the operations of one version plan."""
+
+    def __init__(
+        self, vplan: VersionPlan, sink: ZipSink | None, stack: contextlib.ExitStack
+    ):
+        self.vplan = vplan
+        self.vconfig = vplan.settings
+        self.sink = sink
+        self._stack = stack
+        self._cache = None
+        self._tmp_dir = None
+        if get_stats() is None and get_tracer() is None:
+            self.build_file = build_file
+        else:
+            self.build_file = measure_file
+
+    def __call__(self, op: Operation) -> t.Any:
+        vconfig = self.vconfig
+        if op.kind == DELETE:
+            with phase("cleanup", vconfig.name):
+                files.remove_path(op.target)
+        elif op.kind == MKDIR:
+            if op.target == vconfig.output_dir and op.target.is_dir():
+                return False
+            files.make_dirs(op.target)
+            return True
+        elif op.kind == ZIP:
+            return self.zip(op)
+        elif op.entry is not None:
+            with phase("files", vconfig.name):
+                return self.extra_file(op)
+        else:
+            action = COPY if op.kind == LINK else op.kind
+            return self.build_file(
+                vconfig.no, op.source, action, vconfig, sink=self.sink
+            )
+
+    def extra_file(self, op: Operation) -> Path | None:
+        """Processes an additional file from the `files` config and returns
+        its path relative to the version."""
+        if self._cache is None:
+            self._cache = files_cache(self.vconfig)
+        output_dir = self.vconfig.output_dir
+        if self.sink is not None:
+            # files are read from the temporary directory when closing
+            if self._tmp_dir is None:
+                self._tmp_dir = Path(
+                    self._stack.enter_context(tempfile.TemporaryDirectory())
+                )
+            output_dir = self._tmp_dir
+
+        file = dict(
+            op.entry,
+            source_path=resolve_path(op.entry["source"]),
+            target_path=resolve_path(op.entry["name"], root=output_dir),
+        )
+        logger.debug(f"processing [jml.path]{file['name']}[/]")
+        if processed := process_file(file, self.vconfig, cache=self._cache):
+            relpath = processed.relative_to(output_dir)
+            if self.sink is not None:
+                self.sink.copy(processed, relpath)
+            return relpath
+        return None
+
+    def zip(self, op: Operation) -> Path | OSError:
+        vconfig = self.vconfig
+        with phase("zip", vconfig.name), span(op.target.name, "zip"):
+            if self.sink is not None:
+                self.sink.close()
+                return self.sink.path
+            try:
+                return files.create_zip(op.source, dest=vconfig.zip.dir)
+            except OSError as oserr:
+                return oserr
+
+    def report(self, op: Operation, result: t.Any) -> set[int] | None:
+        """Reports the `result` of `op` and returns the version numbers
+        discovered in a compiled file."""
+        vconfig = self.vconfig
+        if op.kind == DELETE:
+            if vconfig.is_ml and vconfig.solutions.delete:
+                logger.info(
+                    f"removed solution directory at [jml.path]{relp(op.target, vconfig)}[/]"
+                )
+            else:
+                logger.info(
+                    f"removed target directory [jml.path]{relp(op.target, vconfig)}[/]"
+                )
+        elif op.kind == MKDIR:
+            if result and op.target == vconfig.output_dir:
+                logger.info(
+                    f"created target directory [jml.path]{relp(op.target, vconfig)}[/]"
+                )
+        elif op.kind == ZIP:
+            if isinstance(result, OSError):
+                logger.warning(f"failed to create zip: [jml.err]{result.strerror}[/]")
+            elif result is not None:
+                logger.info(f"created zip file at [jml.path]{relp(result, vconfig)}[/]")
+                emit(ZIP, vconfig.name, path=result)
+        elif op.entry is not None:
+            if result is not None:
+                emit(EXTRA_FILE, vconfig.name, path=result)
+        else:
+            (relpath, status), versions = result
+            log_file(relpath, status, vconfig)
+            return versions
+        return None
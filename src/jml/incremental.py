@@ -0,0 +1,352 @@
+"""Incremental builds based on a build manifest.
+
+The manifest is stored as a json file in the output root of a project. It
+records the size, modification time and hash of each file in the source
+together with a hash of the configuration that was used to build the
+project versions. On the next run only files that were changed, added or
+deleted since then are compiled, copied or removed in each version. Additional
+files from the `files` config are only processed again if their local source
+changed, and zip files are updated by compressing only the changed entries.
+"""
+
+import hashlib
+import json
+import logging
+import typing as t
+from collections.abc import Iterable, Mapping
+from pathlib import Path
+
+from jml import __version__
+
+from .config import ConfigDict
+from .console import create_console
+from .events import DELETED, VERSION_DONE, VERSION_START, emit
+from .markers import ML_INT, is_verbatim, parse
+from .parallel import run_versions
+from .settings import VersionSettings
+from .utils import files, is_url, resolve_path
+from .versions import (
+    COMPILE,
+    EXCLUDE,
+    SKIP,
+    build_file,
+    decode_source,
+    discard_solution,
+    finalize_version,
+    log_file,
+    map_files,
+    prepare_version,
+    relp,
+    select_versions,
+    set_link_root,
+    walk_sources,
+)
+
+if t.TYPE_CHECKING:
+    from rich.console import Console
+
+MANIFEST_FORMAT = 1
+
+# config keys that do not change the output of a build
+VOLATILE_KEYS = ("build", "dry_run", "link_root")
+
+logger = logging.getLogger("jml")
+
+
+def manifest_path(config: ConfigDict) -> Path:
+    """Returns the path of the manifest file for the project in `config`."""
+    return config.output_dir / f".{config.name}.jml-manifest.json"
+
+
+def load_manifest(path: Path) -> dict | None:
+    """Loads the manifest at `path`. Returns `None` if there is no manifest
+    or it can not be used with this version of jml."""
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("format") != MANIFEST_FORMAT:
+        return None
+    return manifest
+
+
+def save_manifest(path: Path, manifest: dict) -> None:
+    files.make_dirs(path.parent)
+    with files.open_path(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+
+
+def config_hash(config: Mapping) -> str:
+    """Computes a hash of all config options that affect the output of a
+    build, e.g. the tags, transforms and source patterns."""
+    relevant = {k: v for k, v in config.items() if k not in VOLATILE_KEYS}
+    data = json.dumps([__version__, _to_json(relevant)], sort_keys=True, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def _to_json(value: object) -> object:
+    if isinstance(value, Mapping):
+        return {str(k): _to_json(v) for k, v in value.items()}
+    elif isinstance(value, (set, frozenset)):
+        return sorted(_to_json(v) for v in value)
+    elif isinstance(value, (list, tuple)):
+        return [_to_json(v) for v in value]
+    elif isinstance(value, Path):
+        return str(value)
+    return value
+
+
+def scan_files(
+    config: ConfigDict, previous: Mapping[str, dict], mlconfig: ConfigDict
+) -> tuple[dict[str, dict], dict[str, str]]:
+    """Scans the source directory and compares each file to its entry in the
+    `previous` manifest.
+
+    Files with the same size and modification time are considered unchanged.
+    Otherwise the content hash is compared. Changed files to compile are
+    parsed with the tags of `mlconfig` to discover their versions.
+
+    Returns the new file entries for the manifest and a dict with the
+    changed and added files, mapped to their actions.
+    """
+    current, changed = {}, {}
+    for _, entries in walk_sources(config):
+        for relpath, action in entries:
+            key = relpath.as_posix()
+            fullpath = config.source_dir / relpath
+            stat = fullpath.stat()
+
+            old = previous.get(key)
+            if (
+                old
+                and old["action"] == action
+                and old["size"] == stat.st_size
+                and old["mtime"] == stat.st_mtime_ns
+            ):
+                current[key] = old
+                continue
+
+            entry = {
+                "action": action,
+                "size": stat.st_size,
+                "mtime": stat.st_mtime_ns,
+                "versions": [],
+            }
+            if action == COMPILE:
+                data = fullpath.read_bytes()
+                entry["hash"] = hashlib.sha1(data).hexdigest()
+                if (not old or old["hash"] != entry["hash"]) and not is_verbatim(
+                    data, mlconfig, encoding=config.sources.encoding
+                ):
+                    text = decode_source(data, config)
+                    entry["versions"] = sorted(parse(text, mlconfig).versions)
+            else:
+                entry["hash"] = files.file_hash(fullpath)
+
+            if old and old["action"] == action and old["hash"] == entry["hash"]:
+                # only touched
+                entry["versions"] = old["versions"]
+            elif action not in (SKIP, EXCLUDE):
+                changed[key] = action
+            current[key] = entry
+    return current, changed
+
+
+def scan_extras(config: ConfigDict) -> dict[str, list[int]]:
+    """Returns the size and modification time of each local source of the
+    `files` config of the project and its versions."""
+    entries = list(config.get("files", []))
+    for vcfg in config.get("versions", []):
+        entries.extend(vcfg.get("files", []))
+
+    extras = {}
+    for entry in entries:
+        if not is_url(entry["source"]):
+            source = resolve_path(entry["source"])
+            try:
+                stat = source.stat()
+            except OSError:
+                continue
+            extras[str(source)] = [stat.st_size, stat.st_mtime_ns]
+    return extras
+
+
+def changed_extras(
+    vconfig: VersionSettings,
+    touched: t.Container[str],
+    previous: Mapping[str, list[int]],
+    current: Mapping[str, list[int]],
+) -> list[dict]:
+    """Returns the entries of the `files` config of a version that need to be
+    processed again: entries whose local source changed since the `previous`
+    build, whose target is missing or whose target was `touched` by the
+    update of a source file (additional files overwrite source files)."""
+    entries = []
+    for entry in vconfig.files:
+        target = resolve_path(entry["name"], root=vconfig.output_dir)
+        if not target.exists():
+            entries.append(entry)
+        elif (
+            target.is_relative_to(vconfig.output_dir)
+            and target.relative_to(vconfig.output_dir).as_posix() in touched
+        ):
+            entries.append(entry)
+        elif not is_url(entry["source"]):
+            key = str(resolve_path(entry["source"]))
+            if previous.get(key) != current.get(key):
+                entries.append(entry)
+    return entries
+
+
+def create_incremental(
+    config: ConfigDict,
+    versions: Iterable[int] = None,
+    console: "Console" = None,
+) -> set[int]:
+    """Creates the solution and project versions incrementally.
+
+    If a manifest of an earlier build with the same configuration and the
+    same versions exists, only the files that changed since then are
+    updated in the existing version directories. Otherwise all versions are
+    built from scratch. In both cases a new manifest is written.
+
+    Returns the set of discovered version numbers.
+    """
+    path = manifest_path(config)
+    discovered, manifest = build_incremental(
+        config, load_manifest(path), versions=versions, console=console
+    )
+    if manifest is not None:
+        save_manifest(path, manifest)
+    return discovered
+
+
+def build_incremental(
+    config: ConfigDict,
+    manifest: dict | None,
+    versions: Iterable[int] = None,
+    console: "Console" = None,
+) -> tuple[set[int], dict | None]:
+    """Updates the solution and project versions based on the `manifest` of
+    the previous build (see `create_incremental()`).
+
+    Returns the set of discovered version numbers and the manifest for the
+    new build.
+    """
+    console = console or create_console()
+
+    mlconfig = prepare_version(ML_INT, config)
+    if mlconfig is None:
+        return set(), None
+
+    chash = config_hash(config)
+    if manifest and manifest["config"] != chash:
+        logger.info("configuration changed since the last build")
+        manifest = None
+    previous = manifest["files"] if manifest else {}
+    previous_extras = manifest.get("extras", {}) if manifest else {}
+
+    current, changed = scan_files(config, previous, mlconfig)
+    deleted = {
+        key: entry["action"]
+        for key, entry in previous.items()
+        if key not in current and entry["action"] not in (SKIP, EXCLUDE)
+    }
+
+    discovered = set()
+    for entry in current.values():
+        discovered.update(entry["versions"])
+    if not discovered:
+        discovered.add(0)
+    discovered, generate_versions = select_versions(discovered, versions)
+
+    build_versions = sorted(generate_versions)
+    if not mlconfig.solutions.delete:
+        build_versions.insert(0, ML_INT)
+    if build_versions:
+        set_link_root(config, build_versions[0])
+    targets = [prepare_version(ver, config) for ver in build_versions]
+    targets = [vconfig for vconfig in targets if vconfig is not None]
+    extras = scan_extras(config)
+
+    if (
+        manifest is None
+        or manifest["versions"] != sorted(generate_versions)
+        or config.zip.only_zip
+        or not all(vconfig.output_dir.is_dir() for vconfig in targets)
+    ):
+        logger.info(":thread: no usable build manifest found, building all versions")
+        if mlconfig.solutions.delete:
+            discard_solution(mlconfig)
+        run_versions(build_versions, config, jobs=config.build.jobs, console=console)
+    else:
+        touched = changed.keys() | deleted.keys()
+        updates = [
+            (vconfig, changed_extras(vconfig, touched, previous_extras, extras))
+            for vconfig in targets
+        ]
+        if not changed and not deleted and not any(e for _, e in updates):
+            console.print(f"all versions of [jml.name]{config.name}[/] are up to date")
+        else:
+            logger.info(
+                f":thread: updating {len(changed)} changed and {len(deleted)} deleted files"
+            )
+            for vconfig, entries in updates:
+                update_version(
+                    vconfig, changed, deleted, extras=entries, console=console
+                )
+
+    return discovered, {
+        "format": MANIFEST_FORMAT,
+        "config": chash,
+        "versions": sorted(generate_versions),
+        "files": current,
+        "extras": extras,
+    }
+
+
+def update_version(
+    vconfig: VersionSettings,
+    changed: Mapping[str, str],
+    deleted: Mapping[str, str],
+    extras: Iterable[dict] = None,
+    console: "Console" = None,
+) -> None:
+    """Updates the existing output directory of a version with the `changed`
+    and `deleted` files of the source.
+
+    Only the additional files in `extras` are processed again (by default
+    all entries of the `files` config). An existing zip file is updated by
+    compressing only the changed files."""
+    console = console or create_console()
+    console.print(
+        f"updating version [jml.ver]{vconfig.name}[/] in [jml.path]{relp(vconfig.output_dir, vconfig)}[/]"
+    )
+    emit(
+        VERSION_START,
+        vconfig.name,
+        project=vconfig.project_name,
+        output_dir=vconfig.output_dir,
+    )
+
+    def changed_files():
+        for key, action in sorted(changed.items()):
+            relpath = Path(key)
+            files.make_dirs((vconfig.output_dir / relpath).parent)
+            yield relpath, action
+
+    results = map_files(
+        lambda entry: build_file(vconfig.no, *entry, vconfig),
+        changed_files(),
+        threads=vconfig.build.threads,
+    )
+    for (relpath, status), _ in results:
+        log_file(relpath, status, vconfig)
+
+    for key in sorted(deleted):
+        files.remove_path(vconfig.output_dir / key)
+        log_file(Path(key), DELETED, vconfig)
+
+    finalize_version(vconfig, changed=changed.keys(), extras=extras)
+    emit(VERSION_DONE, vconfig.name)
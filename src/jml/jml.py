@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 
 import logging
+import sys
 from datetime import datetime
 from pathlib import Path
 
@@ -9,14 +10,9 @@ import click
 # Current version number
 from jml import __cmdname__, __version__
 
-from .config import (
-    load_config,
-    load_default_config,
-    load_options_config,
-)
-from .console import console
-from .utils import configure_logger, resolve_path, files
-from .versions import create_solution, create_version
+# modules for the build are imported in cli(), so --help and --version
+# start fast
+from .utils import files
 
 
 @click.command(
@@ -142,7 +138,83 @@ from .versions import create_solution, create_version
     "--delete-solution",
     "--no-ml",
     is_flag=True,
-    help="Keinen Musterlösung erstellen. Beachte, dass die Musterlösung immer erstellt wird, um die zu erstellenden Projektversionen zu ermitteln. Diese Option löscht den Ordner am Ende wieder.",
+    help="Keine Musterlösung erstellen. Ein vorhandener Ordner der Musterlösung wird gelöscht.",
+)
+@click.option(
+    "--list-versions",
+    is_flag=True,
+    help="Listet die Projektversionen auf, die im Basisprojekt markiert sind, ohne Dateien zu schreiben.",
+)
+@click.option(
+    "--batch",
+    is_flag=True,
+    help="Behandelt IN als Wurzelverzeichnis und erstellt die Projektversionen aller Projekte darin, die eine jml.toml enthalten. Die Konfigurationen werden nur einmal geladen und alle Projekte teilen sich die Prozesse aus --jobs.",
+)
+@click.option(
+    "--single-pass",
+    is_flag=True,
+    help="Liest jede Datei des Basisprojekts nur einmal und schreibt die Musterlösung und alle Projektversionen in einem Durchlauf.",
+)
+@click.option(
+    "--incremental",
+    is_flag=True,
+    help="Aktualisiert nur die seit dem letzten Durchlauf geänderten, neuen und gelöschten Dateien in den Projektversionen. Der Stand wird in einer Manifest-Datei im Zielordner gespeichert.",
+)
+@click.option(
+    "-w",
+    "--watch",
+    "watch_source",
+    is_flag=True,
+    help="Überwacht das Basisprojekt nach dem Erstellen der Projektversionen auf Änderungen und aktualisiert die geänderten Dateien in allen Projektversionen. Impliziert --incremental.",
+)
+@click.option(
+    "-j",
+    "--jobs",
+    metavar="N",
+    type=int,
+    help="Anzahl der Prozesse, mit denen die Projektversionen parallel erstellt werden. 0 nutzt alle Prozessoren. Standard: 1",
+)
+@click.option(
+    "--threads",
+    metavar="N",
+    type=int,
+    help="Anzahl der Threads, mit denen die Dateien einer Projektversion parallel kompiliert und kopiert werden. Standard: 1",
+)
+@click.option(
+    "--link",
+    type=click.Choice(files.LINK_MODES),
+    help="Legt fest, wie Dateien, die nicht kompiliert werden, in die Projektversionen übernommen werden. Mit hardlink oder reflink teilen sich alle Versionen eine Kopie der Datei. Standard: copy",
+)
+@click.option(
+    "-q",
+    "--quiet",
+    is_flag=True,
+    help="Gibt statt einer Zeile für jede Datei nur die Anzahl der Dateien pro Version aus.",
+)
+@click.option(
+    "--events",
+    "events_file",
+    metavar="FILE",
+    help="Schreibt alle Ereignisse des Durchlaufs (Versionen, Dateien, Zip-Dateien) als JSON-Zeilen in FILE, z.B. zur Auswertung in CI-Pipelines. Mit - werden sie auf der Standardausgabe ausgegeben und alle anderen Ausgaben auf der Standardfehlerausgabe.",
+    type=click.Path(dir_okay=False, writable=True, allow_dash=True, path_type=str),
+)
+@click.option(
+    "--stats",
+    is_flag=True,
+    help="Zeigt nach dem Durchlauf eine Statistik mit der Laufzeit (Wall- und CPU-Zeit) der einzelnen Phasen pro Version, der Anzahl der Dateien, Bytes und Zeilen sowie den langsamsten Dateien an.",
+)
+@click.option(
+    "--stats-json",
+    metavar="FILE",
+    help="Schreibt die Statistik zusätzlich als JSON in FILE. Impliziert --stats.",
+    type=click.Path(dir_okay=False, writable=True, path_type=Path),
+)
+@click.option(
+    "--trace",
+    "trace_file",
+    metavar="FILE",
+    help="Zeichnet den zeitlichen Ablauf (Projekte, Versionen, Dateien, Downloads und Zip-Dateien je Prozess und Thread) auf und schreibt ihn im Chrome Trace Event Format in FILE. Die Datei kann in Perfetto oder chrome://tracing geöffnet werden.",
+    type=click.Path(dir_okay=False, writable=True, path_type=Path),
 )
 @click.option(
     "--debug",
@@ -159,7 +231,7 @@ from .versions import create_solution, create_version
 @click.option(
     "--dry-run",
     is_flag=True,
-    help="Führt keine Operationen aus, sondern zeigt nur an, welche Änderungen vorgenommen würden. Impliziert --debug.",
+    help="Führt keine Operationen aus, sondern zeigt nur den Plan der Operationen (Löschen, Kompilieren, Kopieren, Verlinken, Herunterladen, Zippen) an, ohne Dateien zu schreiben.",
 )
 @click.pass_context
 def cli(
@@ -172,9 +244,37 @@ def cli(
     debug: bool,
     log_level: int,
     dry_run: bool,
+    watch_source: bool,
+    list_versions: bool,
+    batch: bool,
+    quiet: bool,
+    events_file: str,
+    stats: bool,
+    stats_json: Path,
+    trace_file: Path,
     #
     **options,
 ) -> None:
+    from .config import ConfigError, load_base_config, load_project_config
+    from .console import create_console, use_plain_output
+    from .stats import enable_stats, phase, report_stats
+    from .trace import enable_tracing, span, write_trace
+    from .utils import configure_logger, resolve_path
+    from .versions import (
+        ML_INT,
+        discard_solution,
+        discover_versions,
+        fetch_files,
+        prepare_version,
+        select_versions,
+    )
+
+    if events_file == "-":
+        # stdout is reserved for the JSON lines of the events
+        console = create_console(plain=use_plain_output(sys.stderr), file=sys.stderr)
+    else:
+        from .console import console
+
     console.print(
         f"[bold]{__cmdname__}[/] ([logging.keyword]{__version__}[/]) [[log.time]{datetime.now():%H:%M:%S.%f}[/]]"
     )
@@ -183,6 +283,24 @@ def cli(
     configure_logger(log_level, debug, dry_run, console=console)
     logger = logging.getLogger("jml")
 
+    if quiet or events_file:
+        from .events import close_reporters, enable_reporters
+
+        enable_reporters(
+            quiet=quiet,
+            file=click.open_file(events_file, "w") if events_file else None,
+            console=console,
+        )
+        ctx.call_on_close(close_reporters)
+    if stats or stats_json:
+        build_stats = enable_stats()
+        ctx.call_on_close(lambda: report_stats(build_stats, console, stats_json))
+    if trace_file:
+        tracer = enable_tracing()
+        ctx.call_on_close(lambda: write_trace(tracer, console, trace_file))
+
+    if dry_run and watch_source:
+        raise click.UsageError("--watch kann nicht mit --dry-run verwendet werden.")
     if dry_run:
         files.enable_dry_run()
         console.print(
@@ -192,106 +310,112 @@ def cli(
         console.print("  run again without --dry-run to execute", style="red italic")
 
     source = resolve_path(source)
+    if output_dir:
+        options["output_dir"] = output_dir
 
     # build config for this run
-    ## load defaults
-    config = load_default_config()
-    ## read config from user home
-    config = load_config(Path.home() / ".config", base=config)
-
-    # resolve root directory from options or project config
-    project_config = load_config(source, resolve=True)
-    if project_root:
-        config["project_root"] = resolve_path(project_root)
-    else:
-        if "project_root" in project_config and project_config["project_root"]:
-            config["project_root"] = resolve_path(project_config["project_root"])
-        else:
-            config["project_root"] = source.parent
-    project_root = config["project_root"]
-
-    ## load project root config
-    config = load_config(project_root, base=config, resolve=True)
-    ## load project specific config
-    config.merge(project_config)
-    ## add cli options to config
-    config.merge(load_options_config(options))
-
-    ## cleanup some config options
-    if not config["name"]:
-        config["name"] = source.name
-
-    # check tag options for incompatibilities
-    if config.tasks.open == config.tasks.close:
-        console.print(
-            ":cross_mark: opening and closing task tags need to be unique:",
-            style="red bold",
-        )
-        console.print(
-            f"  current setting: [bold]`{config.tasks.open}` / `{config.tasks.close}`[/]"
-        )
-        ctx.exit(1)
-
-    if config.solutions.open == config.solutions.close:
-        console.print(
-            ":cross_mark: opening and closing solution tags need to be unique:",
-            style="red bold",
-        )
-        console.print(
-            f"  current setting: [bold]`{config.solutions.open}` / `{config.solutions.close}`[/]"
-        )
-        ctx.exit(1)
-
-    # prepare source and output_dir
-    config["source_dir"] = source
-    config["dry_run"] = dry_run
+    ## load defaults and config from user home
+    with phase("config"):
+        base = load_base_config()
 
-    if not config["output_dir"]:
-        config["output_dir"] = source.parent / __cmdname__
-    output_dir = config["output_dir"] = resolve_path(config["output_dir"])
+    if batch:
+        from .batch import run_batch
 
-    if output_dir.is_relative_to(source):
-        console.print(
-            ":cross_mark: output directory may not be inside the project folder:",
-            style="red bold",
+        results = run_batch(
+            source,
+            base,
+            options,
+            versions=ver,
+            jobs=options["jobs"],
+            console=console,
         )
-        console.print(f"  current setting: [path]{output_dir}[/]")
-        ctx.exit(1)
+        if any(result.error for result in results):
+            ctx.exit(1)
+        return
 
-    if project_root and source.parent.is_relative_to(project_root):
-        output_dir = config["output_dir"] = output_dir / source.parent.relative_to(
-            project_root
-        )
+    ## load project root and project specific config and add cli options
+    try:
+        with phase("config"):
+            config = load_project_config(
+                source, base, options, project_root=project_root
+            )
+    except ConfigError as err:
+        console.print(f":cross_mark: {err}:", style="red bold")
+        console.print(f"  current setting: [bold]{err.setting}[/]")
+        ctx.exit(1)
+    config["dry_run"] = dry_run
+    output_dir = config["output_dir"]
 
     # show config for debugging
     if logger.isEnabledFor(logging.DEBUG):
         logger.debug("config loaded:")
         console.print(config, highlight=True)
 
+    if list_versions:
+        versions, _ = select_versions(discover_versions(config), None)
+        for version in sorted(versions):
+            console.print(version)
+        return
+
     #  run jml
     console.rule()
     logger.info(f":thread: compiling source project [name]{config['name']}[/]")
     logger.info(f"   from [path]{source}[/]")
     logger.info(f"     to [path]{output_dir}[/]")
+    # the span ends when the command is finished
+    ctx.with_resource(span(config["name"], "project", source=source))
+
+    with phase("download"):
+        fetch_files(config)
 
-    logger.info(":thread: Generating solution version..")
     generate_versions = set(ver)
-    versions = create_solution(config, console=console)
+    if watch_source:
+        from .watch import watch
 
-    if max(versions) > 0:
-        versions = {v + 1 for v in range(max(versions))}
-    if generate_versions:
-        generate_versions = {int(v) for v in generate_versions if int(v) in versions}
-        # generate_versions = generate_versions.intersection(versions)
-    else:
-        generate_versions = versions
+        watch(config, versions=generate_versions, console=console)
+        return
+    # a dry run shows the plan of a full build
+    if config.build.incremental and not dry_run:
+        from .incremental import create_incremental
+
+        logger.info(":thread: Generating versions incrementally..")
+        create_incremental(config, versions=generate_versions, console=console)
+        return
+    if config.build.single_pass and not dry_run:
+        from .versions import create_versions
+
+        logger.info(":thread: Generating all versions in a single pass..")
+        create_versions(config, versions=generate_versions, console=console)
+        return
+
+    logger.info(":thread: Discovering versions..")
+    with phase("discover"):
+        versions = discover_versions(config)
+
+    versions, generate_versions = select_versions(versions, generate_versions)
     logger.info(
         f"auto-discovered {len(generate_versions)} of {len(versions)} versions to generate: [jml.ver]{generate_versions}[/]"
     )
 
-    for ver in sorted(generate_versions):
-        logger.info(f":thread: generating version [jml.ver]{ver}[/]:")
-        create_version(ver, config, console=console)
+    if not config.solutions.delete:
+        generate_versions.add(ML_INT)
+
+    if dry_run:
+        from .plan import plan_versions, print_plan
+
+        plan = plan_versions(
+            generate_versions, config, delete_solution=config.solutions.delete
+        )
+        print_plan(plan, console=console)
+        return
+
+    if config.solutions.delete:
+        if mlconfig := prepare_version(ML_INT, config):
+            discard_solution(mlconfig)
+
+    from .parallel import run_versions
+
+    run_versions(generate_versions, config, jobs=config.build.jobs, console=console)
 
 
 # When run as a single file outside module structure
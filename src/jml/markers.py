@@ -0,0 +1,205 @@
+"""Parsed representation of source files with task and solution markers.
+
+A source file is parsed once into a list of `Segment`s. Each segment is a
+contiguous block of lines between two marker lines together with the kind of
+the opening marker, its version argument and whether the task transform
+applies. Any version of the file can then be rendered by walking the
+segments and joining the kept blocks.
+"""
+
+import functools
+import os
+import re
+import typing as t
+from dataclasses import dataclass, field
+
+from .utils.predicates import ALL, compile_predicate
+
+ML_INT = -1
+
+# Segment kinds
+TEXT = "text"
+TASK = "task"
+SOLUTION = "solution"
+
+
+@dataclass(frozen=True, slots=True)
+class Segment:
+    """A block of lines following a marker line (or the start of the file).
+
+    `arg` is the version argument given after the opening marker or `None`.
+    `transform` is `True` if the line transform for tasks applies to the
+    block in project versions.
+    """
+
+    kind: str
+    text: str
+    arg: str | None = None
+    transform: bool = False
+
+    def keep(self, version: int) -> bool:
+        """Checks if this segment is part of `version`."""
+        if self.kind == TEXT:
+            return True
+        elif version == ML_INT:
+            return self.kind == SOLUTION
+        elif self.arg is None:
+            return self.kind == TASK
+        else:
+            return version in (compile_predicate(self.arg) or ALL)
+
+
+@dataclass(slots=True)
+class MarkedFile:
+    """A parsed source file.
+
+    `versions` holds the version numbers found in task markers,
+    `solution_versions` those found in solution markers.
+    """
+
+    segments: list[Segment] = field(default_factory=list)
+    versions: set[int] = field(default_factory=set)
+    solution_versions: set[int] = field(default_factory=set)
+
+    def add_version(self, kind: str, arg: str | None) -> None:
+        if arg is not None and (predicate := compile_predicate(arg)):
+            if kind == TASK:
+                self.versions.update(predicate.numbers)
+            else:
+                self.solution_versions.update(predicate.numbers)
+
+    def render(self, version: int, transform: t.Callable | None = None) -> str:
+        """Renders the content of this file for `version`.
+
+        `transform` is applied to the text of each segment that is subject
+        to the line transform.
+        """
+        is_ml = version == ML_INT
+        chunks = []
+        for segment in self.segments:
+            if not segment.keep(version):
+                continue
+            if transform and (
+                segment.kind == TASK or (segment.transform and not is_ml)
+            ):
+                chunks.append(transform(segment.text))
+            else:
+                chunks.append(segment.text)
+        return "".join(chunks)
+
+    def without_solution(self) -> "MarkedFile":
+        """Returns a copy of this file without the segments that are only
+        part of the solution, to render the project versions."""
+        return MarkedFile(
+            [s for s in self.segments if s.kind != SOLUTION or s.arg is not None],
+            self.versions,
+            self.solution_versions,
+        )
+
+
+def tag_key(config: t.Mapping) -> tuple[str, str, str, str]:
+    """Returns the marker tags of `config` as a tuple, e.g. to cache parsed
+    files for versions with the same tags."""
+    return (
+        config.tasks.open,
+        config.tasks.close,
+        config.solutions.open,
+        config.solutions.close,
+    )
+
+
+@functools.lru_cache
+def marker_regex(tags: tuple[str, str, str, str]) -> re.Pattern:
+    """Compiles a regex that matches whole marker lines for the `tags` (see
+    `tag_key()`). A line is a marker line if it starts with one of the tags
+    after leading whitespace. Close tags take precedence over solution tags
+    and solution tags over task tags.
+    """
+    tag_open, tag_close, ml_open, ml_close = map(re.escape, tags)
+    return re.compile(
+        r"^[^\S\n]*"
+        rf"(?:(?P<{TEXT}>{ml_close}|{tag_close})|(?P<{SOLUTION}>{ml_open})|(?P<{TASK}>{tag_open}))"
+        r"[^\n]*\n?",
+        re.MULTILINE,
+    )
+
+
+def find_markers(text: str, tags: tuple[str, str, str, str]) -> t.Iterator[re.Match]:
+    """Finds all marker lines for the `tags` in `text`.
+
+    The tags are searched as plain strings in the whole text first. Only
+    lines with a tag are then matched against the `marker_regex()`.
+    """
+    regex = marker_regex(tags)
+    candidates = set()
+    for tag in set(tags):
+        pos = text.find(tag)
+        while pos >= 0:
+            candidates.add(text.rfind("\n", 0, pos) + 1)
+            eol = text.find("\n", pos)
+            pos = text.find(tag, eol + 1) if eol >= 0 else -1
+    for start in sorted(candidates):
+        if match := regex.match(text, start):
+            yield match
+
+
+def parse(text: str, config: t.Mapping) -> MarkedFile:
+    """Parses `text` into a `MarkedFile` using the marker tags in `config`.
+
+    The marker lines are found in the whole text at once (see
+    `find_markers()`). The text between two marker lines becomes a segment.
+    """
+    marked = MarkedFile()
+
+    kind, arg, transform = TEXT, None, False
+    pos = 0
+    for match in find_markers(text, tag_key(config)):
+        if match.start() > pos:
+            marked.segments.append(
+                Segment(kind, text[pos : match.start()], arg, transform)
+            )
+        pos = match.end()
+
+        if match.lastgroup == TEXT:
+            kind, arg, transform = TEXT, None, False
+        else:
+            kind, arg = match.lastgroup, marker_arg(match)
+            # a solution keeps the transform of an unclosed task
+            transform = transform or kind == TASK
+            marked.add_version(kind, arg)
+    if pos < len(text):
+        marked.segments.append(Segment(kind, text[pos:], arg, transform))
+
+    return marked
+
+
+def scan_versions(text: str, config: t.Mapping) -> set[int]:
+    """Returns the version numbers found in the task markers of `text`, like
+    `parse(text, config).versions`, without building the segments."""
+    marked = MarkedFile()
+    for match in find_markers(text, tag_key(config)):
+        if match.lastgroup == TASK:
+            marked.add_version(TASK, marker_arg(match))
+    return marked.versions
+
+
+def marker_arg(match: re.Match) -> str | None:
+    """Returns the version argument of a marker line matched by
+    `marker_regex()`."""
+    parts = match[0].split(maxsplit=3)
+    return parts[1] if len(parts) > 1 else None
+
+
+def is_verbatim(data: bytes, config: t.Mapping, encoding: str = "utf-8") -> bool:
+    """Checks if the raw content of a source file contains none of the
+    marker tags in `config`. Such a file renders to its unchanged content in
+    every version and can be copied verbatim instead of being parsed.
+
+    The check is a plain search over the bytes. `False` is returned if the
+    bytes can not be checked or would be changed by reading and writing the
+    file in text mode, e.g. for encodings that are not ASCII compatible or
+    content with carriage returns.
+    """
+    if os.linesep != "\n" or "a\n".encode(encoding) != b"a\n" or b"\r" in data:
+        return False
+    return not any(tag.encode(encoding) in data for tag in tag_key(config))
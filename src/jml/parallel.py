@@ -0,0 +1,166 @@
+"""Runs the creation of project versions in a pool of worker processes.
+
+Each version writes to its own output directory, so versions can be created
+independently. The log and console output of each worker is recorded and
+printed in the order of the version numbers once the version is done.
+"""
+
+import logging
+import os
+import typing as t
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+from . import events
+from .config import ConfigDict
+from .console import PlainConsole, capture_console, create_console, print_output
+from .stats import disable_stats, enable_stats, get_stats
+from .trace import disable_tracing, enable_tracing, get_tracer
+from .utils import create_log_handler, files
+from .versions import ML_INT, create_version, set_link_root
+
+if t.TYPE_CHECKING:
+    from rich.console import Console
+
+logger = logging.getLogger("jml")
+
+
+def run_versions(
+    versions: Iterable[int],
+    config: ConfigDict,
+    jobs: int = 1,
+    console: "Console" = None,
+) -> set[int]:
+    """Creates all `versions` of the project, using up to `jobs` worker
+    processes. If `jobs` is `0`, the number of CPUs is used.
+
+    Returns the union of the version numbers discovered while creating the
+    versions.
+    """
+    console = console or create_console()
+    versions = sorted(versions)
+    jobs = min(jobs or os.cpu_count() or 1, len(versions))
+    if versions:
+        set_link_root(config, versions[0])
+
+    discovered = set()
+    if jobs <= 1:
+        for ver in versions:
+            _log_version(ver)
+            discovered |= create_version(ver, config, console=console)
+        return discovered
+
+    logger.debug(f"creating {len(versions)} versions with {jobs} processes")
+    from concurrent.futures import ProcessPoolExecutor
+
+    log_level = logger.getEffectiveLevel()
+    plain = isinstance(console, PlainConsole)
+    options = worker_options()
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [
+            executor.submit(
+                _create_version,
+                ver,
+                config,
+                log_level,
+                console.width,
+                plain,
+                **options,
+            )
+            for ver in versions
+        ]
+        for future in futures:
+            result = future.result()
+            merge_result(result, console)
+            discovered |= result.versions
+    return discovered
+
+
+def _log_version(version: int) -> None:
+    if version == ML_INT:
+        logger.info(":thread: generating solution version:")
+    else:
+        logger.info(f":thread: generating version [jml.ver]{version}[/]:")
+
+
+@dataclass
+class WorkerResult:
+    """The result of a version created in a worker process."""
+
+    versions: set[int]
+    # recorded console and log output
+    output: str
+    # statistics, trace and events of the worker, if enabled in the main process
+    stats: dict | None = None
+    trace: list[dict] | None = None
+    events: list[dict] | None = None
+
+
+def worker_options() -> dict[str, t.Any]:
+    """Returns the options for `_create_version()` to collect statistics,
+    traces and events in a worker, if they are enabled in this process."""
+    return {
+        "stats": get_stats() is not None,
+        "trace": get_tracer() is not None,
+        "reporting": events.worker_options(),
+    }
+
+
+def merge_result(result: WorkerResult, console: "Console") -> None:
+    """Prints the output of a worker and merges its statistics, trace and
+    events into the ones of this process."""
+    if result.output:
+        print_output(console, result.output)
+    if result.stats:
+        get_stats().merge(result.stats)
+    if result.trace:
+        get_tracer().merge(result.trace)
+    if result.events:
+        events.merge_events(result.events)
+
+
+def _create_version(
+    version: int,
+    config: ConfigDict,
+    log_level: int,
+    width: int,
+    plain: bool = False,
+    stats: bool = False,
+    trace: bool = False,
+    reporting: dict | None = None,
+) -> WorkerResult:
+    """Creates `version` in a worker process and returns the discovered
+    versions together with the recorded output. If `plain` is set, the
+    output is recorded without styles. If `stats` is set, statistics are
+    collected (see `jml.stats`), if `trace` is set, spans are recorded (see
+    `jml.trace`) and events are reported according to `reporting` (see
+    `jml.events`)."""
+    if config.get("dry_run"):
+        files.enable_dry_run()
+    # the statistics of a forked parent are not collected again
+    worker_stats = enable_stats() if stats else None
+    worker_tracer = enable_tracing("jml worker") if trace else None
+
+    console = capture_console(width=width, plain=plain)
+    collector = events.enable_worker_reporters(**(reporting or {}), console=console)
+    handler = create_log_handler(console)
+
+    # collect messages of this worker instead of writing to the inherited handlers
+    worker_logger = logging.getLogger("jml")
+    worker_logger.addHandler(handler)
+    worker_logger.setLevel(log_level)
+    worker_logger.propagate = False
+    try:
+        _log_version(version)
+        versions = create_version(version, config, console=console)
+    finally:
+        worker_logger.removeHandler(handler)
+        disable_stats()
+        disable_tracing()
+    return WorkerResult(
+        versions,
+        console.file.getvalue(),
+        stats=worker_stats.to_dict() if worker_stats else None,
+        trace=worker_tracer.events if worker_tracer else None,
+        events=collector.events if collector else None,
+    )
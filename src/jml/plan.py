@@ -0,0 +1,252 @@
+"""Build plans of project versions.
+
+Building a version is split into planning and executing (see
+`jml.executor`). `plan_version()` walks the source project and describes
+every step of the build as an `Operation` (delete, mkdir, compile, copy,
+link, download, zip) with its source and target and the operations it
+depends on. No file is read or written while planning, so `--dry-run` can
+show the plan without any cost.
+
+Identical operations are only added once to a plan. The dependencies form
+a DAG, so the executor can run independent operations in parallel.
+"""
+
+import logging
+import typing as t
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .config import ConfigDict
+from .console import create_console
+from .markers import ML_INT
+from .settings import VersionSettings
+from .stats import phase
+from .utils import files, is_url, resolve_path
+from .utils.cache import download_key
+from .versions import (
+    COPY,
+    EXCLUDE,
+    SKIP,
+    files_cache,
+    prepare_version,
+    relp,
+    set_link_root,
+    walk_sources,
+)
+
+if t.TYPE_CHECKING:
+    from rich.console import Console
+
+# Kinds of operations
+DELETE = "delete"
+MKDIR = "mkdir"
+LINK = "link"
+DOWNLOAD = "download"
+ZIP = "zip"
+# and the actions of `versions.walk_sources()` (COMPILE, COPY, SKIP, EXCLUDE)
+
+logger = logging.getLogger("jml")
+
+
+@dataclass(frozen=True, slots=True)
+class Operation:
+    """
+    A single step of a build. Operations are equal if they have the same
+    kind, source and target.
+
+    Files of the source project are given as `source` relative to the
+    source directory. Additional files from the `files` config keep their
+    config entry in `entry`.
+    """
+
+    kind: str
+    source: Path | str | None = None
+    target: Path | None = None
+    # indices of the operations of the plan that need to run before
+    after: tuple[int, ...] = field(default=(), compare=False)
+    entry: dict | None = field(default=None, compare=False, repr=False)
+
+
+@dataclass
+class VersionPlan:
+    """The operations to build one version."""
+
+    settings: VersionSettings
+    operations: list[Operation] = field(default_factory=list)
+    # if set, the version is only written into its zip file
+    zip_path: Path | None = None
+    _index: dict[Operation, int] = field(default_factory=dict, repr=False)
+
+    def add(self, op: Operation) -> int:
+        """Adds `op` to the plan, unless an equal operation was already
+        added, and returns its index."""
+        if op not in self._index:
+            self._index[op] = len(self.operations)
+            self.operations.append(op)
+        return self._index[op]
+
+
+@dataclass
+class Plan:
+    """The operations to build several versions of a project."""
+
+    downloads: list[Operation] = field(default_factory=list)
+    # output directories of earlier runs, which are not created again
+    deletes: list[Operation] = field(default_factory=list)
+    versions: list[VersionPlan] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return (
+            len(self.downloads)
+            + len(self.deletes)
+            + sum(len(vplan.operations) for vplan in self.versions)
+        )
+
+
+def plan_version(version: int, config: ConfigDict) -> VersionPlan | None:
+    """Plans the build of `version` of the project.
+
+    Returns `None` if the version can't be built (see
+    `versions.prepare_version()`).
+    """
+    vconfig = prepare_version(version, config)
+    if vconfig is None:
+        return None
+    return plan_build(vconfig)
+
+
+def plan_build(vconfig: VersionSettings) -> VersionPlan:
+    """Plans the build of the version with the settings `vconfig`."""
+    delete_ml = vconfig.is_ml and vconfig.solutions.delete
+    vplan = VersionPlan(vconfig)
+    if vconfig.zip.only_zip and not delete_ml:
+        vplan.zip_path = files.zip_path(vconfig.output_dir, dest=vconfig.zip.dir)
+
+    # clear the output (a deleted solution is removed after the build)
+    setup = ()
+    if vconfig.output_dir.is_dir() and vconfig.clear and not delete_ml:
+        setup = (vplan.add(Operation(DELETE, target=vconfig.output_dir)),)
+
+    # files of the source
+    builds = []
+    with phase("walk", vconfig.name):
+        for reldir, entries in walk_sources(vconfig):
+            after = setup
+            if vplan.zip_path is None:
+                target = vconfig.output_dir / reldir
+                after = (vplan.add(Operation(MKDIR, target=target, after=setup)),)
+            for relpath, action in entries:
+                if action in (SKIP, EXCLUDE):
+                    op = Operation(action, source=relpath)
+                else:
+                    kind = _file_kind(action, vconfig)
+                    op = Operation(kind, relpath, _target(vplan, relpath), after=after)
+                builds.append(vplan.add(op))
+
+    # additional files overwrite files of the source
+    extras = []
+    if not delete_ml:
+        for entry in vconfig.files:
+            target = resolve_path(entry["name"], root=vconfig.output_dir)
+            if vplan.zip_path is not None:
+                target = vplan.zip_path / target.relative_to(vconfig.output_dir)
+            # downloads are linked to the cache
+            if is_url(entry["source"]) and vconfig.build.link != "copy":
+                kind = LINK
+            else:
+                kind = COPY
+            op = Operation(
+                kind, entry["source"], target, after=tuple(builds), entry=entry
+            )
+            extras.append(vplan.add(op))
+
+    done = tuple(builds + extras)
+    if delete_ml:
+        vplan.add(Operation(DELETE, target=vconfig.output_dir, after=done))
+    elif vplan.zip_path is not None:
+        vplan.add(Operation(ZIP, target=vplan.zip_path, after=done))
+    elif vconfig.zip.create:
+        zip_file = files.zip_path(vconfig.output_dir, dest=vconfig.zip.dir)
+        vplan.add(Operation(ZIP, vconfig.output_dir, zip_file, after=done))
+    return vplan
+
+
+def plan_versions(
+    versions: t.Iterable[int], config: ConfigDict, delete_solution: bool = False
+) -> Plan:
+    """Plans the build of all `versions` of the project, including the
+    downloads of the `files` config that are not cached yet. If
+    `delete_solution` is set, a solution of an earlier run is deleted."""
+    plan = Plan()
+
+    entries = list(config.get("files", []))
+    for vcfg in config.get("versions", []):
+        entries.extend(vcfg.get("files", []))
+    if any(is_url(file["source"]) for file in entries):
+        cache = files_cache(config)
+        for file in entries:
+            if is_url(file["source"]) and cache.lookup(download_key(file)) is None:
+                op = Operation(DOWNLOAD, file["source"], cache.root, entry=file)
+                if op not in plan.downloads:
+                    plan.downloads.append(op)
+
+    if delete_solution:
+        mlconfig = prepare_version(ML_INT, config)
+        if mlconfig and mlconfig.output_dir.is_dir() and mlconfig.clear:
+            plan.deletes.append(Operation(DELETE, target=mlconfig.output_dir))
+
+    versions = sorted(versions)
+    if versions:
+        set_link_root(config, versions[0])
+    for ver in versions:
+        if vplan := plan_version(ver, config):
+            plan.versions.append(vplan)
+    return plan
+
+
+def print_plan(plan: Plan, console: "Console" = None) -> None:
+    """Prints the operations of `plan`."""
+    console = console or create_console()
+    for op in plan.downloads:
+        console.print(f"  {op.kind:<8} [jml.path]{op.source}[/]")
+    for op in plan.deletes:
+        console.print(f"  {op.kind:<8} [jml.path]{op.target}[/]")
+
+    for vplan in plan.versions:
+        vconfig = vplan.settings
+        console.print(
+            f"version [jml.ver]{vconfig.name}[/] in [jml.path]{relp(vconfig.output_dir, vconfig)}[/]"
+        )
+        for op in vplan.operations:
+            console.print(f"  {op.kind:<8} {describe(op, vconfig)}")
+    console.print(f"{len(plan)} operations")
+
+
+def describe(op: Operation, vconfig: VersionSettings) -> str:
+    """Returns a short description of the source and target of `op`."""
+    if op.kind in (SKIP, EXCLUDE):
+        return f"[jml.file]{op.source!s}[/]"
+    elif op.source is None:
+        return f"[jml.path]{relp(op.target, vconfig)}[/]"
+    source = op.source
+    if isinstance(source, Path):
+        source = relp(resolve_path(source, root=vconfig.source_dir), vconfig)
+    return f"[jml.file]{source!s}[/] -> [jml.path]{relp(op.target, vconfig)}[/]"
+
+
+def _file_kind(action: str, vconfig: VersionSettings) -> str:
+    # verbatim files are linked to the canonical copy in the link root
+    if (
+        action == COPY
+        and vconfig.build.link != "copy"
+        and vconfig.link_root
+        and vconfig.link_root != vconfig.output_dir
+    ):
+        return LINK
+    return action
+
+
+def _target(vplan: VersionPlan, relpath: Path) -> Path:
+    if vplan.zip_path is not None:
+        return vplan.zip_path / relpath
+    return vplan.settings.output_dir / relpath
@@ -0,0 +1,142 @@
+"""Immutable build settings of a project version.
+
+The merged `ConfigDict` of a version is resolved once into a frozen,
+slotted `VersionSettings` object (see `VersionSettings.from_config()`).
+The settings can be shared by threads and pickled for worker processes
+without copying, and attribute access needs no dictionary lookups.
+
+Sections with equal values are created only once and shared by all
+versions (and projects) that use them.
+"""
+
+import functools
+import typing as t
+from collections.abc import Mapping
+from dataclasses import dataclass, field, fields
+from pathlib import Path
+
+
+@dataclass(frozen=True, slots=True)
+class SourceSettings:
+    include: tuple[str, ...] = ("*.java",)
+    exclude: tuple[str, ...] = ()
+    encoding: str = "utf-8"
+    keep_empty_files: bool = True
+    keep_empty_dirs: bool = True
+
+
+@dataclass(frozen=True, slots=True)
+class LineSettings:
+    prefix: str = ""
+    replace: str = ""
+
+
+@dataclass(frozen=True, slots=True)
+class MarkerSettings:
+    open: str
+    close: str
+    line: LineSettings = LineSettings()
+    suffix: str = ""
+    delete: bool = False
+
+
+@dataclass(frozen=True, slots=True)
+class ZipSettings:
+    create: bool = True
+    only_zip: bool = False
+    dir: Path | str = ""
+
+
+@dataclass(frozen=True, slots=True)
+class BuildSettings:
+    single_pass: bool = False
+    incremental: bool = False
+    jobs: int = 1
+    threads: int = 1
+    link: str = "copy"
+
+
+@dataclass(frozen=True, slots=True)
+class VersionSettings:
+    """The settings to build one version of a project."""
+
+    no: int
+    name: str
+    project_name: str
+    is_ml: bool
+    source_dir: Path
+    output_dir: Path
+    output_root: Path
+    project_root: Path
+    sources: SourceSettings
+    tasks: MarkerSettings
+    solutions: MarkerSettings
+    zip: ZipSettings
+    build: BuildSettings
+    clear: bool = True
+    # the `files` entries as plain dicts, which are never changed
+    files: tuple[dict, ...] = ()
+    files_cache: Path | None = None
+    files_cache_size: int = 512
+    link_root: Path | None = None
+    dry_run: bool = False
+    # function to rewrite the lines of blocks (see `versions.create_transform()`)
+    transform: t.Callable[[str], str] | None = field(default=None, compare=False)
+
+    @classmethod
+    def from_config(cls, config: Mapping) -> "VersionSettings":
+        """Resolves the merged config of a version (see
+        `versions.prepare_version()`) into settings."""
+        return cls(
+            no=config["no"],
+            name=config["name"],
+            project_name=config["project_name"],
+            is_ml=config["is_ml"],
+            source_dir=Path(config["source_dir"]),
+            output_dir=Path(config["output_dir"]),
+            output_root=Path(config["output_root"]),
+            project_root=Path(config["project_root"]),
+            sources=_section(SourceSettings, config.get("sources", {})),
+            tasks=_markers(config["tasks"]),
+            solutions=_markers(config["solutions"]),
+            zip=_section(ZipSettings, config.get("zip", {})),
+            build=_section(BuildSettings, config.get("build", {})),
+            clear=config.get("clear", True),
+            files=tuple(dict(file) for file in config.get("files", ())),
+            files_cache=(
+                Path(config["files_cache"]) if config.get("files_cache") else None
+            ),
+            files_cache_size=config.get("files_cache_size", 512),
+            link_root=config.get("link_root") or None,
+            dry_run=bool(config.get("dry_run")),
+            transform=config.get("transform"),
+        )
+
+
+def _markers(config: Mapping) -> MarkerSettings:
+    return _section(
+        MarkerSettings, config, line=_section(LineSettings, config.get("line", {}))
+    )
+
+
+def _section(cls: type, config: Mapping, **values) -> t.Any:
+    """Creates the settings section `cls` from the known keys in `config`."""
+    names = {f.name for f in fields(cls)}
+    for key, value in config.items():
+        if key in names and key not in values:
+            values[key] = _freeze(value)
+    return _create(cls, **values)
+
+
+@functools.lru_cache(maxsize=256)
+def _create(cls: type, **values) -> t.Any:
+    # equal sections are created once and shared
+    return cls(**values)
+
+
+def _freeze(value: t.Any) -> t.Any:
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(value))
+    elif isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
@@ -0,0 +1,210 @@
+"""Statistics about the phases of a build (`--stats`).
+
+The build steps report their timings with `phase()` and
+`BuildStats.add_file()` (see `versions.measure_file()`).
+As long as no `BuildStats` is enabled (see `enable_stats()`), these calls
+do nothing, so the build is not slowed down. Worker processes collect
+their own statistics, which are merged into the statistics of the main
+process.
+
+Wall times are measured with `time.perf_counter()` and CPU times with
+`time.thread_time()` of the running thread. If the files of a version are
+built by several threads, the times of the files are summed up.
+"""
+
+import contextlib
+import heapq
+import json
+import threading
+import time
+import typing as t
+from pathlib import Path
+
+if t.TYPE_CHECKING:
+    from rich.console import Console
+
+# Number of slowest files to report
+SLOWEST_FILES = 10
+
+# Name for phases of the whole project instead of a single version
+PROJECT = ""
+
+COUNTERS = ("files", "bytes_in", "bytes_out", "lines_kept", "lines_dropped")
+
+
+class BuildStats:
+    """
+    Collects the wall and CPU time of build phases per version, counters of
+    the handled files and the slowest files.
+
+    Args:
+        slowest (int): Number of slowest files to keep.
+    """
+
+    def __init__(self, slowest: int = SLOWEST_FILES):
+        self.slowest = slowest
+        # [wall, cpu, count] by version and phase
+        self.phases: dict[str, dict[str, list]] = {}
+        self.counters: dict[str, dict[str, int]] = {}
+        # (wall, version, relpath, status) of the slowest files
+        self.files: list[tuple[float, str, str, str]] = []
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def phase(self, name: str, version: str = PROJECT) -> t.Iterator[None]:
+        """Measures the time of the `with` block as phase `name`."""
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            self.add_phase(
+                name, version, time.perf_counter() - wall, time.thread_time() - cpu
+            )
+
+    def add_phase(
+        self, name: str, version: str, wall: float, cpu: float, count: int = 1
+    ) -> None:
+        with self._lock:
+            phase = self.phases.setdefault(version, {}).setdefault(name, [0.0, 0.0, 0])
+            phase[0] += wall
+            phase[1] += cpu
+            phase[2] += count
+
+    def count(self, version: str, **counters: int) -> None:
+        """Adds to the `COUNTERS` of `version`."""
+        with self._lock:
+            values = self.counters.setdefault(version, dict.fromkeys(COUNTERS, 0))
+            for key, value in counters.items():
+                values[key] += value
+
+    def add_file(
+        self, version: str, relpath: str, status: str, wall: float, cpu: float
+    ) -> None:
+        """Records the build of one file in the phase for its `status`."""
+        self.add_phase(status, version, wall, cpu)
+        self.count(version, files=1)
+        self._keep_file((wall, version, str(relpath), status))
+
+    def _keep_file(self, entry: tuple[float, str, str, str]) -> None:
+        with self._lock:
+            if len(self.files) < self.slowest:
+                heapq.heappush(self.files, entry)
+            else:
+                heapq.heappushpop(self.files, entry)
+
+    def merge(self, data: dict) -> None:
+        """Merges statistics from `to_dict()`, e.g. of a worker process."""
+        for version, phases in data["phases"].items():
+            for name, phase in phases.items():
+                self.add_phase(
+                    name, version, phase["wall"], phase["cpu"], phase["count"]
+                )
+        for version, counters in data["counters"].items():
+            self.count(version, **counters)
+        for entry in data["slowest_files"]:
+            self._keep_file(
+                (entry["wall"], entry["version"], entry["file"], entry["status"])
+            )
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "phases": {
+                    version: {
+                        name: {"wall": p[0], "cpu": p[1], "count": p[2]}
+                        for name, p in phases.items()
+                    }
+                    for version, phases in self.phases.items()
+                },
+                "counters": {v: dict(c) for v, c in self.counters.items()},
+                "slowest_files": [
+                    {"wall": wall, "version": version, "file": file, "status": status}
+                    for wall, version, file, status in sorted(self.files, reverse=True)
+                ],
+            }
+
+    def write_json(self, path: Path) -> None:
+        with path.open("w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=1)
+
+    def print(self, console: "Console") -> None:
+        """Prints the statistics as tables to `console`."""
+        from rich.table import Table
+
+        data = self.to_dict()
+
+        phases = Table(title="Phases")
+        for column in ("version", "phase", "count", "wall", "cpu"):
+            phases.add_column(
+                column, justify="left" if column in ("version", "phase") else "right"
+            )
+        for version, items in data["phases"].items():
+            for name, phase in sorted(items.items(), key=lambda i: -i[1]["wall"]):
+                phases.add_row(
+                    version or "(project)",
+                    name,
+                    str(phase["count"]),
+                    f"{phase['wall']:.3f}s",
+                    f"{phase['cpu']:.3f}s",
+                )
+        console.print(phases)
+
+        counters = Table(title="Versions")
+        counters.add_column("version")
+        for column in COUNTERS:
+            counters.add_column(column.replace("_", " "), justify="right")
+        for version, values in data["counters"].items():
+            counters.add_row(version, *(str(values[c]) for c in COUNTERS))
+        console.print(counters)
+
+        slowest = Table(title=f"Slowest {self.slowest} files")
+        for column in ("version", "file", "status", "wall"):
+            slowest.add_column(column, justify="right" if column == "wall" else "left")
+        for entry in data["slowest_files"]:
+            slowest.add_row(
+                entry["version"],
+                entry["file"],
+                entry["status"],
+                f"{entry['wall']:.4f}s",
+            )
+        console.print(slowest)
+
+
+# statistics of this process, if enabled
+_stats: BuildStats | None = None
+
+_NO_PHASE = contextlib.nullcontext()
+
+
+def enable_stats(slowest: int = SLOWEST_FILES) -> BuildStats:
+    """Enables collecting statistics in this process with a new `BuildStats`."""
+    global _stats
+    _stats = BuildStats(slowest=slowest)
+    return _stats
+
+
+def disable_stats() -> None:
+    global _stats
+    _stats = None
+
+
+def get_stats() -> BuildStats | None:
+    """Returns the enabled `BuildStats` or `None`."""
+    return _stats
+
+
+def phase(name: str, version: str = PROJECT) -> t.ContextManager:
+    """Measures the time of a `with` block as phase `name` of `version`, if
+    statistics are enabled."""
+    if _stats is None:
+        return _NO_PHASE
+    return _stats.phase(name, version)
+
+
+def report_stats(stats: BuildStats, console: "Console", path: Path = None) -> None:
+    """Prints `stats` to `console` and writes them as JSON to `path`."""
+    console.rule("statistics")
+    stats.print(console)
+    if path:
+        stats.write_json(path)
+        console.print(f"statistics written to [jml.path]{path}[/]")
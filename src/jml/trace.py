@@ -0,0 +1,145 @@
+"""Timeline traces of a build in the Chrome Trace Event format (`--trace`).
+
+The build steps record spans for projects, versions, files, downloads and
+zip files with `span()`. Like `stats.phase()`, `span()` returns a shared
+no-op context manager as long as no `Tracer` is enabled (see
+`enable_tracing()`).
+
+Every span is tagged with the id of the process and thread it ran in.
+Worker processes record their own spans, which are merged into the trace
+of the main process. The written file can be opened in
+[Perfetto](https://ui.perfetto.dev) or `chrome://tracing`.
+
+Timestamps are taken from `time.perf_counter_ns()`, which uses a system
+wide monotonic clock, so spans of different processes line up.
+"""
+
+import contextlib
+import json
+import os
+import threading
+import time
+import typing as t
+from pathlib import Path
+
+if t.TYPE_CHECKING:
+    from rich.console import Console
+
+
+class Tracer:
+    """
+    Records spans as complete events ("ph": "X") of the Chrome Trace Event
+    format.
+
+    Args:
+        process_name (str): Name of this process in the trace.
+    """
+
+    def __init__(self, process_name: str = "jml"):
+        self.pid = os.getpid()
+        self.events: list[dict] = []
+        # (pid, tid, name) of the recorded metadata events
+        self._metadata: set[tuple[int, int, str]] = set()
+        self._lock = threading.Lock()
+        self._add_metadata("process_name", 0, process_name)
+
+    @contextlib.contextmanager
+    def span(self, name: str, cat: str, **args: t.Any) -> t.Iterator[None]:
+        """Records the `with` block as span `name` of category `cat`."""
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.add_span(name, cat, start, time.perf_counter_ns() - start, args)
+
+    def add_span(
+        self, name: str, cat: str, start: int, duration: int, args: dict = None
+    ) -> None:
+        """Adds a span of the current thread. `start` and `duration` are
+        given in nanoseconds."""
+        tid = threading.get_ident()
+        event = {
+            "name": name,
+            "cat": cat,
+            "ph": "X",
+            "ts": start / 1000,
+            "dur": duration / 1000,
+            "pid": self.pid,
+            "tid": tid,
+        }
+        if args:
+            event["args"] = {key: str(value) for key, value in args.items()}
+        with self._lock:
+            if (self.pid, tid, "thread_name") not in self._metadata:
+                self._add_metadata("thread_name", tid, threading.current_thread().name)
+            self.events.append(event)
+
+    def _add_metadata(self, name: str, tid: int, value: str) -> None:
+        self._metadata.add((self.pid, tid, name))
+        self.events.append(
+            {
+                "name": name,
+                "ph": "M",
+                "pid": self.pid,
+                "tid": tid,
+                "args": {"name": value},
+            }
+        )
+
+    def merge(self, events: list[dict]) -> None:
+        """Adds the `events` of another tracer, e.g. of a worker process.
+        Worker processes that built several versions name their process and
+        threads only once."""
+        with self._lock:
+            for event in events:
+                if event["ph"] == "M":
+                    key = (event["pid"], event["tid"], event["name"])
+                    if key in self._metadata:
+                        continue
+                    self._metadata.add(key)
+                self.events.append(event)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {"traceEvents": list(self.events), "displayTimeUnit": "ms"}
+
+    def write_json(self, path: Path) -> None:
+        with path.open("w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+
+
+# tracer of this process, if enabled
+_tracer: Tracer | None = None
+
+_NO_SPAN = contextlib.nullcontext()
+
+
+def enable_tracing(process_name: str = "jml") -> Tracer:
+    """Enables recording spans in this process with a new `Tracer`."""
+    global _tracer
+    _tracer = Tracer(process_name=process_name)
+    return _tracer
+
+
+def disable_tracing() -> None:
+    global _tracer
+    _tracer = None
+
+
+def get_tracer() -> Tracer | None:
+    """Returns the enabled `Tracer` or `None`."""
+    return _tracer
+
+
+def span(name: str, cat: str, **args: t.Any) -> t.ContextManager:
+    """Records a `with` block as span `name` of category `cat`, if tracing
+    is enabled. `args` are shown with the span."""
+    if _tracer is None:
+        return _NO_SPAN
+    return _tracer.span(name, cat, **args)
+
+
+def write_trace(tracer: Tracer, console: "Console", path: Path) -> None:
+    """Writes the trace of `tracer` to `path`."""
+    tracer.write_json(path)
+    console.print(f"trace written to [jml.path]{path}[/]")
@@ -1,22 +1,25 @@
 # -*- coding: utf-8 -*-
 
 import fnmatch
+import functools
 import logging
+import os
 import re
+import typing as t
 import urllib.parse
 from pathlib import Path
 
-import click
-import rich
-from rich.logging import RichHandler
+from .predicates import compile_predicate
+
+if t.TYPE_CHECKING:
+    from rich.console import Console
 
 
 RE_VERSION = re.compile(r"^\d+$")
-RE_VERSION2 = re.compile(r"^([!<>=]{0,2})(\d+)$")
 
 
 def configure_logger(
-    log_level: int, debug: bool, dry_run: bool, console: rich.console.Console = None
+    log_level: int, debug: bool, dry_run: bool, console: "Console" = None
 ) -> int:
     """Configures the logger for this run and returns the log level."""
     if dry_run:
@@ -28,18 +31,29 @@ def configure_logger(
     logging.basicConfig(
         level=log_level,
         format="%(message)s",
-        handlers=[
-            RichHandler(
-                console=console,
-                show_time=False,
-                tracebacks_suppress=[click],
-                markup=True,
-            ),
-        ],
+        handlers=[create_log_handler(console)],
     )
     return log_level
 
 
+def create_log_handler(console: "Console" = None) -> logging.Handler:
+    """Creates the handler used to print log messages to `console`."""
+    from ..console import PlainConsole, PlainHandler
+
+    if isinstance(console, PlainConsole):
+        return PlainHandler(console)
+
+    import click
+    from rich.logging import RichHandler
+
+    return RichHandler(
+        console=console,
+        show_time=False,
+        tracebacks_suppress=[click],
+        markup=True,
+    )
+
+
 def resolve_path(path: str | Path, root: str | Path = None) -> Path:
     """If path is a relative path, it is resolved to an absolute
     path by prefixing it with base. Otherwise it is returned as
@@ -58,11 +72,48 @@ def match_patterns(file: str | Path, patterns: list[str]) -> bool:
     """Matches a file against a list of UNIX-like filename patterns.
     True is returned if filename is matched by at least one pattern.
     """
-    file = str(file)
-    for p in patterns:
-        if fnmatch.fnmatch(file, p):
-            return True
-    return False
+    return compile_patterns(patterns)(file)
+
+
+def compile_patterns(patterns: t.Iterable[str]) -> t.Callable[[str | Path], bool]:
+    """Compiles a list of UNIX-like filename patterns into a single matcher.
+    The matcher returns True if a filename is matched by at least one
+    pattern, like `match_patterns()`.
+
+    Matchers are cached, so each list of patterns is compiled only once.
+    """
+    return _compile_patterns(tuple(sorted(patterns)))
+
+
+def compile_dir_patterns(patterns: t.Iterable[str]) -> t.Callable[[str | Path], bool]:
+    """Compiles a list of UNIX-like filename patterns into a matcher for
+    directories. A directory is matched if a directory pattern ending in `/`
+    matches its path (like `.git/` or `node_modules/`) or if a pattern ending
+    in `*` matches every path below it (like `bin/*`). Other patterns only
+    match files, so `*.class` does not match a directory `foo.class`.
+    """
+    return _compile_dir_patterns(tuple(sorted(patterns)))
+
+
+@functools.cache
+def _compile_patterns(patterns: tuple[str, ...]) -> t.Callable[[str | Path], bool]:
+    if not patterns:
+        return lambda file: False
+    # same semantics as fnmatch.fnmatch() for each pattern
+    regex = re.compile(
+        "|".join(fnmatch.translate(os.path.normcase(p)) for p in patterns)
+    )
+    return lambda file: regex.match(os.path.normcase(str(file))) is not None
+
+
+@functools.cache
+def _compile_dir_patterns(patterns: tuple[str, ...]) -> t.Callable[[str | Path], bool]:
+    match_dir = _compile_patterns(
+        tuple(p.rstrip("/") for p in patterns if p.endswith("/"))
+    )
+    # a trailing * matching "dir/" matches "dir/" followed by anything
+    match_files = _compile_patterns(tuple(p for p in patterns if p.endswith("*")))
+    return lambda path: match_dir(path) or match_files(f"{path}{os.sep}")
 
 
 def is_url(url: str) -> bool:
@@ -82,29 +133,11 @@ def test_version(version1: str | int, version2: str | int) -> bool:
     """Compares a version with a version string and checks if the first
     is in the range defined by the second. The second version can be
     prefixed by one of =, <, >, >=, <= or != to compare with a range of
-    versions.
+    versions. Ranges (`2-4`), lists (`1,3`) and negation (`!2-4`) are also
+    supported (see `jml.utils.predicates`).
     """
-    if not (v1_match := RE_VERSION2.match(str(version1))):
+    if not RE_VERSION.match(str(version1)):
         return False
-    if not (v2_match := RE_VERSION2.match(str(version2))):
+    if (predicate := compile_predicate(str(version2))) is None:
         return True
-
-    ver1 = int(version1)
-    ver2 = int(v2_match.group(2))
-    op = v2_match.group(1)
-
-    if len(op) == 0 or op == "=":
-        return ver1 == ver2
-    if op == "=" or op == "==":
-        return ver1 == ver2
-    if op == "<=":
-        return ver1 <= ver2
-    if op == "<":
-        return ver1 < ver2
-    if op == ">=":
-        return ver1 >= ver2
-    if op == ">":
-        return ver1 > ver2
-    if op == "!=" or op == "<>":
-        return ver1 != ver2
-    return False
+    return int(version1) in predicate
@@ -0,0 +1,185 @@
+"""Content-addressed cache for downloaded files.
+
+Files are stored by the sha256 hash of their content in the `objects`
+folder of the cache. An index (`index.json`) maps the keys of the cached
+files (the url and checksum of a download, see `download_key()`) to the
+hash, the size and the time of the last access of the file. Lookups only
+need the index, and files are evicted least recently used first once the
+cache grows beyond its size limit.
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+import typing as t
+from pathlib import Path
+
+from . import files
+
+INDEX_FILE = "index.json"
+INDEX_FORMAT = 1
+
+# Default size limit of the cache in bytes
+DEFAULT_MAX_SIZE = 512 * 1024 * 1024
+
+
+def default_cache_dir() -> Path:
+    """Returns the default cache directory in the users cache folder."""
+    if cache_home := os.environ.get("XDG_CACHE_HOME"):
+        return Path(cache_home) / "jml"
+    return Path.home() / ".cache" / "jml"
+
+
+def download_key(file: t.Mapping) -> str:
+    """Returns the cache key for the download of a `files` entry, made of the
+    url and the checksum (if any)."""
+    if checksum := file.get("checksum"):
+        method = file.get("checksum_method", "sha1")
+        return f"{file['source']}#{method}:{checksum.lower()}"
+    return file["source"]
+
+
+class FileCache:
+    """
+    A size bounded, content-addressed file cache with an index.
+
+    Changes to the index are kept in memory until `save()` is called.
+
+    Args:
+        root (Path): Path to the cache directory.
+        max_size (int): Maximum size of all cached files in bytes.
+    """
+
+    def __init__(self, root: Path, max_size: int = DEFAULT_MAX_SIZE):
+        self.root = root
+        self.max_size = max_size
+        self._lock = threading.RLock()
+        self._entries = self._read_index()
+        self._removed: set[str] = set()
+
+    @property
+    def index_path(self) -> Path:
+        return self.root / INDEX_FILE
+
+    def object_path(self, digest: str) -> Path:
+        return self.root / "objects" / digest[:2] / digest
+
+    def lookup(self, key: str, verify: bool = False) -> Path | None:
+        """
+        Returns the path of the cached file for `key` or `None`.
+
+        The size of the file is checked against the index. If `verify` is
+        set, the content hash is checked, too. Invalid entries are removed.
+        """
+        with self._lock:
+            if (entry := self._entries.get(key)) is None:
+                return None
+            path = self.object_path(entry["hash"])
+            try:
+                valid = path.stat().st_size == entry["size"]
+            except OSError:
+                valid = False
+            if valid and verify:
+                valid = files.file_hash(path, method="sha256") == entry["hash"]
+            if not valid:
+                self._remove(key)
+                return None
+            entry["atime"] = time.time_ns()
+            return path
+
+    def store(self, key: str, source: Path) -> Path:
+        """Copies the file at `source` into the cache under `key` and returns
+        the path of the cached file."""
+        digest = files.file_hash(source, method="sha256")
+        path = self.object_path(digest)
+        with self._lock:
+            if not path.is_file():
+                files.make_dirs(path.parent)
+                part = path.with_name(f"{digest}.part")
+                shutil.copyfile(source, part)
+                os.replace(part, path)
+            self._entries[key] = {
+                "hash": digest,
+                "size": path.stat().st_size,
+                "atime": time.time_ns(),
+            }
+            self._removed.discard(key)
+            self.evict(keep=digest)
+        return path
+
+    def size(self) -> int:
+        """Returns the size of all cached files in bytes."""
+        with self._lock:
+            sizes = {e["hash"]: e["size"] for e in self._entries.values()}
+            return sum(sizes.values())
+
+    def evict(self, keep: str | None = None) -> None:
+        """Removes the least recently used files until the cache is within
+        its size limit. The file with the hash `keep` is never removed."""
+        with self._lock:
+            objects = {}
+            for entry in self._entries.values():
+                size, atime = objects.get(entry["hash"], (entry["size"], 0))
+                objects[entry["hash"]] = (size, max(atime, entry["atime"]))
+
+            total = sum(size for size, _ in objects.values())
+            for digest, (size, _) in sorted(objects.items(), key=lambda o: o[1][1]):
+                if total <= self.max_size:
+                    break
+                if digest == keep:
+                    continue
+                for key in [k for k, e in self._entries.items() if e["hash"] == digest]:
+                    self._remove(key)
+                total -= size
+
+    def save(self) -> None:
+        """Writes the index, merged with changes other processes made to the
+        index since it was read."""
+        if files.is_dry_run():
+            return
+        with self._lock:
+            entries = self._read_index()
+            for key in self._removed:
+                entries.pop(key, None)
+            for key, entry in self._entries.items():
+                if key not in entries or entries[key]["atime"] < entry["atime"]:
+                    entries[key] = entry
+            self._entries = entries
+            self._removed.clear()
+
+            files.make_dirs(self.root)
+            part = self.index_path.with_name(f"{INDEX_FILE}.{os.getpid()}.part")
+            with part.open("w", encoding="utf-8") as f:
+                json.dump({"format": INDEX_FORMAT, "entries": entries}, f, indent=1)
+            os.replace(part, self.index_path)
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self._removed.add(key)
+        if not any(e["hash"] == entry["hash"] for e in self._entries.values()):
+            files.remove_path(self.object_path(entry["hash"]))
+
+    def _read_index(self) -> dict[str, dict]:
+        try:
+            with self.index_path.open("r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if index.get("format") != INDEX_FORMAT:
+            return {}
+        return index["entries"]
+
+
+# open caches by directory, shared by all versions of a run
+_caches: dict[Path, FileCache] = {}
+
+
+def get_cache(root: Path, max_size: int = DEFAULT_MAX_SIZE) -> FileCache:
+    """Returns the `FileCache` for the directory `root`."""
+    if root not in _caches:
+        _caches[root] = FileCache(root, max_size=max_size)
+    cache = _caches[root]
+    cache.max_size = max_size
+    return cache
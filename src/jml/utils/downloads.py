@@ -0,0 +1,171 @@
+"""Concurrent file downloads with persistent connections.
+
+`fetch_urls()` downloads a batch of urls with a bounded pool of threads.
+Each thread keeps one keep-alive connection per host open (see
+`ConnectionPool`), so several files from the same server do not need a
+new connection each. Urls that need a proxy are downloaded with
+`urllib.request` instead.
+"""
+
+import http.client
+import os
+import shutil
+import threading
+import typing as t
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from ..trace import span
+from . import files
+
+# Maximum number of redirects to follow for one url
+MAX_REDIRECTS = 5
+
+USER_AGENT = "jml"
+
+
+class ConnectionPool:
+    """
+    Keeps one open HTTP connection per host and thread.
+
+    Args:
+        timeout (float): Timeout for new connections in seconds.
+    """
+
+    def __init__(self, timeout: float = 30):
+        self.timeout = timeout
+        self.opened = 0
+        self._local = threading.local()
+        self._all: list[http.client.HTTPConnection] = []
+        self._lock = threading.Lock()
+
+    def get(self, scheme: str, netloc: str) -> http.client.HTTPConnection:
+        """Returns the connection of this thread to `netloc`, opening a new
+        one if necessary."""
+        connections = self._connections()
+        if (scheme, netloc) not in connections:
+            if scheme == "https":
+                conn = http.client.HTTPSConnection(netloc, timeout=self.timeout)
+            elif scheme == "http":
+                conn = http.client.HTTPConnection(netloc, timeout=self.timeout)
+            else:
+                raise OSError(f"unsupported url scheme {scheme}")
+            connections[(scheme, netloc)] = conn
+            with self._lock:
+                self._all.append(conn)
+                self.opened += 1
+        return connections[(scheme, netloc)]
+
+    def discard(self, scheme: str, netloc: str) -> None:
+        """Closes the connection of this thread to `netloc`."""
+        if conn := self._connections().pop((scheme, netloc), None):
+            conn.close()
+
+    def close(self) -> None:
+        """Closes all connections of all threads."""
+        with self._lock:
+            for conn in self._all:
+                conn.close()
+            self._all.clear()
+
+    def _connections(self) -> dict[tuple[str, str], http.client.HTTPConnection]:
+        if not hasattr(self._local, "connections"):
+            self._local.connections = {}
+        return self._local.connections
+
+    def __enter__(self) -> "ConnectionPool":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def fetch_url(url: str, dest: Path, pool: ConnectionPool) -> Path:
+    """
+    Downloads `url` to `dest`, using a connection from `pool`. Redirects
+    are followed. The file is written next to `dest` first and only moved
+    into place once it is complete.
+
+    Raises:
+        OSError: If the download failed.
+    """
+    part = dest.with_name(f"{dest.name}.part")
+    files.make_dirs(dest.parent)
+
+    if _needs_proxy(url):
+        urllib.request.urlretrieve(url, part)
+        os.replace(part, dest)
+        return dest
+
+    for _ in range(MAX_REDIRECTS + 1):
+        parts = urllib.parse.urlsplit(url)
+        path = urllib.parse.urlunsplit(("", "", parts.path or "/", parts.query, ""))
+        response = _request(pool, parts.scheme, parts.netloc, path)
+
+        if response.status in (301, 302, 303, 307, 308):
+            response.read()
+            url = urllib.parse.urljoin(url, response.getheader("Location", ""))
+            continue
+        elif response.status != 200:
+            response.read()
+            raise OSError(f"HTTP Error {response.status}: {response.reason}")
+
+        with part.open("wb") as f:
+            shutil.copyfileobj(response, f)
+        os.replace(part, dest)
+        return dest
+    raise OSError(f"too many redirects for {url}")
+
+
+def _request(
+    pool: ConnectionPool, scheme: str, netloc: str, path: str
+) -> http.client.HTTPResponse:
+    """Sends a GET request with a pooled connection and retries once with a
+    new connection, if the server closed the kept-alive connection."""
+    for retry in (True, False):
+        conn = pool.get(scheme, netloc)
+        try:
+            conn.request("GET", path, headers={"User-Agent": USER_AGENT})
+            return conn.getresponse()
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            pool.discard(scheme, netloc)
+            if not retry:
+                raise
+        except (OSError, http.client.HTTPException):
+            pool.discard(scheme, netloc)
+            raise
+
+
+def _needs_proxy(url: str) -> bool:
+    parts = urllib.parse.urlsplit(url)
+    return parts.scheme in urllib.request.getproxies() and not (
+        urllib.request.proxy_bypass(parts.hostname or "")
+    )
+
+
+def fetch_urls(
+    downloads: t.Mapping[str, Path], threads: int = 8
+) -> dict[str, Exception]:
+    """
+    Downloads all urls in `downloads` to their destination paths
+    concurrently, using up to `threads` threads.
+
+    Returns:
+        dict: The exceptions of all failed downloads by url.
+    """
+    errors = {}
+
+    def fetch(item: tuple[str, Path]) -> None:
+        url, dest = item
+        try:
+            with span(url, "download"):
+                fetch_url(url, dest, pool)
+        except (OSError, http.client.HTTPException, ValueError) as err:
+            errors[url] = err
+
+    with ConnectionPool() as pool:
+        with ThreadPoolExecutor(max_workers=max(1, threads)) as executor:
+            list(executor.map(fetch, downloads.items()))
+    return errors
@@ -1,12 +1,8 @@
-import hashlib
 import io
 import logging
+import os
 import shutil
-import tempfile
 import typing as t
-import urllib.parse
-import urllib.request
-import zipfile
 from pathlib import Path
 
 logger = logging.getLogger("jml")
@@ -14,6 +10,12 @@ logger = logging.getLogger("jml")
 # module global flag for dry run mode
 _DRY_RUN = False
 
+# ioctl request to clone a file on Linux filesystems with reflink support
+FICLONE = 0x40049409
+
+# Modes for link_path()
+LINK_MODES = ("copy", "hardlink", "reflink")
+
 
 def enable_dry_run() -> None:
     """
@@ -22,67 +24,20 @@ def enable_dry_run() -> None:
     globals()["_DRY_RUN"] = True
 
 
-def is_cached(path: Path, cache: Path) -> Path | None:
-    """Checks if the given file exists within the cache dir and
-    returns either the cached Path or None.
-
-    Args:
-        path (Path): Path to the file to check.
-        cache (Path): Path to the cache directory.
-
-    Returns:
-        Path or None: Either the path of the cached file or `None`.
-    """
-    for file in cache.glob(path.name):
-        if file.is_file():
-            return file
-    return None
-
-
-def check_cache(path: Path, cache: Path | None) -> Path | None:
+def walk(path: Path) -> t.Iterator[tuple[Path, list[str], list[str]]]:
     """
-    Returns the path to the cached version of path. If path is not cached,
-    it is copied to the cache first.
-
-    If `cache` is `None`, the function will always return `None`.
+    Walks the directory tree at `path` top-down like `Path.walk()`, which is
+    only available since Python 3.12. Directories and files are yielded in
+    sorted order. Like with `Path.walk()`, `dirs` may be modified in place to
+    prune the walk.
 
     Args:
-        path (Path): Path to the file to cache.
-        cache (Path or None): Path to the cache directory or `None`.
-
-    Returns:
-        Path or None: The cached version of the file.
+        path (Path): Path to the directory to walk.
     """
-    if not cache:
-        return None
-
-    if cached := is_cached(path, cache):
-        return cached
-    else:
-        # copy path to cache
-        make_dirs(cache)
-        if path.is_dir():
-            shutil.copytree(path, cache / path.name)
-        elif path.is_file():
-            shutil.copy(path, cache)
-        else:
-            return None
-        return cache / path.name
-
-
-def clear_cache(path: Path, cache: Path) -> None:
-    """
-    Removes `path` from the `cache` directory.
-
-    Args:
-        path (Path): Path to the to the file to remove from the cache.
-        cache (Path): Path to the cache directory.
-    """
-    if cached := is_cached(path, cache):
-        if path.is_dir():
-            shutil.rmtree(cached)
-        else:
-            cached.unlink()
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        files.sort()
+        yield Path(root), dirs, files
 
 
 def make_dirs(path: Path, exist_ok: bool = True) -> None:
@@ -100,37 +55,81 @@ def make_dirs(path: Path, exist_ok: bool = True) -> None:
     path.mkdir(exist_ok=exist_ok, parents=True)
 
 
-def copy_path(source: Path, dest: Path, cache: Path | None = None) -> None:
+def copy_path(source: Path, dest: Path, keep_stat: bool = False) -> None:
     """
     Copies the file or directory at `source` to `dest`. Directories are copied
     recursive. If `dest` does not exist, the parent folder is created.
 
     If `source` is a file and `dest` a directory, `source` is copied to `dest`.
-    If `dest` is a file, `source` is copied to that file. If `dest` is an
-    existing file, the operation fails.
+    If `dest` is a file, `source` is copied to that file. An existing file at
+    `dest` is replaced, so files hardlinked to it are not changed.
 
     If `source` is a directory and `dest`, too, `source` is copied into `dest`. If `dest` is an existing file, the operation fails.
 
-    If `cache` is a directory path, it is checked first for a cached version of
-    `source` and if present, the cached version is copied.
+    If `keep_stat` is set, the modification time of `source` is copied, too.
 
     Args:
         source (Path): Path to the source file or directory.
         dest (Path):Path to the destination.
-        cache (Path or None): Optional Path to a cache directory.
+        keep_stat (bool): Copy the file times and mode like `shutil.copy2()`.
     """
     if _DRY_RUN:
         return
 
-    if cache:
-        source = check_cache(source, cache)
-
     # TODO: error handling
     make_dirs(dest.parent)
     if source.is_dir():
         shutil.copytree(source, dest)
     elif source.is_file():
-        shutil.copy(source, dest)
+        if dest.is_file() or dest.is_symlink():
+            dest.unlink()
+        if keep_stat:
+            shutil.copy2(source, dest)
+        else:
+            shutil.copy(source, dest)
+
+
+def link_path(source: Path, dest: Path, mode: str = "hardlink") -> str:
+    """
+    Creates the file `dest` as a hardlink (`mode="hardlink"`) or reflink
+    (`mode="reflink"`) to the file `source`. If linking is not possible,
+    e.g. because `dest` is on another filesystem or the filesystem does not
+    support reflinks, `source` is copied instead.
+
+    An existing file at `dest` is replaced.
+
+    Args:
+        source (Path): Path to the source file.
+        dest (Path): Path to the destination file.
+        mode (str): One of `hardlink`, `reflink` or `copy`.
+
+    Returns:
+        str: The mode that was used to create `dest`.
+    """
+    if _DRY_RUN:
+        return mode
+
+    make_dirs(dest.parent)
+    if dest.is_file() or dest.is_symlink():
+        dest.unlink()
+
+    try:
+        if mode == "hardlink":
+            os.link(source, dest)
+            return mode
+        elif mode == "reflink":
+            import fcntl
+
+            with source.open("rb") as src, dest.open("wb") as dst:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            shutil.copymode(source, dest)
+            return mode
+    except (OSError, ImportError) as err:
+        logger.debug(f"failed to {mode} [jml.path]{dest}[/]: {err}")
+        if dest.is_file():
+            dest.unlink()
+    shutil.copy(source, dest)
+    return "copy"
 
 
 def remove_path(path: Path) -> None:
@@ -152,71 +151,68 @@ def remove_path(path: Path) -> None:
 def open_path(path: Path, mode: str = "w", encoding: str = "utf-8") -> t.IO[t.Any]:
     """
     Opens `path` for reading/writing. Arguments are passed to `Path.open()`.
+
+    A file that is opened for writing and has other hard links (see
+    `link_path()`) is replaced by a new file, so the linked files are not
+    changed.
     """
-    if mode[0] == "w" and _DRY_RUN:
-        return io.StringIO()
-    else:
-        return path.open(mode, encoding=encoding)
-
-
-def download_file(
-    url: str,
-    dest: Path,
-    cache: Path | None = None,
-    checksum: str | None = None,
-    checksum_method: str = "sha1",
-) -> bool:
-    """
-    Downloads a file from `url` to `dest`.
+    if mode[0] == "w":
+        if _DRY_RUN:
+            return io.StringIO()
+        try:
+            if path.stat().st_nlink > 1:
+                path.unlink()
+        except FileNotFoundError:
+            pass
+    return path.open(mode, encoding=encoding)
 
-    If `cache` is given it will be checked for a cached version of the file first. If there is non, the file will be downloaded to `cache` first.
 
-    If `checksum` and `checksum_method` are given, the file hash is verified
-    once after download. An already cached version is not verified again.
+def verify_checksum(file: Path, checksum: str, method: str = "sha1") -> bool:
+    return file_hash(file, method=method) == checksum
 
-    Args:
-        url (str): URL to a valid file download.
-        dest (Path): Path to the download destination.
-        cache (Path or None): Optional path to a cache directory.
-        checksum (str): Optional checksum hash of the file.
-        checksum_method (str): Hashing method used for checksum verification (defaults to `sha1`).
 
-    Returns:
-        bool: If the download succeeded (or the file was copied from the cache).
+def file_hash(file: Path, method: str = "sha1") -> str:
     """
-    if _DRY_RUN:
-        return True
+    Computes the hex digest of the content of `file`.
 
-    url_parsed = urllib.parse.urlparse(url)
-    url_path = Path(url_parsed.path)
+    Args:
+        file (Path): Path to the file to hash.
+        method (str): Hashing method (defaults to `sha1`).
+    """
+    import hashlib
 
-    if cache:
-        if cached := is_cached(url_path, cache):
-            copy_path(cached, dest)
-            return True
+    with file.open("rb") as f:
+        digest = hashlib.file_digest(f, method)
+    return digest.hexdigest()
 
-    with tempfile.TemporaryDirectory() as load_dest:
-        load_dest = Path(load_dest)
-        loaded_file, _ = urllib.request.urlretrieve(url, load_dest / url_path.name)
 
-        if checksum:
-            if not verify_checksum(loaded_file, checksum, method=checksum_method):
-                raise IOError(f"Failed to verify checksum for download {url}.")
+def is_dry_run() -> bool:
+    """
+    Checks if dry run mode is enabled for file operations.
+    """
+    return _DRY_RUN
 
-        if cache:
-            # copied the download to the cache
-            check_cache(loaded_file, cache)
-        copy_path(loaded_file, dest)
-    return True
 
+def zip_path(path: Path, dest: Path | None = None) -> Path:
+    """
+    Returns the path of the zip file for `path` (see `create_zip()`).
 
-def verify_checksum(file: Path, checksum: str, method: str = "sha1") -> bool:
-    with file.open("rb") as f:
-        digest = hashlib.file_digest(f, method)
-    return digest.hexdigest() == checksum
+    Args:
+        path (Path): Path to the file or directory to zip.
+        dest (Path): Optional destination for the zip file.
+    """
+    zip_file = path.with_suffix(".zip")
+    if dest:
+        if dest.suffix == ".zip":
+            zip_file = dest
+        else:
+            zip_file = dest / zip_file.name
+    return zip_file
 
 
-def create_zip(path: Path, dest: Path | None = None) -> Path | None:
+def create_zip(
+    path: Path, dest: Path | None = None, changed: t.Container[str] | None = None
+) -> Path | None:
     """
     Creates a zip file from `path`.
 
@@ -225,37 +221,42 @@ def create_zip(path: Path, dest: Path | None = None) -> Path | None:
     a Path to a `.zip` file, it is used as the zip target, otherwise it is
     used as the target directory.
 
+    The archive is reproducible: entries are sorted and have a fixed
+    timestamp (see `jml.utils.zips`).
+
+    If `changed` is given, the compressed entries of an existing zip file
+    are reused for all files, except the `changed` ones (given by their
+    posix path relative to `path`).
+
     Returns the Path of the created file or `None` if the creation failed.
 
     Args:
         path (Path): Path to the file or directory to zip.
         dest (Path): Optional destination for the zip file.
+        changed (Container): Optional paths of the files changed since the zip file was created.
 
     Returns:
         None or Path: The path of the created zip file.
     """
+    zip_file = zip_path(path, dest)
     if _DRY_RUN:
-        return
-
-    zip_file = path.with_suffix(".zip")
-    if dest:
-        if dest.suffix == ".zip":
-            zip_file = dest
-        else:
-            zip_file = dest / zip_file.name
+        return zip_file
 
-    make_dirs(zip_file.parent)
-    if zip_file.is_file():
-        if zip_file.is_file():
-            remove_path(zip_file)
+    from .zips import ZipWriter, file_mode, read_payloads
 
-    with zipfile.ZipFile(zip_file, "w", zipfile.ZIP_DEFLATED) as zipf:
+    payloads = read_payloads(zip_file) if changed is not None else {}
+    with ZipWriter(zip_file) as zipf:
         if path.is_dir():
-            for root, dirs, files in path.walk():
+            for root, dirs, files in walk(path):
                 for file in files:
                     filepath = root / file
-                    relpath = filepath.relative_to(path)
-                    zipf.write(filepath, arcname=relpath)
+                    arcname = filepath.relative_to(path).as_posix()
+                    if arcname in payloads and arcname not in changed:
+                        zipf.add_payload(
+                            arcname, payloads[arcname], file_mode(filepath)
+                        )
+                    else:
+                        zipf.add_file(arcname, filepath)
         elif path.is_file():
-            zipf.write(path, arcname=path.name)
+            zipf.add_file(path.name, path)
     return zip_file
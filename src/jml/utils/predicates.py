@@ -0,0 +1,118 @@
+"""Version predicates for the arguments of task and solution markers.
+
+An argument like `2`, `>=2`, `!=3`, `2-4`, `1,3` or `!1,3` is parsed once
+into a `VersionPredicate` (see `compile_predicate()`), which stores the
+selected version numbers as a bitmask.
+
+Grammar (without whitespace):
+
+    predicate := ["!"] item ("," item)*
+    item      := number "-" number | [op] number
+    op        := "=" | "==" | "<" | "<=" | ">" | ">=" | "!=" | "<>"
+
+A leading `!` followed by a number negates the whole list, so `!1,3`
+selects all versions but `1` and `3`.
+"""
+
+import functools
+import re
+import typing as t
+from dataclasses import dataclass
+
+RE_ITEM = re.compile(r"^(?:(\d+)-(\d+)|([!<>=]{0,2})(\d+))$")
+
+
+@dataclass(frozen=True, slots=True)
+class VersionPredicate:
+    """A set of version numbers. Versions below `start` are selected by the
+    bits in `mask`, all versions from `start` on are selected if `rest` is
+    set. `numbers` holds the version numbers given in the argument."""
+
+    mask: int = 0
+    start: int = 0
+    rest: bool = False
+    numbers: frozenset[int] = frozenset()
+
+    def __contains__(self, version: int) -> bool:
+        if version < 0:
+            return False
+        elif version >= self.start:
+            return self.rest
+        return bool(self.mask >> version & 1)
+
+    def __or__(self, other: "VersionPredicate") -> "VersionPredicate":
+        start = max(self.start, other.start)
+        return VersionPredicate(
+            self._extend(start) | other._extend(start),
+            start,
+            self.rest or other.rest,
+            self.numbers | other.numbers,
+        )
+
+    def __invert__(self) -> "VersionPredicate":
+        return VersionPredicate(
+            self.mask ^ ((1 << self.start) - 1), self.start, not self.rest, self.numbers
+        )
+
+    def _extend(self, start: int) -> int:
+        """Returns the mask for a larger `start`."""
+        if self.rest:
+            return self.mask | ((1 << start) - (1 << self.start))
+        return self.mask
+
+    def select(self, versions: t.Iterable[int]) -> set[int]:
+        """Returns the `versions` selected by this predicate."""
+        versions = set(versions)
+        if not versions:
+            return versions
+        upper = max(max(versions) + 1, self.start)
+        selected = self._extend(upper)
+        return versions.intersection(v for v in range(upper) if selected >> v & 1)
+
+
+# selects every version, used for arguments that are no predicates
+ALL = VersionPredicate(rest=True)
+
+
+@functools.lru_cache(maxsize=1024)
+def compile_predicate(arg: str) -> VersionPredicate | None:
+    """Parses a marker argument into a `VersionPredicate`.
+
+    Returns `None` if `arg` is not a valid predicate. Predicates are cached
+    by their argument string.
+    """
+    negate = arg.startswith("!") and arg[1:2].isdigit()
+    if negate:
+        arg = arg[1:]
+
+    predicate = VersionPredicate()
+    for item in arg.split(","):
+        if not (match := RE_ITEM.match(item)):
+            return None
+        predicate = predicate | _compile_item(match)
+    return ~predicate if negate else predicate
+
+
+def _compile_item(match: re.Match) -> VersionPredicate:
+    if match.group(1) is not None:
+        low, high = int(match.group(1)), int(match.group(2))
+        mask = ((1 << (high + 1)) - 1) ^ ((1 << low) - 1) if low <= high else 0
+        return VersionPredicate(mask, high + 1, False, frozenset((low, high)))
+
+    op, ver = match.group(3), int(match.group(4))
+    numbers = frozenset((ver,))
+    below = (1 << ver) - 1
+    if op in ("", "=", "=="):
+        return VersionPredicate(1 << ver, ver + 1, False, numbers)
+    elif op == "<":
+        return VersionPredicate(below, ver, False, numbers)
+    elif op == "<=":
+        return VersionPredicate(below | 1 << ver, ver + 1, False, numbers)
+    elif op == ">":
+        return VersionPredicate(0, ver + 1, True, numbers)
+    elif op == ">=":
+        return VersionPredicate(0, ver, True, numbers)
+    elif op in ("!=", "<>"):
+        return VersionPredicate(below, ver + 1, True, numbers)
+    # unknown operators select no version
+    return VersionPredicate(numbers=numbers)
@@ -0,0 +1,421 @@
+"""Reproducible zip archives for project versions.
+
+Entries are compressed in a pool of threads (zlib releases the GIL) and
+written in sorted order with a fixed timestamp, so the same files always
+result in the same archive. Already compressed file types are stored
+without compression. The compressed payloads are kept in the module wide
+`ZipEngine` and reused for byte-identical files in other archives of the
+same run, e.g. the verbatim copied files of each version.
+
+Only a few entries are compressed ahead of the one being written, so the
+payloads of an archive are not kept in memory all at once. Archives with
+more than 65535 entries or files larger than 4 GiB use the zip64 format.
+"""
+
+import functools
+import hashlib
+import os
+import struct
+import threading
+import time
+import typing as t
+import zipfile
+import zlib
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+from . import files
+
+# File types that do not shrink when compressed again
+STORED_SUFFIXES = frozenset(
+    (
+        ".7z",
+        ".avif",
+        ".bz2",
+        ".docx",
+        ".gif",
+        ".gz",
+        ".jar",
+        ".jpeg",
+        ".jpg",
+        ".mp3",
+        ".mp4",
+        ".odp",
+        ".ods",
+        ".odt",
+        ".png",
+        ".pptx",
+        ".war",
+        ".webp",
+        ".xlsx",
+        ".xz",
+        ".zip",
+    )
+)
+
+# Timestamp for all entries, the earliest date a zip file can store
+ZIP_EPOCH = (1980, 1, 1, 0, 0, 0)
+
+# Limits of zip files without the zip64 extension. Larger values are
+# stored in zip64 records and replaced by ZIP64_MARKER in the headers.
+ZIP_MAX_SIZE = 0xFFFFFFFF
+ZIP_MAX_ENTRIES = 0xFFFF
+ZIP64_MARKER = 0xFFFFFFFF
+
+# Number of entries compressed ahead per thread of the engine
+ZIP_QUEUE_SIZE = 2
+
+
+def zip_timestamp() -> tuple[int, int, int, int, int, int]:
+    """Returns the timestamp for zip entries. `SOURCE_DATE_EPOCH` is used if
+    set in the environment, otherwise `ZIP_EPOCH`."""
+    if epoch := os.environ.get("SOURCE_DATE_EPOCH"):
+        return max(ZIP_EPOCH, time.gmtime(int(epoch))[:6])
+    return ZIP_EPOCH
+
+
+@dataclass(frozen=True, slots=True)
+class Payload:
+    """The (compressed) data of a zip entry."""
+
+    method: int
+    crc: int
+    size: int
+    data: bytes
+
+
+class ZipEngine:
+    """
+    Compresses the entries of zip archives and caches the compressed
+    payloads by the hash of their content.
+
+    Args:
+        threads (int): Number of threads to compress entries with. Defaults to the number of CPUs.
+        level (int): Compression level for zlib.
+        cache_size (int): Maximum number of compressed bytes to keep in the cache.
+    """
+
+    def __init__(
+        self,
+        threads: int | None = None,
+        level: int = zlib.Z_DEFAULT_COMPRESSION,
+        cache_size: int = 64 * 1024 * 1024,
+    ):
+        self.threads = threads or os.cpu_count() or 1
+        self.level = level
+        self.cache_size = cache_size
+        self.hits = 0
+        self._cache: OrderedDict[tuple[bytes, bool], Payload] = OrderedDict()
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+
+    def compress(self, data: bytes, store: bool = False) -> Payload:
+        """Compresses `data` with deflate, unless `store` is set or the data
+        does not shrink. Payloads for identical data are taken from the
+        cache."""
+        key = (hashlib.sha1(data).digest(), store)
+        with self._lock:
+            if (payload := self._cache.get(key)) is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return payload
+
+        crc = zlib.crc32(data)
+        payload = Payload(zipfile.ZIP_STORED, crc, len(data), data)
+        if not store and data:
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, -15)
+            compressed = compressor.compress(data) + compressor.flush()
+            if len(compressed) < len(data):
+                payload = Payload(zipfile.ZIP_DEFLATED, crc, len(data), compressed)
+
+        with self._lock:
+            if key not in self._cache and len(payload.data) <= self.cache_size:
+                self._cache[key] = payload
+                self._cached_bytes += len(payload.data)
+                while self._cached_bytes > self.cache_size:
+                    _, old = self._cache.popitem(last=False)
+                    self._cached_bytes -= len(old.data)
+        return payload
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+            self._cached_bytes = 0
+
+
+# module global engine to share payloads between the archives of a run
+_ENGINE = ZipEngine()
+
+
+def get_engine() -> ZipEngine:
+    return _ENGINE
+
+
+class ZipWriter:
+    """
+    Collects files and writes them into a reproducible zip archive on
+    `close()`. Files can be added from multiple threads.
+
+    In dry run mode no archive is written.
+
+    Args:
+        path (Path): Path of the zip file to create. An existing file is replaced.
+        engine (ZipEngine): Engine to compress the entries with. Defaults to the module wide engine.
+    """
+
+    def __init__(self, path: Path, engine: ZipEngine | None = None):
+        self.path = path
+        self.engine = engine or get_engine()
+        self._entries: dict[str, tuple[t.Callable[[], Payload], int]] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def add(self, arcname: str | Path, data: bytes, mode: int = 0o644) -> None:
+        """Adds `data` as the file `arcname`."""
+        self._add(arcname, lambda: data, mode)
+
+    def add_file(self, arcname: str | Path, source: Path) -> None:
+        """Adds the file at `source` as `arcname`. The file is read when the
+        archive is written."""
+        self._add(arcname, source.read_bytes, file_mode(source))
+
+    def add_payload(
+        self, arcname: str | Path, load: t.Callable[[], Payload], mode: int = 0o644
+    ) -> None:
+        """Adds the file `arcname` with the compressed payload returned by
+        `load`, e.g. from an existing archive (see `read_payloads()`)."""
+        name = Path(arcname).as_posix()
+        with self._lock:
+            self._entries[name] = (load, mode)
+
+    def _add(self, arcname: str | Path, load: t.Callable[[], bytes], mode: int) -> None:
+        store = Path(arcname).suffix.lower() in STORED_SUFFIXES
+        self.add_payload(
+            arcname, lambda: self.engine.compress(load(), store=store), mode
+        )
+
+    def close(self) -> None:
+        """Compresses all entries and writes the archive. Each entry is
+        written as soon as it is compressed."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            # reversed to pop the entries in sorted order
+            entries = sorted(self._entries.items(), reverse=True)
+            self._entries.clear()
+        if files.is_dry_run():
+            return
+
+        files.make_dirs(self.path.parent)
+        # an existing archive is replaced when the new one is complete, so
+        # its payloads can be reused
+        part = self.path.with_name(f"{self.path.name}.part")
+        try:
+            self._write(part, entries)
+            os.replace(part, self.path)
+        finally:
+            if part.exists():
+                part.unlink()
+
+    def _write(self, path: Path, entries: list) -> None:
+        date_time = zip_timestamp()
+        executor = ThreadPoolExecutor(max_workers=self.engine.threads)
+        with executor, path.open("wb") as zipf:
+            central = []
+            pending = deque()
+            while entries or pending:
+                while entries and len(pending) < self.engine.threads * ZIP_QUEUE_SIZE:
+                    name, (load, mode) = entries.pop()
+                    pending.append((name, mode, executor.submit(load)))
+                name, mode, future = pending.popleft()
+                payload = future.result()
+
+                offset = zipf.tell()
+                zipf.write(_local_header(name, payload, date_time))
+                zipf.write(payload.data)
+                # only the header is kept, not the payload
+                central.append(_central_header(name, payload, mode, offset, date_time))
+
+            start = zipf.tell()
+            zipf.writelines(central)
+            _write_end_records(zipf, len(central), start, zipf.tell())
+
+    def __enter__(self) -> "ZipWriter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def file_mode(path: Path) -> int:
+    """Returns the mode of the zip entry for the file at `path`."""
+    return 0o755 if os.access(path, os.X_OK) else 0o644
+
+
+def read_payloads(path: Path) -> dict[str, t.Callable[[], Payload]]:
+    """
+    Reads the central directory of the archive at `path`, written by a
+    `ZipWriter`, and returns a function to load the compressed payload for
+    each entry. Entries of other archives (with other timestamps or
+    compression methods) are skipped, so a new archive with the reused
+    payloads is the same as one compressed from scratch.
+
+    Returns an empty dict, if there is no readable archive at `path`.
+    """
+    try:
+        with zipfile.ZipFile(path) as zipf:
+            infos = zipf.infolist()
+    except (OSError, zipfile.BadZipFile):
+        return {}
+
+    date_time = zip_timestamp()
+    return {
+        info.filename: functools.partial(_read_payload, path, info)
+        for info in infos
+        if info.date_time == date_time
+        and info.compress_type in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED)
+        and not info.flag_bits & ~0x800
+    }
+
+
+def _read_payload(path: Path, info: zipfile.ZipInfo) -> Payload:
+    with path.open("rb") as f:
+        f.seek(info.header_offset + 26)
+        name_size, extra_size = struct.unpack("<HH", f.read(4))
+        f.seek(name_size + extra_size, os.SEEK_CUR)
+        data = f.read(info.compress_size)
+    return Payload(info.compress_type, info.CRC, info.file_size, data)
+
+
+def _header(
+    name: str, payload: Payload, date_time: tuple, extra=b"", zip64: bool = False
+) -> bytes:
+    """Packs the fields shared by the local and central headers of an entry.
+    If `zip64` is set, the sizes are stored in the zip64 `extra` field."""
+    year, month, day, hour, minute, second = date_time
+    flags = 0 if name.isascii() else 0x800  # utf-8 file name
+    sizes = (len(payload.data), payload.size)
+    if zip64:
+        sizes = (ZIP64_MARKER, ZIP64_MARKER)
+    return struct.pack(
+        "<HHHHHIIIHH",
+        45 if extra else 20,
+        flags,
+        payload.method,
+        (hour << 11) | (minute << 5) | (second // 2),
+        ((year - 1980) << 9) | (month << 5) | day,
+        payload.crc,
+        *sizes,
+        len(name.encode("utf-8")),
+        len(extra),
+    )
+
+
+def _local_header(name: str, payload: Payload, date_time: tuple) -> bytes:
+    zip64 = max(payload.size, len(payload.data)) >= ZIP_MAX_SIZE
+    extra = b""
+    if zip64:
+        extra = struct.pack("<HHQQ", 0x0001, 16, payload.size, len(payload.data))
+    return (
+        struct.pack("<I", 0x04034B50)
+        + _header(name, payload, date_time, extra=extra, zip64=zip64)
+        + name.encode("utf-8")
+        + extra
+    )
+
+
+def _central_header(
+    name: str, payload: Payload, mode: int, offset: int, date_time: tuple
+) -> bytes:
+    # values too large for the header are stored in the zip64 extra field
+    zip64 = max(payload.size, len(payload.data)) >= ZIP_MAX_SIZE
+    values = [payload.size, len(payload.data)] if zip64 else []
+    if offset >= ZIP_MAX_SIZE:
+        values.append(offset)
+        offset = ZIP64_MARKER
+    extra = b""
+    if values:
+        extra = struct.pack(f"<HH{len(values)}Q", 0x0001, 8 * len(values), *values)
+
+    return (
+        struct.pack("<IH", 0x02014B50, (3 << 8) | 20)
+        + _header(name, payload, date_time, extra=extra, zip64=zip64)
+        + struct.pack("<HHHII", 0, 0, 0, (0o100000 | mode) << 16, offset)
+        + name.encode("utf-8")
+        + extra
+    )
+
+
+def _write_end_records(zipf: t.BinaryIO, count: int, start: int, end: int) -> None:
+    """Writes the end of central directory record, preceded by the zip64
+    records if the archive exceeds the limits of zip files."""
+    size = end - start
+    if count >= ZIP_MAX_ENTRIES or max(start, size) >= ZIP_MAX_SIZE:
+        zipf.write(
+            struct.pack(
+                "<IQHHIIQQQQ",
+                0x06064B50,
+                44,
+                (3 << 8) | 45,
+                45,
+                0,
+                0,
+                count,
+                count,
+                size,
+                start,
+            )
+            + struct.pack("<IIQI", 0x07064B50, 0, end, 1)
+        )
+        count = min(count, 0xFFFF)
+        size = min(size, ZIP64_MARKER)
+        start = min(start, ZIP64_MARKER)
+    zipf.write(struct.pack("<IHHHHIIH", 0x06054B50, 0, 0, count, count, size, start, 0))
+
+
+class ZipSink:
+    """
+    Collects the files of a project version for its zip archive, without
+    creating the version directory first. The archive is written when the
+    sink is closed, in sorted order to be reproducible. Until then, written
+    data is kept in memory and copied files are only referenced.
+
+    Entries are named by their path relative to the version directory, like
+    the entries created by `files.create_zip()`. The sink may be shared
+    between threads.
+
+    Args:
+        path (Path): Path of the zip file to create. An existing file is replaced.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._zip = ZipWriter(path)
+
+    def write(self, relpath: Path, data: str | bytes, encoding: str = "utf-8") -> None:
+        """
+        Writes `data` as the file at `relpath`. Text is encoded with
+        `encoding` and newlines are translated like in files opened in
+        text mode.
+        """
+        if isinstance(data, str):
+            if os.linesep != "\n":
+                data = data.replace("\n", os.linesep)
+            data = data.encode(encoding)
+        self._zip.add(relpath, data)
+
+    def copy(self, source: Path, relpath: Path) -> None:
+        """Copies the file at `source` into the archive at `relpath`."""
+        self._zip.add_file(relpath, source)
+
+    def close(self) -> None:
+        self._zip.close()
+
+    def __enter__(self) -> "ZipSink":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
@@ -1,33 +1,78 @@
+import copy
+import functools
 import logging
+import os
 import re
 import tempfile
+import time
 import typing as t
-from collections.abc import Iterable
+from collections.abc import Iterable, Mapping
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
 from datetime import datetime
 from pathlib import Path
 
-from rich.console import Console
-
-from jml import __cmdname__, __version__
-
 from .config import CONFIG_FILE, ConfigDict
-from .utils import files, is_url, match_patterns, resolve_path, test_version, parse_url
-
-# Some constants
-RE_VERSION = re.compile(r"^\d+$")
-RE_VERSION2 = re.compile(r"^([!<>=]{0,2})(\d+)$")
-
-ML_INT = -1
+from .events import EXTRA_FILE, FILE, VERSION_DONE, VERSION_START, ZIP, emit
+from .console import create_console
+from .markers import (
+    ML_INT,
+    MarkedFile,
+    is_verbatim,
+    parse,
+    scan_versions,
+    tag_key,
+)
+from .settings import VersionSettings
+from .stats import get_stats, phase
+from .trace import get_tracer, span
+from .utils import (
+    compile_dir_patterns,
+    compile_patterns,
+    files,
+    is_url,
+    resolve_path,
+)
+from .utils.cache import (
+    DEFAULT_MAX_SIZE,
+    FileCache,
+    default_cache_dir,
+    download_key,
+    get_cache,
+)
+from .utils.zips import ZipSink, get_engine
+
+if t.TYPE_CHECKING:
+    from rich.console import Console
+
+# Lines of a text with their line break
+RE_LINES = re.compile(r"[^\n]*\n|[^\n]+")
+# Patterns without special characters (besides escaped punctuation), which
+# can't match a line break or depend on the start and end of a line
+RE_LITERAL = re.compile(r"(?:[^\\.^$*+?{}\[\]|()\n]|\\[^\w\s])+")
+
+# Number of threads for concurrent downloads
+DOWNLOAD_THREADS = 8
+
+# Actions for files in the source project
+SKIP = "skip"
+EXCLUDE = "exclude"
+COMPILE = "compile"
+COPY = "copy"
+# Status of a file that was compiled without content
+EMPTY = "empty"
+# Status of a file without markers that was copied instead of compiled
+VERBATIM = "verbatim"
 
 logger = logging.getLogger("jml")
 
 
-def create_solution(config: dict, console: Console = None) -> set[int]:
+def create_solution(config: dict, console: "Console" = None) -> set[int]:
     return create_version(ML_INT, config, console=console)
 
 
 def create_version(
-    version: int, config: ConfigDict, console: Console = None
+    version: int, config: ConfigDict, console: "Console" = None
 ) -> set[int]:
     """Creates a version of the base project by parsing files for markers
     and copying only lines suitable to the given version number. The solution version is created for version number -1.
@@ -36,24 +81,473 @@ def create_version(
     of the parsed files. The set will always contain all version numbers
     up to the maximum found number.
     """
-    # initialize some local vars
-    console = console or Console()
+    # the planner and executor use the functions of this module
+    from .executor import execute_version
+    from .plan import plan_build
 
     # build version specific configuration
+    vconfig = prepare_version(version, config)
+    if vconfig is None:
+        return set()
+
+    with phase("total", vconfig.name), span(
+        vconfig.name, "version", project=vconfig.project_name
+    ):
+        return execute_version(plan_build(vconfig), console=console)
+
+
+def discover_versions(config: ConfigDict, threads: int = 0) -> set[int]:
+    """Discovers the versions of the project by scanning the source files for
+    task markers with the tags of the solution. Nothing is written.
+
+    Files are scanned by a pool of `threads` worker threads. If `threads` is
+    `0`, the number of CPUs is used.
+
+    Like `create_solution()` the result is the set of version numbers
+    discovered in the task markers of the source files.
+    """
+    mlconfig = prepare_version(ML_INT, config)
+    if mlconfig is None:
+        return set()
+
+    def scan(entry: tuple[Path, str]) -> set[int]:
+        relpath, action = entry
+        if (
+            action != COMPILE
+            or prescan_file(mlconfig.source_dir / relpath, mlconfig) is not None
+        ):
+            return set()
+        return scan_versions(read_source(relpath, mlconfig), mlconfig)
+
+    entries = (entry for _, entries in walk_sources(mlconfig) for entry in entries)
+    versions = set().union(
+        *map_files(scan, entries, threads=threads or os.cpu_count() or 1)
+    )
+    if not versions:
+        versions.add(0)
+    return versions
+
+
+def discard_solution(mlconfig: VersionSettings) -> None:
+    """Removes the solution directory of an earlier run, if the solution is
+    not created in this run."""
+    if mlconfig.output_dir.is_dir() and mlconfig.clear:
+        files.remove_path(mlconfig.output_dir)
+        logger.info(
+            f"removed solution directory at [jml.path]{relp(mlconfig.output_dir, mlconfig)}[/]"
+        )
+
+
+def create_versions(
+    config: ConfigDict, versions: Iterable[int] = None, console: "Console" = None
+) -> set[int]:
+    """Creates the solution and all project versions in a single pass over
+    the source project.
+
+    Each file in the source is read and parsed only once. The solution is
+    written while parsing the source discovers the available versions.
+    Afterwards the output for all versions is rendered and written file by
+    file from the parsed sources, which only keep the segments that are part
+    of the project versions.
+
+    If `versions` is given, only these version numbers are generated (if
+    they were discovered in the source).
+
+    Like `create_solution()` the result is the set of version numbers
+    discovered in the task markers of the parsed files.
+    """
+    console = console or create_console()
+
+    mlconfig = prepare_version(ML_INT, config)
+    if mlconfig is None:
+        return set()
+
+    if get_stats() is None and get_tracer() is None:
+        build = build_parsed
+    else:
+        build = functools.partial(measure_file, build=build_parsed)
+    sinks = {}
+
+    def start_version(vconfig: VersionSettings) -> None:
+        sinks[vconfig.no] = open_sink(vconfig)
+        if sinks[vconfig.no] is None:
+            prepare_output(vconfig)
+        console.print(
+            f"creating version [jml.ver]{vconfig.name}[/] in [jml.path]{relp(vconfig.output_dir, vconfig)}[/]"
+        )
+        emit(
+            VERSION_START,
+            vconfig.name,
+            project=vconfig.project_name,
+            output_dir=vconfig.output_dir,
+        )
+
+    def build_entry(vconfig: VersionSettings, entry: tuple) -> None:
+        relpath, action, parsed, lines = entry
+        if action in (SKIP, EXCLUDE):
+            log_file(relpath, action, vconfig)
+            return
+        (_, status), _ = build(
+            vconfig.no,
+            relpath,
+            action,
+            vconfig,
+            sink=sinks[vconfig.no],
+            parsed=parsed,
+            lines=lines,
+        )
+        log_file(relpath, status, vconfig)
+
+    # the solution is written while reading and parsing the sources and
+    # holds the canonical copies of verbatim files
+    solution = None
+    if mlconfig.solutions.delete:
+        # the solution is never written, but might exist from an earlier run
+        discard_solution(mlconfig)
+    else:
+        solution = replace(mlconfig, link_root=mlconfig.output_dir)
+        start_version(solution)
+
+    key = tag_key(mlconfig)
+    discovered = set()
+    sources = []
+    for reldir, entries in walk_sources(config):
+        if solution and sinks[solution.no] is None:
+            files.make_dirs(solution.output_dir / reldir)
+
+        dir_entries = []
+        for relpath, action in entries:
+            parsed, lines = {}, None
+            if action == COMPILE:
+                fullpath = config.source_dir / relpath
+                data = fullpath.read_bytes()
+                if prescan_file(fullpath, mlconfig, data=data) is None:
+                    text = decode_source(data, config)
+                    parsed[key] = parse(text, mlconfig)
+                    lines = text.count("\n")
+                    discovered = discovered.union(parsed[key].versions)
+            entry = (relpath, action, parsed, lines)
+            if solution:
+                build_entry(solution, entry)
+            if key in parsed:
+                # versions with the same tags share the parsed file
+                parsed[key] = parsed[key].without_solution()
+            dir_entries.append(entry)
+        sources.append((reldir, dir_entries))
+
+    if solution:
+        finalize_version(solution, sink=sinks[solution.no])
+        emit(VERSION_DONE, solution.name)
+
+    if not discovered:
+        discovered.add(0)
+    discovered, generate_versions = select_versions(discovered, versions)
+    logger.info(
+        f"auto-discovered {len(generate_versions)} of {len(discovered)} versions to generate: [jml.ver]{generate_versions}[/]"
+    )
+
+    # prepare the project versions
+    targets = []
+    for ver in sorted(generate_versions):
+        if vconfig := prepare_version(ver, config):
+            targets.append(vconfig)
+    if not targets:
+        return discovered
+    link_root = solution.output_dir if solution else targets[0].output_dir
+    targets = [replace(vconfig, link_root=link_root) for vconfig in targets]
+    for vconfig in targets:
+        start_version(vconfig)
+
+    # write all versions in one pass over the parsed sources
+    for reldir, entries in sources:
+        for vconfig in targets:
+            if sinks[vconfig.no] is None:
+                files.make_dirs(vconfig.output_dir / reldir)
+        for entry in entries:
+            for vconfig in targets:
+                build_entry(vconfig, entry)
+
+    for vconfig in targets:
+        finalize_version(vconfig, sink=sinks[vconfig.no])
+        emit(VERSION_DONE, vconfig.name)
+
+    return discovered
+
+
+def build_file(
+    version: int,
+    relpath: Path,
+    action: str,
+    vconfig: VersionSettings,
+    sink: ZipSink = None,
+) -> tuple[tuple[Path, str], set[int]]:
+    """Builds the file at `relpath` in the source into the output directory of
+    a version, according to `action`. If `sink` is given, the file is
+    written into the zip archive instead.
+
+    Returns a tuple with `relpath` and the resulting status (`action` or
+    `EMPTY`) and the set of version numbers found in the file.
+    """
+    fullpath = vconfig.source_dir / relpath
+    fulloutpath = vconfig.output_dir / relpath
+
+    if action == COMPILE and (not_empty := prescan_file(fullpath, vconfig)) is not None:
+        # no markers in the file
+        if not not_empty and not vconfig.sources.keep_empty_files:
+            if sink is None:
+                files.remove_path(fulloutpath)
+            return (relpath, EMPTY), set()
+        elif sink is not None:
+            sink.copy(fullpath, relpath)
+        else:
+            copy_file(relpath, vconfig)
+        return (relpath, VERBATIM), set()
+    elif sink is not None:
+        if action == COMPILE:
+            encoding = vconfig.sources.encoding
+            with files.open_path(fullpath, "r", encoding=encoding) as inf:
+                text = inf.read()
+            parsed = parse(text, vconfig)
+            output = render_file(version, parsed, vconfig)
+            count_lines(text, output, vconfig)
+            versions = (
+                parsed.versions if version == ML_INT else parsed.solution_versions
+            )
+            if not output.strip() and not vconfig.sources.keep_empty_files:
+                return (relpath, EMPTY), versions
+            sink.write(relpath, output, encoding=encoding)
+            return (relpath, COMPILE), versions
+        elif action == COPY:
+            sink.copy(fullpath, relpath)
+    elif action == COMPILE:
+        not_empty, versions = compile_file(version, fullpath, fulloutpath, vconfig)
+        if not not_empty and not vconfig.sources.keep_empty_files:
+            files.remove_path(fulloutpath)
+            return (relpath, EMPTY), versions
+        return (relpath, COMPILE), versions
+    elif action == COPY:
+        copy_file(relpath, vconfig)
+    return (relpath, action), set()
+
+
+def build_parsed(
+    version: int,
+    relpath: Path,
+    action: str,
+    vconfig: VersionSettings,
+    sink: ZipSink = None,
+    parsed: dict[tuple, MarkedFile] = None,
+    lines: int = None,
+) -> tuple[tuple[Path, str], set[int]]:
+    """Like `build_file()`, but compiled files are rendered from the `parsed`
+    files (by `markers.tag_key()`) shared by all versions of a single pass.
+    `lines` is the number of lines of the source file. Files are only read
+    and parsed again for versions with other tags.
+    """
+    fullpath = vconfig.source_dir / relpath
+    if action != COMPILE or prescan_file(fullpath, vconfig) is not None:
+        return build_file(version, relpath, action, vconfig, sink=sink)
+
+    key = tag_key(vconfig)
+    if key not in parsed:
+        # the tags of this version differ from the solution
+        text = read_source(relpath, vconfig)
+        parsed[key] = parse(text, vconfig)
+        lines = text.count("\n")
+    output = render_file(version, parsed[key], vconfig)
+    count_lines(lines, output, vconfig)
+    versions = (
+        parsed[key].versions if version == ML_INT else parsed[key].solution_versions
+    )
+
+    if not output.strip() and not vconfig.sources.keep_empty_files:
+        if sink is None:
+            files.remove_path(vconfig.output_dir / relpath)
+        return (relpath, EMPTY), versions
+    elif sink is not None:
+        sink.write(relpath, output, encoding=vconfig.sources.encoding)
+    else:
+        with files.open_path(
+            vconfig.output_dir / relpath, encoding=vconfig.sources.encoding
+        ) as outf:
+            outf.write(output)
+    return (relpath, COMPILE), versions
+
+
+def measure_file(
+    version: int,
+    relpath: Path,
+    action: str,
+    vconfig: VersionSettings,
+    sink: ZipSink = None,
+    build: t.Callable = build_file,
+    **options: t.Any,
+) -> tuple[tuple[Path, str], set[int]]:
+    """Like `build_file()` (or `build` with the additional `options`), but
+    records the time and size of the file in the enabled `BuildStats` and a
+    span in the enabled `Tracer`."""
+    with span(str(relpath), "file", version=vconfig.name):
+        wall, cpu = time.perf_counter(), time.thread_time()
+        result = build(version, relpath, action, vconfig, sink=sink, **options)
+        wall, cpu = time.perf_counter() - wall, time.thread_time() - cpu
+
+    stats = get_stats()
+    if stats is None:
+        return result
+    stats.add_file(vconfig.name, relpath, result[0][1], wall, cpu)
+    if action != SKIP:
+        stats.count(
+            vconfig.name, bytes_in=(vconfig.source_dir / relpath).stat().st_size
+        )
+    return result
+
+
+def count_lines(text: str | int, output: str, vconfig: VersionSettings) -> None:
+    """Counts the lines kept and dropped when compiling `text` (or a source
+    with `text` lines) into `output` in the enabled `BuildStats`."""
+    if (stats := get_stats()) is not None:
+        kept = output.count("\n")
+        lines = text.count("\n") if isinstance(text, str) else text
+        stats.count(
+            vconfig.name,
+            lines_kept=kept,
+            lines_dropped=lines - kept,
+            bytes_out=len(output.encode(vconfig.sources.encoding)),
+        )
+
+
+# size, modification time and result of prescan_file() by file, tags and
+# encoding, replaced when a file changes
+_prescans: dict[tuple, tuple[int, int, bool | None]] = {}
+
+
+def prescan_file(
+    fullpath: Path, vconfig: VersionSettings, data: bytes = None
+) -> bool | None:
+    """Checks if the source file at `fullpath` contains no markers for the
+    tags of `vconfig` (see `markers.is_verbatim()`). If the content of the
+    file was already read, it can be passed as `data`.
+
+    Returns `None` if the file needs to be compiled. Otherwise it can be
+    copied verbatim and a bool indicates if the file has non-blank content.
+    The result is cached for the run and reused by all versions with the
+    same tags, as long as the file does not change.
+    """
+    stat = fullpath.stat()
+    encoding = vconfig.sources.encoding
+    key = (fullpath, tag_key(vconfig), encoding)
+    size, mtime, result = _prescans.get(key, (None, None, None))
+    if size != stat.st_size or mtime != stat.st_mtime_ns:
+        if data is None:
+            data = fullpath.read_bytes()
+        if is_verbatim(data, vconfig, encoding=encoding):
+            result = len(data.strip()) > 0
+        else:
+            result = None
+        _prescans[key] = (stat.st_size, stat.st_mtime_ns, result)
+    return result
+
+
+def clear_caches() -> None:
+    """Clears the results cached for the run: the prescanned source files
+    and the compressed payloads of zip entries (see `utils.zips.ZipEngine`).
+    """
+    _prescans.clear()
+    get_engine().clear()
+
+
+def copy_file(relpath: Path, vconfig: VersionSettings) -> None:
+    """Copies the file at `relpath` in the source verbatim into the output
+    directory of a version.
+
+    If `build.link` is set to `hardlink` or `reflink` and the file was
+    already copied into the version at `link_root` (the first version
+    created in this run), the file is linked to that copy instead. Copies
+    keep the modification time of the source, so a copy is only linked if
+    its size and modification time match the source. Other files at the
+    same path, like the copies of an earlier run that were not replaced yet
+    by a worker process or files from the `files` config, are never linked.
+    """
+    fullpath = vconfig.source_dir / relpath
+    fulloutpath = vconfig.output_dir / relpath
+
+    if vconfig.build.link != "copy" and vconfig.link_root:
+        canonical = vconfig.link_root / relpath
+        if canonical != fulloutpath and _same_stat(canonical, fullpath):
+            files.link_path(canonical, fulloutpath, mode=vconfig.build.link)
+            return
+        files.copy_path(fullpath, fulloutpath, keep_stat=True)
+    else:
+        files.copy_path(fullpath, fulloutpath)
+
+
+def _same_stat(copy: Path, source: Path) -> bool:
+    try:
+        copy_stat, source_stat = copy.stat(), source.stat()
+    except FileNotFoundError:
+        return False
+    return (copy_stat.st_size, copy_stat.st_mtime_ns) == (
+        source_stat.st_size,
+        source_stat.st_mtime_ns,
+    )
+
+
+def set_link_root(config: ConfigDict, version: int) -> None:
+    """Sets the version whose verbatim copied files are used as the canonical
+    copies for links in other versions, unless it is already set."""
+    if config.build.link != "copy" and not config.get("link_root"):
+        if vconfig := prepare_version(version, config):
+            config["link_root"] = vconfig.output_dir
+
+
+def map_files(func: t.Callable, entries: Iterable, threads: int = 1) -> t.Iterator:
+    """Applies `func` to each of the `entries`, using a pool of up to
+    `threads` worker threads. The results are yielded in the order of
+    `entries`."""
+    if threads > 1:
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            yield from executor.map(func, entries)
+    else:
+        yield from map(func, entries)
+
+
+def log_file(relpath: Path, status: str, vconfig: VersionSettings) -> None:
+    """Reports the result of building the file at `relpath` for a version."""
+    emit(FILE, vconfig.name, path=relpath, status=status)
+
+
+def select_versions(
+    discovered: set[int], requested: Iterable[int] = None
+) -> tuple[set[int], set[int]]:
+    """Completes the set of `discovered` version numbers to include all
+    versions up to the highest discovered number and selects the versions
+    to generate from it.
+
+    Returns a tuple with the completed set of available versions and the set
+    of versions to generate. If `requested` is empty, all available versions
+    are generated, otherwise only the requested versions that are available.
+    """
+    versions = set(discovered)
+    if max(versions, default=0) > 0:
+        versions = {v + 1 for v in range(max(versions))}
+    if requested:
+        return versions, {int(v) for v in requested if int(v) in versions}
+    else:
+        return versions, versions
+
+
+def prepare_version(version: int, config: ConfigDict) -> VersionSettings | None:
+    """Builds the settings for `version` from the project config.
+
+    Returns `None` if the output directory of the version would override the
+    source directory.
+    """
     vconfig = ConfigDict(config)
     vconfig.project_name = vconfig.name
     vconfig.no = version
     vconfig.is_ml = version == ML_INT
     vconfig.output_root = vconfig.output_dir
 
-    def relp(p: Path) -> Path:
-        if p.is_relative_to(vconfig.project_root):
-            return p.relative_to(vconfig.project_root)
-        elif p.is_relative_to(vconfig.output_root):
-            return p.relative_to(vconfig.output_root)
-        else:
-            return p
-
     # prepare output name
     if vconfig.is_ml:
         vconfig.name = vconfig.name_format.format(
@@ -69,247 +563,381 @@ def create_version(
         )
     vconfig.output_dir = vconfig.output_dir / vconfig.name
 
-    # merge in version specific config
-    vconfig.merge(
-        next(
-            (cfg for cfg in config.versions if "no" in cfg and cfg["no"] == version),
-            dict(),
-        )
+    # merge in version specific config, the sections of the project config
+    # are shared with the other versions and copied before they are changed
+    version_config = next(
+        (cfg for cfg in config.versions if "no" in cfg and cfg["no"] == version),
+        dict(),
     )
-
-    if vconfig.source_dir == vconfig.output_dir:
+    for key in version_config:
+        if key in vconfig:
+            vconfig[key] = copy.deepcopy(vconfig[key])
+    vconfig.merge(version_config)
+    # compile the line transform once for all files of the version
+    vconfig.transform = create_transform(version, vconfig)
+    settings = VersionSettings.from_config(vconfig)
+
+    if settings.source_dir == settings.output_dir:
         logger.warning(
-            f"skipped [jml.ver]{vconfig.name}[/] (version [jml.ver]{vconfig.no}[/])\noutput path would override source folder at [jml.path]{relp(vconfig.source_dir)}[/]"
+            f"skipped [jml.ver]{settings.name}[/] (version [jml.ver]{settings.no}[/])\noutput path would override source folder at [jml.path]{relp(settings.source_dir, settings)}[/]"
         )
-        return set()
+        return None
+    return settings
 
-    # prepare output folders
+
+def prepare_output(vconfig: VersionSettings) -> None:
+    """Clears and creates the output directory of a version."""
     if vconfig.output_dir.is_dir():
         if vconfig.clear:
-            files.remove_path(vconfig.output_dir)
+            with phase("cleanup", vconfig.name):
+                files.remove_path(vconfig.output_dir)
             logger.info(
-                f"removed target directory [jml.path]{relp(vconfig.output_dir)}[/]"
+                f"removed target directory [jml.path]{relp(vconfig.output_dir, vconfig)}[/]"
             )
         else:
             logger.debug(
-                f"using existing target directory at [jml.path]{relp(vconfig.output_dir)}[/]"
+                f"using existing target directory at [jml.path]{relp(vconfig.output_dir, vconfig)}[/]"
             )
     if not vconfig.output_dir.is_dir():
         files.make_dirs(vconfig.output_dir)
-        logger.info(f"created target directory [jml.path]{relp(vconfig.output_dir)}[/]")
-
-    # extract some config options to local scope
-    include = config.sources.include
-    exclude = config.sources.exclude
-
-    keep_empty_files = config.sources.keep_empty_files
-    keep_empty_dirs = config.sources.keep_empty_dirs
-
-    versions = set()
-
-    # copy files in the source
-    console.print(
-        f"creating version [jml.ver]{vconfig.name}[/] in [jml.path]{relp(vconfig.output_dir)}[/]"
-    )
-    for root, dirs, source_files in vconfig.source_dir.walk():
-        outroot = vconfig.output_dir / root.relative_to(vconfig.source_dir)
-        files.make_dirs(outroot)
+        logger.info(
+            f"created target directory [jml.path]{relp(vconfig.output_dir, vconfig)}[/]"
+        )
 
-        for file in source_files:
-            fullpath = root / file
-            fulloutpath = outroot / file
 
-            relpath = fullpath.relative_to(vconfig.source_dir)
-            reloutpath = fulloutpath.relative_to(vconfig.output_dir.parent)
+def open_sink(vconfig: VersionSettings) -> ZipSink | None:
+    """Opens a `ZipSink` to collect the files of a version for its zip
+    file, if only the zip file of the version is kept. Otherwise `None` is returned
+    and the version is written to its output directory."""
+    if not vconfig.zip.only_zip or (vconfig.is_ml and vconfig.solutions.delete):
+        return None
 
-            if file == CONFIG_FILE:
-                logger.debug(f"[jml.file]{relpath!s:>32}[/] [red bold]X[/]  (skipped)")
-                continue
-            elif match_patterns(relpath, exclude):
-                logger.info(f"[jml.file]{relpath!s:>32}[/] [red bold]X[/]")
-                continue
-            elif match_patterns(relpath, include):
-                not_empty, _versions = compile_file(
-                    version, fullpath, fulloutpath, vconfig
-                )
-                versions = versions.union(_versions)
-
-                if not not_empty and not keep_empty_files:
-                    files.remove_path(fulloutpath)
-                    logger.info(f"[jml.file]{relpath!s:>32}[/] [red bold]X[/]  (empty)")
-                else:
-                    logger.info(
-                        f"[jml.file]{relpath!s:>32}[/] [yellow bold]!>[/] [jml.path]{reloutpath!s}[/]"
-                    )
-            else:
-                files.copy_path(fullpath, fulloutpath)
-                logger.info(
-                    f"[jml.file]{relpath!s:>32}[/] [green bold]->[/] [jml.path]{reloutpath!s}[/]"
-                )
+    if vconfig.output_dir.is_dir() and vconfig.clear:
+        with phase("cleanup", vconfig.name):
+            files.remove_path(vconfig.output_dir)
+        logger.info(
+            f"removed target directory [jml.path]{relp(vconfig.output_dir, vconfig)}[/]"
+        )
+    return ZipSink(files.zip_path(vconfig.output_dir, dest=vconfig.zip.dir))
+
+
+def finalize_version(
+    vconfig: VersionSettings,
+    sink: ZipSink = None,
+    changed: Iterable[str] = None,
+    extras: Iterable[dict] = None,
+) -> None:
+    """Adds additional files to a compiled version and creates the zip file
+    or removes the version directory, depending on the configuration.
+
+    If the version was written into a `sink`, the additional files are added
+    to the sink and the zip file is closed.
+
+    An incremental update only processes the additional files in `extras`
+    and passes the paths of the `changed` files to `files.create_zip()`, so
+    the entries of all other files are reused from the existing zip file."""
+    if sink is not None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tmp_dir = Path(tmp_dir)
+            with phase("files", vconfig.name):
+                for f in process_files(tmp_dir, vconfig):
+                    sink.copy(f, f.relative_to(tmp_dir))
+                    emit(EXTRA_FILE, vconfig.name, path=f.relative_to(tmp_dir))
+            # files are read from the temporary directory when closing
+            with phase("zip", vconfig.name), span(sink.path.name, "zip"):
+                sink.close()
+        logger.info(f"created zip file at [jml.path]{relp(sink.path, vconfig)}[/]")
+        emit(ZIP, vconfig.name, path=sink.path)
+        return
 
     # process additional files
+    if changed is not None:
+        changed = set(changed)
     if not vconfig.is_ml or not vconfig.solutions.delete:
-        for f in process_files(vconfig.output_dir, vconfig):
-            logger.info(f"{'':>32} [green bold]->[/] {relp(f)!s}")
+        with phase("files", vconfig.name):
+            for f in process_files(vconfig.output_dir, vconfig, entries=extras):
+                relpath = f.relative_to(vconfig.output_dir)
+                emit(EXTRA_FILE, vconfig.name, path=relpath)
+                if changed is not None:
+                    changed.add(relpath.as_posix())
 
     if vconfig.is_ml and vconfig.solutions.delete:
-        files.remove_path(vconfig.output_dir)
+        with phase("cleanup", vconfig.name):
+            files.remove_path(vconfig.output_dir)
         logger.info(
-            f"removed solution directory at [jml.path]{relp(vconfig.output_dir)}[/]"
+            f"removed solution directory at [jml.path]{relp(vconfig.output_dir, vconfig)}[/]"
         )
     elif vconfig.zip.create or vconfig.zip.only_zip:
         try:
-            zip_file = files.create_zip(vconfig.output_dir, dest=vconfig.zip.dir)
-            logger.info(f"created zip file at [jml.path]{relp(zip_file)}[/]")
+            with phase("zip", vconfig.name), span(
+                f"{vconfig.output_dir.name}.zip", "zip"
+            ):
+                zip_file = files.create_zip(
+                    vconfig.output_dir, dest=vconfig.zip.dir, changed=changed
+                )
+            logger.info(f"created zip file at [jml.path]{relp(zip_file, vconfig)}[/]")
+            emit(ZIP, vconfig.name, path=zip_file)
         except OSError as oserr:
             logger.warning(f"failed to create zip: [jml.err]{oserr.strerror}[/]")
         finally:
             if vconfig.zip.only_zip:
-                files.remove_path(vconfig.output_dir)
+                with phase("cleanup", vconfig.name):
+                    files.remove_path(vconfig.output_dir)
                 logger.info(
-                    f"removed version directory at [jml.path]{relp(vconfig.output_dir)}[/]"
+                    f"removed version directory at [jml.path]{relp(vconfig.output_dir, vconfig)}[/]"
                 )
 
-    if not versions:
-        versions.add(0)
-    return versions
+
+def walk_sources(
+    config: ConfigDict,
+) -> t.Iterator[tuple[Path, list[tuple[Path, str]]]]:
+    """Walks the source directory and yields each directory relative to the
+    source together with a list of the files in it. Each file is given as a
+    tuple of the path relative to the source and the action to take for it
+    (one of `SKIP`, `EXCLUDE`, `COMPILE` or `COPY`).
+
+    Directories matched by the exclude patterns are pruned from the walk
+    (see `compile_dir_patterns()`) and yield no files.
+    """
+    source_dir = config.source_dir
+    is_included = compile_patterns(config.sources.include)
+    is_excluded = compile_patterns(config.sources.exclude)
+    is_excluded_dir = compile_dir_patterns(config.sources.exclude)
+
+    for root, dirs, source_files in files.walk(source_dir):
+        reldir = root.relative_to(source_dir)
+
+        # excluded directories are not walked at all
+        for name in list(dirs):
+            if is_excluded_dir(reldir / name):
+                dirs.remove(name)
+                logger.debug(
+                    f"excluded directory [jml.path]{(reldir / name).as_posix()}[/]"
+                )
+
+        entries = []
+        for file in source_files:
+            relpath = reldir / file
+            if file == CONFIG_FILE:
+                entries.append((relpath, SKIP))
+            elif is_excluded(relpath):
+                entries.append((relpath, EXCLUDE))
+            elif is_included(relpath):
+                entries.append((relpath, COMPILE))
+            else:
+                entries.append((relpath, COPY))
+        yield reldir, entries
+
+
+def relp(p: Path, config: ConfigDict) -> Path:
+    """Shortens `p` relative to the project root or output root for display."""
+    if p.is_relative_to(config.project_root):
+        return p.relative_to(config.project_root)
+    elif p.is_relative_to(config.output_root):
+        return p.relative_to(config.output_root)
+    else:
+        return p
 
 
 def compile_file(
     version: int, source: Path, target: Path, config: dict
 ) -> tuple[bool, set[int]]:
-    """Compiles `source` into `target` by checking each line for opening / closing tags.
+    """Compiles `source` into `target` by parsing it for opening / closing tags
+    and rendering the parts that belong to `version`.
 
     Returns a tuple with a bool to indicate if at least one line was written and a set of version numbers found in `source`.
     """
+    with files.open_path(source, "r", encoding=config.sources.encoding) as inf:
+        text = inf.read()
+    parsed = parse(text, config)
+    output = render_file(version, parsed, config)
+    with files.open_path(target, encoding=config.sources.encoding) as outf:
+        outf.write(output)
+    count_lines(text, output, config)
 
-    # extract some config options to local scope
-    tag_open = config.tasks.open
-    tag_close = config.tasks.close
+    if version == ML_INT:
+        return (len(output.strip()) > 0, parsed.versions)
+    else:
+        return (len(output.strip()) > 0, parsed.solution_versions)
 
-    ml_open = config.solutions.open
-    ml_close = config.solutions.close
 
-    transform_func = create_transform(version, config)
+def read_source(relpath: Path, config: ConfigDict) -> str:
+    """Reads the source file at `relpath`."""
+    with files.open_path(
+        config.source_dir / relpath, "r", encoding=config.sources.encoding
+    ) as inf:
+        return inf.read()
 
-    versions = set()
 
-    is_ml = version == ML_INT
+def decode_source(data: bytes, config: ConfigDict) -> str:
+    """Decodes the content of a source file like `read_source()`."""
+    text = data.decode(config.sources.encoding)
+    # decoding does not translate newlines like reading in text mode
+    return text.replace("\r\n", "\n").replace("\r", "\n")
 
-    lines_written = 0
-    with files.open_path(source, "r", encoding=config.sources.encoding) as inf:
-        with files.open_path(target, encoding=config.sources.encoding) as outf:
-            skip = False
-            transform = None
-            line = inf.readline()
-
-            while line:
-                lline = line.lstrip()
-                if lline.startswith(ml_close) or lline.startswith(tag_close):
-                    skip = False
-                    transform = None
-                elif lline.startswith(ml_open) and is_ml:
-                    skip = False
-                    transform = None
-                elif lline.startswith(ml_open) and not is_ml:
-                    parts = lline.split(maxsplit=3)
-                    if len(parts) > 1:
-                        v_match = RE_VERSION2.match(parts[1])
-                        if v_match is not None:
-                            versions.add(int(v_match.group(2)))
-                        skip = not test_version(version, parts[1])
-                    else:
-                        skip = True
-                elif lline.startswith(tag_open):
-                    parts = lline.split(maxsplit=3)
-                    if len(parts) > 1:
-                        if is_ml:
-                            v_match = RE_VERSION2.match(parts[1])
-                            if v_match is not None:
-                                versions.add(int(v_match.group(2)))
-                            skip = True
-                        else:
-                            skip = not test_version(version, parts[1])
-                    else:
-                        skip = is_ml
-                    transform = transform_func
-                elif skip:
-                    pass
-                else:
-                    if transform:
-                        line = transform(line)
-                    outf.write(line)
-                    if len(line.strip()) > 0:
-                        lines_written += 1
-                line = inf.readline()
-    return (lines_written > 0, versions)
-
-
-def create_transform(version: int, config: ConfigDict) -> t.Callable:
-    transform = lambda line: line  # noqa: E731
 
+def render_file(version: int, parsed: MarkedFile, config: ConfigDict) -> str:
+    """Renders the content of a parsed file for `version`."""
+    if isinstance(config, VersionSettings):
+        transform = config.transform
+    else:
+        transform = create_transform(version, config)
+    return parsed.render(version, transform=transform)
+
+
+def create_transform(version: int, config: ConfigDict) -> t.Callable | None:
+    """Creates the function to rewrite the lines of task blocks (or solution
+    blocks in the solution version) from the `line.prefix` and `line.replace`
+    options. Returns `None` if no prefix is configured.
+
+    The patterns are compiled once. Literal patterns (like `// TODO: `)
+    rewrite a whole block in one multiline substitution. Other patterns are
+    applied to each line of a block (including its line break), so a prefix
+    like `#\\s*` can't match across lines.
+    """
     prefix = config.tasks.line.prefix
     replace = config.tasks.line.replace
     if version == ML_INT:
         prefix = config.solutions.line.prefix
         replace = config.solutions.line.replace
 
-    if prefix:
+    if not prefix:
+        return None
+    elif RE_LITERAL.fullmatch(prefix):
         if replace:
-            prefix = re.compile(prefix)
+            return functools.partial(re.compile(prefix).sub, replace)
+        pattern = re.compile(f"^([^\\S\\n]*)({prefix})", re.MULTILINE)
+        return functools.partial(pattern.sub, "\\1")
+    elif replace:
+        sub = functools.partial(re.compile(prefix).sub, replace)
+    else:
+        sub = functools.partial(re.compile(f"^(\\s*)({prefix})").sub, "\\1")
+    return functools.partial(_transform_lines, sub)
 
-            def transform(line):
-                return re.sub(prefix, replace, line)
-        else:
-            pat = re.compile(f"^(\\s*)({prefix})")
 
-            def transform(line):
-                return re.sub(pat, "\\1", line)
+def _transform_lines(sub: t.Callable[[str], str], text: str) -> str:
+    return "".join(sub(line) for line in RE_LINES.findall(text))
 
-    return transform
 
+def files_cache(config: ConfigDict) -> FileCache:
+    """Returns the cache for the `files` of the project."""
+    if isinstance(config, VersionSettings):
+        root, max_size = config.files_cache, config.files_cache_size
+    else:
+        root = config.get("files_cache")
+        max_size = config.get("files_cache_size", DEFAULT_MAX_SIZE // 1024**2)
+    root = Path(root) if root else default_cache_dir()
+    return get_cache(root, max_size=max_size * 1024**2)
 
-def process_files(output_dir: Path, config: dict) -> Iterable[Path]:
-    if "files" in config:
-        if "files_cache" in config:
-            file_cache = Path(config["files_cache"])
-        else:
-            # temporary cache folder to prevent duplicate downloads
-            file_cache = Path(tempfile.gettempdir()) / __cmdname__ / __version__
-        file_cache.mkdir(parents=True, exist_ok=True)
 
-        for file in config["files"]:
-            file["source_path"] = resolve_path(file["source"])
-            file["target_path"] = resolve_path(file["name"], root=output_dir)
+def fetch_files(config: ConfigDict, threads: int = DOWNLOAD_THREADS) -> None:
+    """Downloads the url sources of all `files` of the project (including
+    the files of version specific configs) into the cache, before the
+    versions are created.
+
+    The downloads run concurrently in up to `threads` threads. Afterwards
+    each version only copies the files from the cache.
+    """
+    if config.get("dry_run"):
+        return
+
+    entries = list(config.get("files", []))
+    for vcfg in config.get("versions", []):
+        entries.extend(vcfg.get("files", []))
+    if not any(is_url(file["source"]) for file in entries):
+        return
+
+    cache = files_cache(config)
+    downloads = {}
+    for file in entries:
+        if is_url(file["source"]):
+            key = download_key(file)
+            # verified once per run
+            if key not in downloads and cache.lookup(key, verify=True) is None:
+                downloads[key] = file
+    if downloads:
+        logger.info(f":thread: downloading {len(downloads)} files..")
+        download_files(downloads.values(), cache, threads=threads)
+    cache.save()
+
+
+def download_files(
+    entries: Iterable[Mapping], cache: FileCache, threads: int = DOWNLOAD_THREADS
+) -> None:
+    """Downloads the url sources of the `files` entries into the `cache`
+    and verifies their checksums."""
+    from .utils.downloads import fetch_urls
+
+    entries = list(entries)
+    files.make_dirs(cache.root)
+    with tempfile.TemporaryDirectory(dir=cache.root) as tmp_dir:
+        urls = {file["source"] for file in entries}
+        downloads = {url: Path(tmp_dir) / str(i) for i, url in enumerate(sorted(urls))}
+        errors = fetch_urls(downloads, threads=threads)
+
+        for file in entries:
+            url = file["source"]
+            if url not in errors and file.get("checksum"):
+                if not files.verify_checksum(
+                    downloads[url],
+                    file["checksum"],
+                    method=file.get("checksum_method", "sha1"),
+                ):
+                    errors[url] = OSError(
+                        f"Failed to verify checksum for download {url}."
+                    )
+                    continue
+            if url in errors:
+                logger.warning(
+                    f"failed to download file from [jml.path]{url}[/]: [jml.err]{errors[url]}[/]"
+                )
+            else:
+                cache.store(download_key(file), downloads[url])
+
+
+def process_files(
+    output_dir: Path, config: VersionSettings, entries: Iterable[dict] = None
+) -> Iterable[Path]:
+    """Processes the `entries` of the `files` config (by default all of the
+    version) into `output_dir` and yields the paths of the processed files."""
+    entries = config.files if entries is None else list(entries)
+    if entries:
+        file_cache = files_cache(config)
+
+        for file in entries:
+            # the entries are shared by all versions and are not changed
+            file = dict(
+                file,
+                source_path=resolve_path(file["source"]),
+                target_path=resolve_path(file["name"], root=output_dir),
+            )
 
             logger.debug(f"processing [jml.path]{file['name']}[/]")
             if processed_file := process_file(file, config, cache=file_cache):
                 yield processed_file
 
 
-def process_file(file: dict, config: dict, cache: Path) -> Path:
+def process_file(file: dict, config: dict, cache: FileCache) -> Path:
     if is_url(file["source"]):
-        try:
-            # Create host-specific cache folder to prevent name collisions
-            parsed_url = parse_url(file["source"])
-            cache = cache / parsed_url.hostname
-            cache.mkdir(exist_ok=True)
-
-            files.download_file(
-                file["source"],
-                file["target_path"],
-                cache=cache,
-                checksum=file.get("checksum"),
-                checksum_method=file.get("checksum_method", "sha1"),
-            )
-        except OSError as oserr:
-            logger.warning(
-                f"failed to download file from [jml.path]{file['source']}[/]: [jml.err]{oserr}[/]"
-            )
-            return None
+        if files.is_dry_run():
+            return file["target_path"]
+
+        key = download_key(file)
+        if (cached := cache.lookup(key)) is None:
+            # not fetched by fetch_files()
+            download_files([file], cache)
+            cache.save()
+            if (cached := cache.lookup(key)) is None:
+                return None
+
+        if config.build.link == "copy":
+            files.copy_path(cached, file["target_path"])
+        else:
+            files.make_dirs(file["target_path"].parent)
+            files.link_path(cached, file["target_path"], mode=config.build.link)
         return file["target_path"]
     elif file["source_path"].exists():
-        files.copy_path(file["source_path"], file["target_path"], cache=cache)
+        files.copy_path(file["source_path"], file["target_path"])
         return file["target_path"]
     else:
         return None
@@ -0,0 +1,109 @@
+"""Watches the source project for changes and updates the versions.
+
+The source directory is polled in a fixed interval. Once a change is
+detected and the source did not change for a short debounce time, only the
+touched files are compiled into the solution and all versions. The loaded
+configuration and the build manifest are kept in memory between updates.
+"""
+
+import logging
+import threading
+import typing as t
+from collections.abc import Iterable
+
+from .config import CONFIG_FILE, ConfigDict
+from .console import create_console
+from .incremental import build_incremental, load_manifest, manifest_path, save_manifest
+from .versions import walk_sources
+
+if t.TYPE_CHECKING:
+    from rich.console import Console
+
+logger = logging.getLogger("jml")
+
+
+def snapshot(config: ConfigDict) -> dict[str, tuple[int, int]]:
+    """Returns the size and modification time of each file in the source."""
+    result = {}
+    for _, entries in walk_sources(config):
+        for relpath, _ in entries:
+            try:
+                stat = (config.source_dir / relpath).stat()
+            except OSError:
+                # deleted while walking
+                continue
+            result[relpath.as_posix()] = (stat.st_size, stat.st_mtime_ns)
+    return result
+
+
+def watch(
+    config: ConfigDict,
+    versions: Iterable[int] = None,
+    console: "Console" = None,
+    interval: float = 1.0,
+    debounce: float = 0.5,
+    stop: threading.Event = None,
+) -> None:
+    """Builds all versions incrementally and then watches the source for
+    changes until interrupted (or `stop` is set).
+
+    The source is polled every `interval` seconds. After a change the
+    update waits until no further changes happen for `debounce` seconds.
+    """
+    console = console or create_console()
+    stop = stop or threading.Event()
+    path = manifest_path(config)
+
+    _, manifest = build_incremental(
+        config, load_manifest(path), versions=versions, console=console
+    )
+    if manifest is None:
+        return
+    save_manifest(path, manifest)
+
+    console.print(
+        f"watching [jml.path]{config.source_dir}[/] for changes (press Ctrl+C to stop)"
+    )
+    failed = None
+    try:
+        while not stop.wait(interval):
+            known = {
+                key: (entry["size"], entry["mtime"])
+                for key, entry in manifest["files"].items()
+            }
+            current = snapshot(config)
+            if current == known or current == failed:
+                continue
+
+            # wait for the source to settle
+            while not stop.wait(debounce):
+                settled = snapshot(config)
+                if settled == current:
+                    break
+                current = settled
+            else:
+                break
+
+            touched = {
+                key
+                for key in current.keys() | known.keys()
+                if current.get(key) != known.get(key)
+            }
+            if any(key.rsplit("/", 1)[-1] == CONFIG_FILE for key in touched):
+                logger.warning(
+                    f"changes to [jml.path]{CONFIG_FILE}[/] are not applied while watching"
+                )
+
+            try:
+                _, manifest = build_incremental(
+                    config, manifest, versions=versions, console=console
+                )
+            except (OSError, UnicodeError) as err:
+                # retry once the source changes again
+                logger.error(f"failed to update versions: [jml.err]{err}[/]")
+                failed = current
+                continue
+            save_manifest(path, manifest)
+    except KeyboardInterrupt:
+        pass
+    console.print("stopped watching")
@@ -0,0 +1,30 @@
+import pytest
+from pathlib import Path
+
+from jml.config import load_default_config
+
+BEISPIEL = Path(__file__).parent / "ExtendedML" / "Beispiel.java"
+
+
+@pytest.fixture
+def config(tmp_path):
+    source = tmp_path / "Beispiel"
+    source.mkdir()
+    (source / "Beispiel.java").write_text(BEISPIEL.read_text())
+    (source / "data.txt").write_text("no markers\n")
+
+    config = load_default_config()
+    config["name"] = "Beispiel"
+    config["source_dir"] = source
+    config["project_root"] = tmp_path
+    config["output_dir"] = tmp_path / "out"
+    config.zip.create = False
+    return config
+
+
+def read_tree(path: Path) -> dict[str, str]:
+    return {
+        str(f.relative_to(path)): f.read_text()
+        for f in sorted(path.rglob("*"))
+        if f.is_file()
+    }
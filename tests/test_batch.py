@@ -0,0 +1,57 @@
+import pytest
+
+from jml.batch import find_projects, run_batch
+from jml.config import load_default_config
+from jml.markers import ML_INT
+
+from conftest import BEISPIEL, read_tree
+
+
+@pytest.fixture
+def root(tmp_path):
+    root = tmp_path / "projects"
+    for name in ("a/Eins", "a/Zwei", "Drei"):
+        source = root / name
+        source.mkdir(parents=True)
+        (source / "Beispiel.java").write_text(BEISPIEL.read_text())
+        (source / "jml.toml").write_text("")
+    (root / "Drei" / "jml.toml").write_text('name = "Dritter"\n')
+    # folders of projects are not searched for other projects
+    (root / "Drei" / "sub").mkdir()
+    (root / "Drei" / "sub" / "jml.toml").write_text("")
+    (root / "jml.toml").write_text(f'output_dir = "{tmp_path / "out"}"\n')
+    return root
+
+
+def test_find_projects(root):
+    assert find_projects(root) == [
+        root / "Drei",
+        root / "a" / "Eins",
+        root / "a" / "Zwei",
+    ]
+    assert find_projects(root, exclude=[root / "a"]) == [root / "Drei"]
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_run_batch(root, tmp_path, jobs):
+    results = run_batch(root, load_default_config(), versions=["1", "2"], jobs=jobs)
+    assert [r.name for r in results] == ["Dritter", "Eins", "Zwei"]
+    assert all(r.versions == [ML_INT, 1, 2] and not r.error for r in results)
+
+    out = tmp_path / "out"
+    assert sorted(p.name for p in (out / "a").iterdir() if p.is_dir()) == [
+        "Eins_1",
+        "Eins_2",
+        "Eins_ML",
+        "Zwei_1",
+        "Zwei_2",
+        "Zwei_ML",
+    ]
+    assert read_tree(out / "Dritter_1") == read_tree(out / "a" / "Eins_1")
+
+
+def test_run_batch_errors(root, tmp_path):
+    (root / "a" / "Zwei" / "jml.toml").write_text('[tasks]\nopen = "x"\nclose = "x"\n')
+    results = run_batch(root, load_default_config())
+    assert [bool(r.error) for r in results] == [False, False, True]
+    assert (tmp_path / "out" / "a" / "Eins_ML").is_dir()
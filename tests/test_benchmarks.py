@@ -0,0 +1,38 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# the benchmarks are no part of the installed package
+sys.path.insert(0, str(Path(__file__).parents[1]))
+
+from benchmarks.generator import ProjectSpec, generate_project
+from benchmarks.harness import compare, run_benchmarks
+from jml.versions import discover_versions
+
+
+def test_generate_project(config, tmp_path):
+    spec = ProjectSpec(files=12, lines=40, nesting=2, versions=4, assets=4)
+    source = generate_project(tmp_path / "a", spec)
+    assert len(list(source.rglob("*.java"))) == 12
+    assert (source / "paket1a" / "paket2b").is_dir()
+    # the same spec creates the same project
+    other = generate_project(tmp_path / "b", spec)
+    for file in source.rglob("*.*"):
+        assert file.read_bytes() == (other / file.relative_to(source)).read_bytes()
+
+    config["source_dir"] = source
+    assert discover_versions(config) == {1, 2, 3, 4}
+
+
+def test_run_benchmarks(tmp_path):
+    spec = ProjectSpec(files=4, lines=20, nesting=1, assets=2)
+    results = run_benchmarks(tmp_path, spec, repeat=2)
+    assert sorted(results["results"]) == [
+        "compile_file",
+        "create_version",
+        "create_zip",
+        "match_patterns",
+    ]
+    assert len(results["results"]["create_version"]["runs"]) == 2
+    assert set(compare(results, results).values()) == {1.0}
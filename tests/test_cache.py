@@ -0,0 +1,60 @@
+import pytest
+
+from jml.utils.cache import FileCache, download_key
+
+
+@pytest.fixture
+def source(tmp_path):
+    def create(name, content):
+        file = tmp_path / "src" / name
+        file.parent.mkdir(exist_ok=True)
+        file.write_bytes(content)
+        return file
+
+    return create
+
+
+def test_download_key():
+    url = "https://example.com/junit.jar"
+    assert download_key({"source": url}) == url
+    assert download_key({"source": url, "checksum": "ABC"}) == f"{url}#sha1:abc"
+
+
+def test_store_and_lookup(tmp_path, source):
+    cache = FileCache(tmp_path / "cache")
+    a = cache.store("https://a.com/lib.jar", source("a", b"a" * 10))
+    b = cache.store("https://b.com/lib.jar", source("b", b"b" * 10))
+    # same basename, different files
+    assert a != b
+    assert cache.lookup("https://a.com/lib.jar").read_bytes() == b"a" * 10
+    assert cache.lookup("https://c.com/lib.jar") is None
+
+    # identical content is stored once
+    assert cache.store("https://c.com/lib.jar", source("c", b"a" * 10)) == a
+    assert cache.size() == 20
+
+    cache.save()
+    cache = FileCache(tmp_path / "cache")
+    assert cache.lookup("https://b.com/lib.jar") == b
+
+
+def test_lookup_validates(tmp_path, source):
+    cache = FileCache(tmp_path / "cache")
+    path = cache.store("a", source("a", b"a" * 10))
+    path.write_bytes(b"b" * 10)
+    assert cache.lookup("a") == path
+    assert cache.lookup("a", verify=True) is None
+    assert not path.exists()
+
+
+def test_evict_lru(tmp_path, source):
+    cache = FileCache(tmp_path / "cache", max_size=25)
+    a = cache.store("a", source("a", b"a" * 10))
+    cache.store("b", source("b", b"b" * 10))
+    cache.lookup("a")
+    cache.store("c", source("c", b"c" * 10))
+
+    assert cache.lookup("b") is None
+    assert cache.lookup("a") == a
+    assert cache.lookup("c") is not None
+    assert cache.size() == 20
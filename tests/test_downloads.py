@@ -0,0 +1,74 @@
+import hashlib
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from jml.utils.downloads import fetch_urls
+from jml.utils.cache import download_key
+from jml.versions import create_version, fetch_files, files_cache
+
+
+class Handler(SimpleHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections = set()
+
+    def setup(self):
+        super().setup()
+        self.connections.add(self.client_address)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(tmp_path):
+    root = tmp_path / "www"
+    root.mkdir()
+    for name in ("a.jar", "b.jar", "c.txt"):
+        (root / name).write_text(f"content of {name}")
+    Handler.connections = set()
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), partial(Handler, directory=root))
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_fetch_urls(server, tmp_path):
+    downloads = {
+        f"{server}/{name}": tmp_path / "dl" / name
+        for name in ("a.jar", "b.jar", "c.txt")
+    }
+    downloads[f"{server}/missing.jar"] = tmp_path / "dl" / "missing.jar"
+
+    errors = fetch_urls(downloads, threads=1)
+    assert list(errors) == [f"{server}/missing.jar"]
+    assert (tmp_path / "dl" / "b.jar").read_text() == "content of b.jar"
+    assert not (tmp_path / "dl" / "missing.jar").exists()
+    # all files are loaded with one kept-alive connection
+    assert len(Handler.connections) == 1
+
+
+def test_fetch_files(server, config, tmp_path):
+    checksum = hashlib.sha1(b"content of a.jar").hexdigest()
+    config["files_cache"] = tmp_path / "cache"
+    config["files"] = [
+        {"name": "+libs/a.jar", "source": f"{server}/a.jar", "checksum": checksum},
+        {"name": "+libs/b.jar", "source": f"{server}/b.jar", "checksum": "invalid"},
+    ]
+    fetch_files(config)
+    cache = files_cache(config)
+    assert cache.lookup(download_key(config["files"][0])).read_text() == (
+        "content of a.jar"
+    )
+    assert cache.lookup(download_key(config["files"][1])) is None
+
+    Handler.connections = set()
+    create_version(1, config)
+    assert (tmp_path / "out" / "Beispiel_1" / "+libs" / "a.jar").is_file()
+    # only the failed download is tried again
+    assert len(Handler.connections) == 1
@@ -0,0 +1,106 @@
+import io
+import json
+import logging
+
+import pytest
+
+from jml import events
+from jml.console import PlainConsole
+from jml.parallel import run_versions
+from jml.versions import ML_INT, create_version, create_versions
+
+
+@pytest.fixture(autouse=True)
+def reset_reporters():
+    yield
+    events.set_reporters(events.LogReporter())
+
+
+def read_events(stream: io.StringIO) -> list[dict]:
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_log_reporter(config, caplog):
+    with caplog.at_level(logging.INFO, logger="jml"):
+        create_version(1, config)
+    assert "Beispiel_1/Beispiel.java" in caplog.text
+    assert "Beispiel_1/data.txt" in caplog.text
+
+    caplog.clear()
+    with caplog.at_level(logging.WARNING, logger="jml"):
+        create_version(1, config)
+    assert "Beispiel.java" not in caplog.text
+
+
+def test_summary_reporter(config, caplog):
+    console = PlainConsole(file=io.StringIO())
+    events.enable_reporters(quiet=True, console=console)
+    with caplog.at_level(logging.INFO, logger="jml"):
+        create_version(1, config)
+    assert "Beispiel.java" not in caplog.text
+    assert console.file.getvalue() == "  Beispiel_1: 2 files (1 compile, 1 copy)\n"
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_json_lines_reporter(config, jobs):
+    stream = io.StringIO()
+    events.enable_reporters(file=stream)
+    run_versions({1, 2}, config, jobs=jobs)
+
+    received = read_events(stream)
+    assert [(e["event"], e["version"]) for e in received if e["event"] != "file"] == [
+        ("version_start", "Beispiel_1"),
+        ("version_done", "Beispiel_1"),
+        ("version_start", "Beispiel_2"),
+        ("version_done", "Beispiel_2"),
+    ]
+    files = [e for e in received if e["event"] == "file"]
+    assert {(e["version"], e["path"], e["status"]) for e in files} == {
+        ("Beispiel_1", "Beispiel.java", "compile"),
+        ("Beispiel_1", "data.txt", "copy"),
+        ("Beispiel_2", "Beispiel.java", "compile"),
+        ("Beispiel_2", "data.txt", "copy"),
+    }
+    done = [e for e in received if e["event"] == "version_done"]
+    assert all(e["files"] == {"compile": 1, "copy": 1} for e in done)
+
+
+def test_single_pass_events(config, tmp_path):
+    (config["source_dir"] / "A.class").write_text("")
+    (config["source_dir"] / "jml.toml").write_text("")
+
+    def build_events(build) -> tuple[list, list]:
+        stream = io.StringIO()
+        events.enable_reporters(file=stream)
+        build()
+        received = read_events(stream)
+        files = sorted(
+            (e["event"], e["version"], e.get("path"), e.get("status")) for e in received
+        )
+        return files, [e["files"] for e in received if e["event"] == "version_done"]
+
+    config["output_dir"] = tmp_path / "full"
+    full = build_events(lambda: run_versions({ML_INT, 1, 2, 3}, config))
+    config["output_dir"] = tmp_path / "single"
+    assert build_events(lambda: create_versions(config)) == full
+
+
+def test_events_on_stdout(config, tmp_path):
+    from click.testing import CliRunner
+
+    from jml.jml import cli
+
+    source = config["source_dir"]
+    result = CliRunner().invoke(
+        cli, [str(source), "-o", str(tmp_path / "out"), "--events", "-"]
+    )
+    assert result.exit_code == 0, result.output
+    # the console output goes to stderr
+    assert "creating version" in result.stderr
+    received = [json.loads(line) for line in result.stdout.splitlines()]
+    assert {e["event"] for e in received} == {
+        "version_start",
+        "file",
+        "zip",
+        "version_done",
+    }
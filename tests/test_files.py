@@ -1,33 +1,18 @@
 import pytest
-from pathlib import Path
 
 from jml.utils import files
 
 
-def test_is_cached(tmp_path):
-    file = Path.cwd() / "is_not_cached.txt"
-    assert not files.is_cached(file, tmp_path)
+def test_link_path(tmp_path):
+    source = tmp_path / "source.txt"
+    source.write_text("linked")
 
-    file = tmp_path / "is_not_cached.txt"
-    assert not files.is_cached(file, tmp_path)
+    dest = tmp_path / "out" / "hardlink.txt"
+    assert files.link_path(source, dest, mode="hardlink") == "hardlink"
+    assert dest.samefile(source)
 
-    file = tmp_path / "is_cached.txt"
-    file.write_text("is cached")
-    assert files.is_cached(file, tmp_path)
-
-    file = Path.cwd() / "is_cached.txt"
-    assert files.is_cached(file, tmp_path)
-
-
-def test_check_cache(tmp_path):
-    cache = tmp_path / "cache"
-    cache.mkdir()
-
-    file = tmp_path / "is_not_cached.txt"
-    assert not files.check_cache(file, cache)
-
-    file = tmp_path / "is_cached.txt"
-    file.write_text("is cached")
-    cached_file = files.check_cache(file, cache)
-    assert cached_file.samefile(cache / file.name)
-    assert files.check_cache(file, cache).samefile(cached_file)
+    # reflinks fall back to a copy if unsupported
+    dest = tmp_path / "out" / "reflink.txt"
+    assert files.link_path(source, dest, mode="reflink") in ("reflink", "copy")
+    assert dest.read_text() == "linked"
+    assert not dest.samefile(source)
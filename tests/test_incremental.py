@@ -0,0 +1,71 @@
+import pytest
+
+from jml import versions
+from jml.incremental import create_incremental, load_manifest, manifest_path
+from jml.parallel import run_versions
+from jml.versions import ML_INT
+
+from conftest import read_tree
+
+
+def test_create_incremental(config, tmp_path):
+    source = config["source_dir"]
+    assert create_incremental(config) == {1, 2, 3}
+    manifest = load_manifest(manifest_path(config))
+    assert manifest["versions"] == [1, 2, 3]
+    assert set(manifest["files"]) == {"Beispiel.java", "data.txt"}
+
+    (source / "data.txt").unlink()
+    (source / "Neu.java").write_text("/*aufg* 2\nnur in 2\n*aufg*/\n")
+    with (source / "Beispiel.java").open("a") as f:
+        f.write("// neu\n")
+    create_incremental(config)
+
+    output = read_tree(tmp_path / "out")
+    del output[manifest_path(config).name]
+
+    config["output_dir"] = tmp_path / "full"
+    run_versions([ML_INT, 1, 2, 3], config)
+    assert output == read_tree(tmp_path / "full")
+
+
+def test_incremental_zip_and_files(config, tmp_path, monkeypatch):
+    extra = tmp_path / "extra.txt"
+    extra.write_text("extra\n")
+    config["files"] = [{"source": str(extra), "name": "extra.txt"}]
+    config.zip.create = True
+    create_incremental(config)
+
+    processed = []
+    process_file = versions.process_file
+    monkeypatch.setattr(
+        versions,
+        "process_file",
+        lambda file, *args, **kwargs: processed.append(file["name"])
+        or process_file(file, *args, **kwargs),
+    )
+
+    # unchanged additional files are skipped
+    with (config["source_dir"] / "Beispiel.java").open("a") as f:
+        f.write("// neu\n")
+    create_incremental(config)
+    assert processed == []
+
+    extra.write_text("changed extra\n")
+    create_incremental(config)
+    assert processed == ["extra.txt"] * 4
+
+    config["output_dir"] = tmp_path / "full"
+    run_versions([ML_INT, 1, 2, 3], config)
+    zips = sorted((tmp_path / "out").glob("*.zip"))
+    assert len(zips) == 4
+    for zip_file in zips:
+        assert zip_file.read_bytes() == (tmp_path / "full" / zip_file.name).read_bytes()
+
+
+def test_incremental_no_versions(config, tmp_path):
+    config.solutions.delete = True
+    assert create_incremental(config, versions=[9]) == {1, 2, 3}
+    # the second run uses the manifest of the first
+    assert create_incremental(config, versions=[9]) == {1, 2, 3}
+    assert not list((tmp_path / "out").glob("Beispiel_*"))
@@ -0,0 +1,82 @@
+import pytest
+
+from jml.config import load_default_config
+from jml.markers import (
+    ML_INT,
+    SOLUTION,
+    TASK,
+    TEXT,
+    find_markers,
+    is_verbatim,
+    parse,
+    tag_key,
+)
+
+SOURCE = """class A {
+    /*aufg* 2
+    // TODO: task 2
+    *aufg*/
+    //ml*
+    int x;
+    //*ml
+    /*aufg*
+    // TODO: all tasks
+    *aufg*/
+    //ml* >=2
+    int y;
+    //*ml
+}
+"""
+
+
+@pytest.fixture
+def config():
+    return load_default_config()
+
+
+def test_parse(config):
+    parsed = parse(SOURCE, config)
+    assert [s.kind for s in parsed.segments] == [
+        TEXT,
+        TASK,
+        SOLUTION,
+        TASK,
+        SOLUTION,
+        TEXT,
+    ]
+    assert parsed.versions == {2}
+    assert parsed.solution_versions == {2}
+
+
+def test_render(config):
+    parsed = parse(SOURCE, config)
+    assert parsed.render(ML_INT) == "class A {\n    int x;\n    int y;\n}\n"
+    assert parsed.render(1) == "class A {\n    // TODO: all tasks\n}\n"
+    assert parsed.render(2) == (
+        "class A {\n    // TODO: task 2\n    // TODO: all tasks\n    int y;\n}\n"
+    )
+
+
+def test_without_solution(config):
+    parsed = parse(SOURCE, config)
+    stripped = parsed.without_solution()
+    assert len(stripped.segments) == len(parsed.segments) - 1
+    for version in (1, 2, 3):
+        assert stripped.render(version) == parsed.render(version)
+
+
+def test_is_verbatim(config):
+    assert not is_verbatim(SOURCE.encode(), config)
+    assert is_verbatim(b"class A {\n    int x;\n}\n", config)
+    assert not is_verbatim(b"class A {\r\n}\r\n", config)
+    assert not is_verbatim(b"class A {}\n", config, encoding="utf-16")
+
+
+def test_find_markers(config):
+    text = "a //ml*\n\t//ml* 2\nb\n  *aufg*/"
+    matches = list(find_markers(text, tag_key(config)))
+    assert [(m.lastgroup, m[0]) for m in matches] == [
+        (SOLUTION, "\t//ml* 2\n"),
+        (TEXT, "  *aufg*/"),
+    ]
+    assert parse(text, config).render(ML_INT) == "a //ml*\nb\n"
@@ -0,0 +1,16 @@
+import pytest
+
+from jml.parallel import run_versions
+from jml.versions import create_version
+
+from conftest import read_tree
+
+
+def test_run_versions(config, tmp_path):
+    for ver in (1, 2, 3):
+        create_version(ver, config)
+    expected = read_tree(tmp_path / "out")
+
+    config["output_dir"] = tmp_path / "parallel"
+    run_versions({1, 2, 3}, config, jobs=2)
+    assert read_tree(tmp_path / "parallel") == expected
@@ -0,0 +1,116 @@
+import threading
+import time
+from pathlib import Path
+
+from jml.executor import run_operations
+from jml.markers import ML_INT
+from jml.plan import (
+    DELETE,
+    LINK,
+    MKDIR,
+    ZIP,
+    Operation,
+    VersionPlan,
+    plan_version,
+    plan_versions,
+)
+from jml.versions import COMPILE, COPY, create_version, prepare_version
+
+
+def kinds(vplan: VersionPlan) -> list[tuple[str, str]]:
+    return [(op.kind, str(op.source or op.target.name)) for op in vplan.operations]
+
+
+def test_plan_version(config, tmp_path):
+    config.zip.create = True
+    vplan = plan_version(1, config)
+    assert kinds(vplan) == [
+        (MKDIR, "Beispiel_1"),
+        (COMPILE, "Beispiel.java"),
+        (COPY, "data.txt"),
+        (ZIP, str(tmp_path / "out" / "Beispiel_1")),
+    ]
+    assert vplan.operations[1].after == (0,)
+    assert vplan.operations[-1].after == (1, 2)
+    # nothing is written while planning
+    assert not (tmp_path / "out").exists()
+
+    create_version(1, config)
+    assert kinds(plan_version(1, config))[0] == (DELETE, "Beispiel_1")
+
+
+def test_plan_version_only_zip(config, tmp_path):
+    config.zip.only_zip = True
+    vplan = plan_version(1, config)
+    assert vplan.zip_path == tmp_path / "out" / "Beispiel_1.zip"
+    assert [op.kind for op in vplan.operations] == [COMPILE, COPY, ZIP]
+    assert vplan.operations[0].target == vplan.zip_path / "Beispiel.java"
+
+
+def test_plan_versions(config, tmp_path):
+    config.build.link = "hardlink"
+    create_version(ML_INT, config)
+    config.solutions.delete = True
+
+    plan = plan_versions([1, 2], config, delete_solution=True)
+    assert plan.deletes == [
+        Operation(DELETE, target=prepare_version(ML_INT, config).output_dir)
+    ]
+    first, second = plan.versions
+    # verbatim files are linked to the first version
+    assert kinds(first)[2] == (COPY, "data.txt")
+    assert kinds(second)[2] == (LINK, "data.txt")
+    assert len(plan) == 1 + 3 + 3
+
+
+def test_add_dedupes():
+    vplan = VersionPlan(settings=None)
+    assert vplan.add(Operation(MKDIR, target=Path("a"))) == 0
+    assert vplan.add(Operation(MKDIR, target=Path("b"), after=(0,))) == 1
+    assert vplan.add(Operation(MKDIR, target=Path("a"), after=(1,))) == 0
+    assert len(vplan.operations) == 2
+
+
+def test_run_operations():
+    finished = {}
+    lock = threading.Lock()
+
+    def run(op: Operation) -> str:
+        # the first operations take longest
+        time.sleep(0.05 / (len(finished) + 1))
+        for index in op.after:
+            assert index in finished
+        with lock:
+            finished[op.source] = True
+        return op.source
+
+    operations = [
+        Operation(COPY, 0),
+        Operation(COPY, 1),
+        Operation(COPY, 2, after=(0,)),
+        Operation(ZIP, 3, after=(0, 1, 2)),
+    ]
+    assert list(run_operations(operations, run, threads=3)) == [0, 1, 2, 3]
+
+
+def test_dry_run_cli(config, tmp_path, monkeypatch):
+    from click.testing import CliRunner
+
+    from jml import incremental
+    from jml.jml import cli
+    from jml.utils import files
+
+    monkeypatch.setattr(files, "_DRY_RUN", False)
+    monkeypatch.setattr(incremental, "create_incremental", None)
+    args = [str(config["source_dir"]), "-o", str(tmp_path / "out"), "--dry-run"]
+
+    # the plan of a full build is shown instead of compiling anything
+    result = CliRunner().invoke(cli, args + ["--incremental"])
+    assert result.exit_code == 0, result.output
+    assert "Beispiel.java" in result.output
+    assert not (tmp_path / "out").exists()
+
+    # watching never changes anything in a dry run
+    result = CliRunner().invoke(cli, args + ["--watch"])
+    assert result.exit_code == 2
+    assert "--dry-run" in result.output
@@ -0,0 +1,42 @@
+import pytest
+
+from jml import utils
+from jml.utils.predicates import compile_predicate
+
+
+@pytest.mark.parametrize(
+    "arg,expected",
+    [
+        ("2", [2]),
+        ("=2", [2]),
+        ("<2", [0, 1]),
+        ("<=2", [0, 1, 2]),
+        (">2", [3, 4, 5]),
+        (">=2", [2, 3, 4, 5]),
+        ("!=2", [0, 1, 3, 4, 5]),
+        ("2-4", [2, 3, 4]),
+        ("4-2", []),
+        ("1,3", [1, 3]),
+        ("1,>3", [1, 4, 5]),
+        ("!1,3", [0, 2, 4, 5]),
+        ("!2-4", [0, 1, 5]),
+        ("=<2", []),
+    ],
+)
+def test_compile_predicate(arg, expected):
+    predicate = compile_predicate(arg)
+    assert [v for v in range(6) if v in predicate] == expected
+    assert predicate.select(range(6)) == set(expected)
+    assert [v for v in range(6) if utils.test_version(v, arg)] == expected
+
+
+def test_compile_predicate_invalid():
+    assert compile_predicate("abc") is None
+    assert compile_predicate("1,x") is None
+    assert utils.test_version(2, "abc")
+    assert not utils.test_version(-1, "2")
+    assert compile_predicate("2-4") is compile_predicate("2-4")
+
+
+def test_predicate_numbers():
+    assert compile_predicate("!1,3-5").numbers == {1, 3, 5}
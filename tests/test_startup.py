@@ -0,0 +1,61 @@
+import io
+import subprocess
+import sys
+
+import pytest
+
+from jml.console import PlainConsole, strip_markup
+
+# heavy modules that are only imported once they are needed
+LAZY_MODULES = (
+    "rich",
+    "toml",
+    "zipfile",
+    "http.client",
+    "urllib.request",
+    "multiprocessing",
+    "concurrent.futures.process",
+)
+
+# budget for the cumulative import time of the cli module in microseconds
+IMPORT_BUDGET = 150_000
+
+
+def import_times(module: str) -> dict[str, int]:
+    """Imports `module` in a new interpreter and returns the cumulative
+    import times of all loaded modules, as reported by `-X importtime`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:"):
+            _, cumulative, name = line.split("|")
+            if cumulative.strip().isdigit():
+                times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_import_budget():
+    times = import_times("jml.jml")
+    assert [m for m in LAZY_MODULES if m in times] == []
+    assert times["jml.jml"] < IMPORT_BUDGET
+
+
+def test_plain_console():
+    out = io.StringIO()
+    console = PlainConsole(file=out, width=20)
+    console.print(":thread: creating [jml.ver]P_1[/] in [jml.path]out[/]")
+    console.print("[1, 2]", markup=False)
+    console.rule()
+    assert out.getvalue() == (
+        " creating P_1 in out\n[1, 2]\n" f"{'-' * 9}  {'-' * 9}\n"
+    )
+    assert strip_markup("[[log.time]12:00:01[/]]") == "[12:00:01]"
+    # other text in brackets or colons is kept
+    assert (
+        strip_markup("[Errno 2] :memory: C:\\tmp:x:") == "[Errno 2] :memory: C:\\tmp:x:"
+    )
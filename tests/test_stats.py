@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+from jml.parallel import run_versions
+from jml.stats import BuildStats, disable_stats, enable_stats, get_stats, phase
+from jml.versions import create_version, create_versions
+
+
+@pytest.fixture
+def stats():
+    yield enable_stats()
+    disable_stats()
+
+
+def test_phase_disabled():
+    assert get_stats() is None
+    with phase("walk", "Beispiel_1"):
+        pass
+    assert get_stats() is None
+
+
+def test_create_version_stats(config, stats, tmp_path):
+    create_version(1, config)
+    data = stats.to_dict()
+
+    phases = data["phases"]["Beispiel_1"]
+    assert {"total", "walk", "compile", "copy"} <= set(phases)
+    assert phases["compile"]["count"] == phases["copy"]["count"] == 1
+
+    counters = data["counters"]["Beispiel_1"]
+    assert counters["files"] == 2
+    assert (
+        counters["bytes_out"]
+        == (tmp_path / "out" / "Beispiel_1" / "Beispiel.java").stat().st_size
+    )
+    assert counters["lines_kept"] > 0 and counters["lines_dropped"] > 0
+
+    assert {f["file"] for f in data["slowest_files"]} == {"Beispiel.java", "data.txt"}
+
+    stats.write_json(tmp_path / "stats.json")
+    assert json.loads((tmp_path / "stats.json").read_text()) == data
+
+
+def test_merge():
+    stats = BuildStats(slowest=2)
+    for i in range(3):
+        worker = BuildStats()
+        worker.add_phase("zip", "V", 1.0, 0.5)
+        worker.add_file("V", f"file{i}", "compile", float(i), 0.0)
+        stats.merge(worker.to_dict())
+
+    data = stats.to_dict()
+    assert data["phases"]["V"]["zip"] == {"wall": 3.0, "cpu": 1.5, "count": 3}
+    assert data["counters"]["V"]["files"] == 3
+    assert [f["file"] for f in data["slowest_files"]] == ["file2", "file1"]
+
+
+def test_run_versions_stats(config, stats):
+    run_versions({1, 2}, config, jobs=2)
+    data = stats.to_dict()
+    assert {"Beispiel_1", "Beispiel_2"} <= set(data["counters"])
+    assert data["counters"]["Beispiel_2"]["files"] == 2
+
+
+def test_single_pass_stats(config, tmp_path):
+    (config["source_dir"] / "Plain.java").write_text("class Plain {}\n")
+
+    def build(func) -> tuple[dict, set]:
+        stats = enable_stats()
+        try:
+            func()
+        finally:
+            disable_stats()
+        data = stats.to_dict()
+        files = {
+            (f["version"], f["file"], f["status"])
+            for f in data["slowest_files"]
+            if f["version"] != "Beispiel_ML"
+        }
+        return {
+            ver: data["counters"][ver] for ver in ("Beispiel_1", "Beispiel_2")
+        }, files
+
+    counters, files = build(lambda: run_versions({1, 2}, config))
+    assert ("Beispiel_1", "Plain.java", "verbatim") in files
+    # a single pass reports the same files and counts
+    assert build(lambda: create_versions(config, versions=[1, 2])) == (counters, files)
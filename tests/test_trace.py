@@ -0,0 +1,66 @@
+import json
+import os
+
+import pytest
+
+from jml.parallel import run_versions
+from jml.trace import Tracer, disable_tracing, enable_tracing, get_tracer, span
+from jml.versions import create_version
+
+
+@pytest.fixture
+def tracer():
+    yield enable_tracing()
+    disable_tracing()
+
+
+def spans(tracer: Tracer, cat: str) -> list[dict]:
+    return [e for e in tracer.to_dict()["traceEvents"] if e.get("cat") == cat]
+
+
+def test_span_disabled():
+    assert get_tracer() is None
+    with span("Beispiel", "project"):
+        pass
+    assert get_tracer() is None
+
+
+def test_create_version_trace(config, tracer, tmp_path):
+    config.zip.create = True
+    create_version(1, config)
+
+    (version,) = spans(tracer, "version")
+    assert version["name"] == "Beispiel_1"
+    assert version["args"] == {"project": "Beispiel"}
+    assert sorted(e["name"] for e in spans(tracer, "file")) == [
+        "Beispiel.java",
+        "data.txt",
+    ]
+    (zip_span,) = spans(tracer, "zip")
+    assert zip_span["name"] == "Beispiel_1.zip"
+    # spans are nested in the version
+    for event in spans(tracer, "file") + [zip_span]:
+        assert event["pid"] == os.getpid()
+        assert version["ts"] <= event["ts"]
+        assert event["ts"] + event["dur"] <= version["ts"] + version["dur"]
+
+    tracer.write_json(tmp_path / "trace.json")
+    assert json.loads((tmp_path / "trace.json").read_text()) == tracer.to_dict()
+
+
+def test_run_versions_trace(config, tracer):
+    run_versions({1, 2, 3}, config, jobs=2)
+    versions = spans(tracer, "version")
+    assert sorted(e["name"] for e in versions) == [
+        "Beispiel_1",
+        "Beispiel_2",
+        "Beispiel_3",
+    ]
+    assert os.getpid() not in {e["pid"] for e in versions}
+
+    metadata = [
+        (e["pid"], e["tid"], e["name"])
+        for e in tracer.to_dict()["traceEvents"]
+        if e["ph"] == "M"
+    ]
+    assert len(metadata) == len(set(metadata))
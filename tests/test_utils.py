@@ -1,8 +1,30 @@
 import pytest
+from pathlib import Path
 
-from jml.utils import is_url
+from jml.utils import compile_dir_patterns, compile_patterns, is_url, match_patterns
 
 
 def test_is_url():
     assert is_url("https://neugebauer.cc")
     assert not is_url(str(__file__))
+
+
+def test_compile_patterns():
+    patterns = ["*.class", "Thumbs.db", "bin/*"]
+    matches = compile_patterns(patterns)
+    for file in ("A.class", "sub/A.class", "Thumbs.db", "bin/A.java", "A.java"):
+        assert matches(Path(file)) == match_patterns(file, patterns)
+    assert not compile_patterns([])("A.java")
+    assert compile_patterns(set(patterns)) is matches
+
+
+def test_compile_dir_patterns():
+    matches = compile_dir_patterns([".git/", "*.class", "bin/*", "*/build/*"])
+    assert matches(Path(".git"))
+    assert matches(Path("bin"))
+    assert matches(Path("sub/build"))
+    assert not matches(Path("src"))
+    assert not matches(Path("sub/bin"))
+    # file patterns do not match directories
+    assert not matches(Path("foo.class"))
+    assert not compile_dir_patterns([".git"])(Path(".git"))
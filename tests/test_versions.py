@@ -0,0 +1,246 @@
+import functools
+import os
+import pickle
+import re
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from jml import versions
+from jml.parallel import run_versions
+from jml.versions import (
+    COMPILE,
+    EXCLUDE,
+    ML_INT,
+    create_solution,
+    create_transform,
+    create_version,
+    create_versions,
+    discover_versions,
+    prepare_version,
+    walk_sources,
+)
+
+from conftest import read_tree
+
+
+def test_create_versions(config, tmp_path):
+    versions = create_solution(config)
+    assert versions == {2, 3}
+    for ver in (1, 2, 3):
+        create_version(ver, config)
+    expected = read_tree(tmp_path / "out")
+
+    config["output_dir"] = tmp_path / "single"
+    assert create_versions(config) == {1, 2, 3}
+    assert read_tree(tmp_path / "single") == expected
+
+
+def test_create_versions_reads_once(config, monkeypatch):
+    reads = []
+    read_bytes = Path.read_bytes
+    monkeypatch.setattr(
+        Path, "read_bytes", lambda path: reads.append(path.name) or read_bytes(path)
+    )
+    monkeypatch.setattr(versions, "read_source", None)
+    create_versions(config)
+    assert reads == ["Beispiel.java"]
+
+
+def test_prescan_file_replaces_changed_files(config, monkeypatch):
+    monkeypatch.setattr(versions, "_prescans", {})
+    mlconfig = prepare_version(ML_INT, config)
+    source = config["source_dir"] / "Neu.java"
+    for i in range(3):
+        source.write_text(f"class Neu{i} {{}}\n" if i % 2 else "/*aufg*\n*aufg*/\n")
+        os.utime(source, ns=(i * 10**9, i * 10**9))
+        assert versions.prescan_file(source, mlconfig) == (True if i % 2 else None)
+    assert len(versions._prescans) == 1
+
+
+def test_create_versions_requested(config, tmp_path):
+    create_versions(config, versions=[2, 5])
+    assert sorted(p.name for p in (tmp_path / "out").iterdir()) == [
+        "Beispiel_2",
+        "Beispiel_ML",
+    ]
+
+
+def test_create_version_threads(config, tmp_path):
+    create_version(2, config)
+    expected = read_tree(tmp_path / "out")
+
+    config["output_dir"] = tmp_path / "threads"
+    config.build.threads = 4
+    assert create_version(2, config) == {3}
+    assert read_tree(tmp_path / "threads") == expected
+
+
+def test_create_versions_hardlink(config, tmp_path):
+    config.build.link = "hardlink"
+    create_versions(config)
+    data = tmp_path / "out" / "Beispiel_ML" / "data.txt"
+    assert (tmp_path / "out" / "Beispiel_2" / "data.txt").samefile(data)
+    assert not data.samefile(config["source_dir"] / "data.txt")
+
+
+@pytest.mark.parametrize("single_pass", [False, True])
+def test_hardlink_replaced_by_file(config, tmp_path, single_pass):
+    override = tmp_path / "override.txt"
+    override.write_text("override for v1\n")
+    config.build.link = "hardlink"
+    config.versions = [
+        {"no": 1, "files": [{"source": str(override), "name": "data.txt"}]}
+    ]
+    if single_pass:
+        create_versions(config)
+    else:
+        run_versions({ML_INT, 1, 2}, config)
+
+    out = tmp_path / "out"
+    assert (out / "Beispiel_1" / "data.txt").read_text() == "override for v1\n"
+    # the linked copies of the other versions are not changed
+    assert (out / "Beispiel_ML" / "data.txt").read_text() == "no markers\n"
+    assert (out / "Beispiel_2" / "data.txt").samefile(out / "Beispiel_ML" / "data.txt")
+
+
+def test_stale_link_root(config, tmp_path):
+    config.build.link = "hardlink"
+    create_versions(config)
+    (config["source_dir"] / "data.txt").write_text("no markerz\n")
+
+    # a version might be built before the solution replaces its old copies
+    config["link_root"] = tmp_path / "out" / "Beispiel_ML"
+    create_version(1, config)
+    assert (tmp_path / "out" / "Beispiel_1" / "data.txt").read_text() == "no markerz\n"
+    assert (tmp_path / "out" / "Beispiel_ML" / "data.txt").read_text() == "no markers\n"
+
+
+@pytest.mark.parametrize("single_pass", [False, True])
+def test_only_zip(config, tmp_path, single_pass):
+    create_versions(config)
+    expected = read_tree(tmp_path / "out")
+
+    config["output_dir"] = tmp_path / "zips"
+    config.zip.only_zip = True
+    if single_pass:
+        create_versions(config)
+    else:
+        for ver in (ML_INT, 1, 2, 3):
+            create_version(ver, config)
+
+    zip_files = sorted((tmp_path / "zips").iterdir())
+    assert [p.name for p in zip_files] == [
+        "Beispiel_1.zip",
+        "Beispiel_2.zip",
+        "Beispiel_3.zip",
+        "Beispiel_ML.zip",
+    ]
+    entries = {}
+    for zip_file in zip_files:
+        with zipfile.ZipFile(zip_file) as zipf:
+            for name in zipf.namelist():
+                entries[f"{zip_file.stem}/{name}"] = zipf.read(name).decode()
+    assert entries == {k.replace(os.sep, "/"): v for k, v in expected.items()}
+
+
+def test_walk_sources_prunes_excluded_dirs(config):
+    for path in (".git/objects/ab", "bin/sub", "src/foo.class"):
+        (config["source_dir"] / path).mkdir(parents=True)
+    (config["source_dir"] / ".git" / "objects" / "ab" / "cd").write_text("")
+    (config["source_dir"] / "bin" / "sub" / "A.class").write_text("")
+    (config["source_dir"] / "src" / "A.class").write_text("")
+    (config["source_dir"] / "src" / "foo.class" / "Z.java").write_text("")
+    config.sources.exclude = {".git/", "bin/*", "*.class"}
+
+    walked = dict(walk_sources(config))
+    assert sorted(walked) == [Path("."), Path("src"), Path("src/foo.class")]
+    assert walked[Path("src")] == [(Path("src/A.class"), EXCLUDE)]
+    assert walked[Path("src/foo.class")] == [(Path("src/foo.class/Z.java"), COMPILE)]
+
+
+def test_create_versions_keeps_dirs_matching_file_patterns(config, tmp_path):
+    (config["source_dir"] / "foo.class").mkdir()
+    (config["source_dir"] / "foo.class" / "Z.java").write_text("class Z {}\n")
+    create_versions(config)
+
+    for version in ("Beispiel_ML", "Beispiel_1"):
+        assert (tmp_path / "out" / version / "foo.class" / "Z.java").is_file()
+
+
+def test_create_versions_verbatim(config, tmp_path):
+    (config["source_dir"] / "Plain.java").write_text("class Plain {}\n")
+    (config["source_dir"] / "Blank.java").write_text("\n  \n")
+    config.sources.keep_empty_files = False
+    config.build.link = "hardlink"
+    create_versions(config)
+
+    plain = tmp_path / "out" / "Beispiel_ML" / "Plain.java"
+    assert plain.read_text() == "class Plain {}\n"
+    assert (tmp_path / "out" / "Beispiel_3" / "Plain.java").samefile(plain)
+    assert not (tmp_path / "out" / "Beispiel_3" / "Blank.java").exists()
+
+
+def test_create_transform(config):
+    assert create_transform(1, config) is None
+
+    config.tasks.line.prefix = "// TODO: "
+    transform = create_transform(1, config)
+    assert transform("  // TODO: a\n// TODO: b\nc // TODO: \n") == (
+        "  a\nb\nc // TODO: \n"
+    )
+    assert create_transform(ML_INT, config) is None
+
+    config.tasks.line.replace = "// AUFGABE: "
+    assert create_transform(1, config)("// TODO: a\n  // TODO: b") == (
+        "// AUFGABE: a\n  // AUFGABE: b"
+    )
+
+    # literal prefixes rewrite whole blocks like the transform of each line
+    text = "// TODO: a\n\n  // TODO: // TODO: b\n\t// TODO:\n(c // TODO: d"
+    for prefix, replace in (("// TODO: ", ""), ("// TODO: ", "x"), ("\\(", "")):
+        config.tasks.line.prefix = prefix
+        config.tasks.line.replace = replace
+        if replace:
+            line = functools.partial(re.sub, prefix, replace)
+        else:
+            line = functools.partial(re.sub, f"^(\\s*)({prefix})", "\\1")
+        expected = "".join(line(part) for part in text.splitlines(keepends=True))
+        assert create_transform(1, config)(text) == expected
+
+    # the prefix is matched per line, even if it can match a line break
+    config.tasks.line.prefix = "#\\s*"
+    config.tasks.line.replace = ""
+    assert create_transform(1, config)("# comment x\n#\n   # indented\n") == (
+        "comment x\n   indented\n"
+    )
+
+
+def test_prepare_version(config, tmp_path):
+    config.versions = [{"no": 2, "tasks": {"line": {"prefix": "// TODO: "}}}]
+    settings = {ver: prepare_version(ver, config) for ver in (ML_INT, 1, 2, 3)}
+
+    assert settings[2].name == "Beispiel_2"
+    assert settings[2].output_dir == tmp_path / "out" / "Beispiel_2"
+    assert settings[2].transform("// TODO: a\n") == "a\n"
+    # the version config does not change the sections of other versions
+    assert config.tasks.line.prefix == ""
+    assert settings[3].transform is None
+    # equal sections are shared
+    assert settings[1].tasks is settings[3].tasks
+    assert settings[1].sources is settings[ML_INT].sources
+
+    with pytest.raises(AttributeError):
+        settings[1].name = "other"
+    pickled = pickle.loads(pickle.dumps(settings[2]))
+    assert pickled == settings[2]
+    assert pickled.transform("// TODO: a\n") == "a\n"
+
+
+@pytest.mark.parametrize("threads", [1, 4])
+def test_discover_versions(config, tmp_path, threads):
+    (config["source_dir"] / "Plain.java").write_text("class Plain {}\n")
+    assert discover_versions(config, threads=threads) == {2, 3}
+    assert not (tmp_path / "out").exists()
+    assert create_solution(config) == {2, 3}
@@ -0,0 +1,31 @@
+import threading
+import time
+
+import pytest
+
+from jml.watch import watch
+
+
+def test_watch(config, tmp_path):
+    stop = threading.Event()
+    thread = threading.Thread(
+        target=watch,
+        args=(config,),
+        kwargs=dict(interval=0.05, debounce=0.05, stop=stop),
+    )
+    thread.start()
+    try:
+        target = tmp_path / "out" / "Beispiel_2" / "Neu.java"
+        for _ in range(100):
+            if (tmp_path / "out" / "Beispiel_2").is_dir():
+                break
+            time.sleep(0.05)
+        (config["source_dir"] / "Neu.java").write_text("/*aufg* 2\nnur in 2\n*aufg*/\n")
+        for _ in range(100):
+            if target.is_file():
+                break
+            time.sleep(0.05)
+        assert target.read_text() == "nur in 2\n"
+    finally:
+        stop.set()
+        thread.join()
@@ -0,0 +1,126 @@
+import os
+import zipfile
+
+import pytest
+
+from jml.utils import files, zips
+from jml.utils.zips import ZIP_EPOCH, ZipEngine, ZipWriter
+
+
+@pytest.fixture
+def project(tmp_path):
+    project = tmp_path / "project"
+    (project / "sub").mkdir(parents=True)
+    (project / "Main.java").write_text("class Main {}\n" * 100)
+    (project / "sub" / "image.png").write_bytes(b"\x89PNG" * 100)
+    (project / "sub" / "empty.txt").write_text("")
+    return project
+
+
+def test_create_zip(project, tmp_path):
+    zip_file = files.create_zip(project, dest=tmp_path / "a.zip")
+    with zipfile.ZipFile(zip_file) as zipf:
+        assert zipf.testzip() is None
+        assert zipf.namelist() == ["Main.java", "sub/empty.txt", "sub/image.png"]
+        assert zipf.read("Main.java") == (project / "Main.java").read_bytes()
+
+        infos = {info.filename: info for info in zipf.infolist()}
+        assert infos["Main.java"].compress_type == zipfile.ZIP_DEFLATED
+        assert infos["sub/image.png"].compress_type == zipfile.ZIP_STORED
+        assert infos["sub/empty.txt"].compress_type == zipfile.ZIP_STORED
+        assert all(info.date_time == ZIP_EPOCH for info in infos.values())
+
+
+def test_create_zip_reproducible(project, tmp_path):
+    first = files.create_zip(project, dest=tmp_path / "a.zip")
+    (project / "Main.java").touch()
+    second = files.create_zip(project, dest=tmp_path / "b.zip")
+    assert first.read_bytes() == second.read_bytes()
+
+
+def test_zip_engine_reuses_payloads(project, tmp_path):
+    engine = ZipEngine(threads=2)
+    for name in ("a.zip", "b.zip"):
+        with ZipWriter(tmp_path / name, engine=engine) as zipf:
+            zipf.add_file("Main.java", project / "Main.java")
+            zipf.add("Other.java", b"class Other {}\n" * 100)
+    assert engine.hits == 2
+
+    with zipfile.ZipFile(tmp_path / "b.zip") as zipf:
+        assert zipf.read("Other.java") == b"class Other {}\n" * 100
+
+
+def test_zip_engine_cache_size():
+    engine = ZipEngine(cache_size=100)
+    engine.compress(bytes(range(80)))
+    engine.compress(bytes(range(1, 81)))
+    engine.compress(bytes(range(80)))
+    assert engine.hits == 0
+
+
+def test_zip64(project, tmp_path, monkeypatch):
+    expected = files.create_zip(project, dest=tmp_path / "small.zip")
+    # every entry and offset exceeds the limits
+    monkeypatch.setattr(zips, "ZIP_MAX_SIZE", 10)
+    monkeypatch.setattr(zips, "ZIP_MAX_ENTRIES", 2)
+    zip_file = files.create_zip(project, dest=tmp_path / "large.zip")
+
+    with zipfile.ZipFile(expected) as small, zipfile.ZipFile(zip_file) as zipf:
+        assert zipf.testzip() is None
+        assert [
+            (info.filename, info.file_size, info.header_offset)
+            for info in zipf.infolist()
+        ][:1] == [("Main.java", 1400, 0)]
+        assert {name: zipf.read(name) for name in zipf.namelist()} == {
+            name: small.read(name) for name in small.namelist()
+        }
+
+
+def test_zip_writer_streams_entries(tmp_path, monkeypatch):
+    monkeypatch.setattr(zips, "ZIP_QUEUE_SIZE", 1)
+    zip_file = tmp_path / "a.zip"
+    sizes = []
+
+    def load() -> bytes:
+        # the archive is written next to its final path
+        sizes.append(zip_file.with_name("a.zip.part").stat().st_size)
+        return os.urandom(64 * 1024)
+
+    with ZipWriter(zip_file, engine=ZipEngine(threads=1)) as zipf:
+        for i in range(4):
+            zipf._add(f"{i}.bin", load, 0o644)
+    # entries are written while the next ones are compressed
+    assert sizes[0] == 0 and sizes[-1] > 0
+
+
+def test_clear_caches(project, tmp_path):
+    from jml.versions import clear_caches
+
+    engine = zips.get_engine()
+    files.create_zip(project, dest=tmp_path / "a.zip")
+    clear_caches()
+    hits = engine.hits
+    files.create_zip(project, dest=tmp_path / "b.zip")
+    assert engine.hits == hits
+
+
+def test_create_zip_reuses_entries(project, tmp_path):
+    zip_file = files.create_zip(project, dest=tmp_path / "a.zip")
+    (project / "Main.java").write_text("class Main {}\n")
+    (project / "sub" / "empty.txt").write_text("changed, but not listed\n")
+
+    engine = zips.get_engine()
+    engine.clear()
+    files.create_zip(project, dest=zip_file, changed={"Main.java"})
+    with zipfile.ZipFile(zip_file) as zipf:
+        assert zipf.testzip() is None
+        assert zipf.read("Main.java") == b"class Main {}\n"
+        # unchanged entries are copied from the old archive
+        assert zipf.read("sub/empty.txt") == b""
+    assert not (tmp_path / "a.zip.part").exists()
+
+    # the reused entries are the same as compressed ones
+    (project / "sub" / "empty.txt").write_text("")
+    assert files.create_zip(project, dest=zip_file, changed=set()).read_bytes() == (
+        files.create_zip(project, dest=tmp_path / "b.zip").read_bytes()
+    )